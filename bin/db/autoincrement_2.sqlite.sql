@@ -0,0 +1,58 @@
+BEGIN;
+
+ALTER TABLE branches RENAME TO branches_old;
+CREATE TABLE branches (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  branch varchar(64) DEFAULT '' NOT NULL,
+  UNIQUE (branch)
+);
+INSERT INTO branches (id, branch) SELECT id, branch FROM branches_old;
+DROP TABLE branches_old;
+
+ALTER TABLE descs RENAME TO descs_old;
+CREATE TABLE descs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  description text,
+  hash bigint DEFAULT 0 NOT NULL
+);
+INSERT INTO descs (id, description, hash) SELECT id, description, hash FROM descs_old;
+DROP TABLE descs_old;
+CREATE INDEX descs_hash ON descs (hash);
+
+ALTER TABLE dirs RENAME TO dirs_old;
+CREATE TABLE dirs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  dir varchar(255) DEFAULT '' NOT NULL,
+  UNIQUE (dir)
+);
+INSERT INTO dirs (id, dir) SELECT id, dir FROM dirs_old;
+DROP TABLE dirs_old;
+
+ALTER TABLE files RENAME TO files_old;
+CREATE TABLE files (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  file varchar(255) DEFAULT '' NOT NULL,
+  UNIQUE (file)
+);
+INSERT INTO files (id, file) SELECT id, file FROM files_old;
+DROP TABLE files_old;
+
+ALTER TABLE people RENAME TO people_old;
+CREATE TABLE people (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  who varchar(128) DEFAULT '' NOT NULL,
+  UNIQUE (who)
+);
+INSERT INTO people (id, who) SELECT id, who FROM people_old;
+DROP TABLE people_old;
+
+ALTER TABLE repositories RENAME TO repositories_old;
+CREATE TABLE repositories (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  repository varchar(64) DEFAULT '' NOT NULL,
+  UNIQUE (repository)
+);
+INSERT INTO repositories (id, repository) SELECT id, repository FROM repositories_old;
+DROP TABLE repositories_old;
+
+COMMIT;
@@ -0,0 +1,89 @@
+PRAGMA journal_mode=WAL;
+
+DROP TABLE IF EXISTS branches;
+CREATE TABLE branches (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  branch varchar(64) DEFAULT '' NOT NULL,
+  UNIQUE (branch)
+);
+
+DROP TABLE IF EXISTS commits;
+CREATE TABLE commits (
+  type varchar(6) DEFAULT NULL CHECK (type IN ('Change','Add','Remove')),
+  ci_when datetime NOT NULL DEFAULT '1000-01-01 00:00:00',
+  whoid integer NOT NULL DEFAULT 0,
+  repositoryid integer NOT NULL DEFAULT 0,
+  dirid integer NOT NULL DEFAULT 0,
+  fileid integer NOT NULL DEFAULT 0,
+  revision varchar(32) NOT NULL DEFAULT '',
+  stickytag varchar(255) NOT NULL DEFAULT '',
+  branchid integer NOT NULL DEFAULT 0,
+  addedlines integer NOT NULL DEFAULT 0,
+  removedlines integer NOT NULL DEFAULT 0,
+  descid integer DEFAULT NULL,
+  UNIQUE (repositoryid,dirid,fileid,revision)
+);
+CREATE INDEX commits_ci_when ON commits (ci_when);
+CREATE INDEX commits_whoid ON commits (whoid);
+CREATE INDEX commits_repositoryid_ci_when ON commits (repositoryid,ci_when);
+CREATE INDEX commits_dirid ON commits (dirid);
+CREATE INDEX commits_fileid ON commits (fileid);
+CREATE INDEX commits_branchid ON commits (branchid);
+CREATE INDEX commits_descid ON commits (descid);
+
+DROP TABLE IF EXISTS descs;
+CREATE TABLE descs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  description text,
+  hash bigint DEFAULT 0 NOT NULL
+);
+CREATE INDEX descs_hash ON descs (hash);
+
+DROP TABLE IF EXISTS dirs;
+CREATE TABLE dirs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  dir varchar(255) DEFAULT '' NOT NULL,
+  UNIQUE (dir)
+);
+
+DROP TABLE IF EXISTS files;
+CREATE TABLE files (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  file varchar(255) DEFAULT '' NOT NULL,
+  UNIQUE (file)
+);
+
+DROP TABLE IF EXISTS people;
+CREATE TABLE people (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  who varchar(128) DEFAULT '' NOT NULL,
+  UNIQUE (who)
+);
+
+DROP TABLE IF EXISTS repositories;
+CREATE TABLE repositories (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  repository varchar(64) DEFAULT '' NOT NULL,
+  UNIQUE (repository)
+);
+
+DROP TABLE IF EXISTS tags;
+CREATE TABLE tags (
+  repositoryid integer DEFAULT 0 NOT NULL,
+  branchid integer DEFAULT 0 NOT NULL,
+  dirid integer DEFAULT 0 NOT NULL,
+  fileid integer DEFAULT 0 NOT NULL,
+  revision varchar(32) DEFAULT '' NOT NULL,
+  UNIQUE (repositoryid,dirid,fileid,branchid,revision)
+);
+CREATE INDEX tags_dirid ON tags (dirid);
+CREATE INDEX tags_fileid ON tags (fileid);
+CREATE INDEX tags_branchid ON tags (branchid);
+
+DROP TABLE IF EXISTS metadata;
+CREATE TABLE metadata (
+  name varchar(255) DEFAULT '' NOT NULL,
+  value text,
+  PRIMARY KEY (name)
+);
+INSERT INTO metadata (name, value) VALUES ('version', '2');
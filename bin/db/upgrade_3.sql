@@ -0,0 +1,2 @@
+ALTER TABLE descs ADD FULLTEXT KEY description (description);
+UPDATE metadata SET value='3' WHERE name='version';
@@ -0,0 +1,20 @@
+DROP TABLE IF EXISTS descs_fts;
+CREATE VIRTUAL TABLE descs_fts USING fts5(
+  description,
+  content='descs',
+  content_rowid='id'
+);
+CREATE TRIGGER descs_fts_insert AFTER INSERT ON descs BEGIN
+  INSERT INTO descs_fts (rowid, description) VALUES (new.id, new.description);
+END;
+CREATE TRIGGER descs_fts_delete AFTER DELETE ON descs BEGIN
+  INSERT INTO descs_fts (descs_fts, rowid, description)
+    VALUES ('delete', old.id, old.description);
+END;
+CREATE TRIGGER descs_fts_update AFTER UPDATE ON descs BEGIN
+  INSERT INTO descs_fts (descs_fts, rowid, description)
+    VALUES ('delete', old.id, old.description);
+  INSERT INTO descs_fts (rowid, description) VALUES (new.id, new.description);
+END;
+INSERT INTO descs_fts (descs_fts) VALUES ('rebuild');
+UPDATE metadata SET value='3' WHERE name='version';
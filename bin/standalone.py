@@ -23,7 +23,12 @@ import posixpath
 import string
 import socket
 import select
+import signal
 import base64
+import queue
+import threading
+import time
+import traceback
 from urllib.parse import unquote as _unquote
 import http.server as _http_server
 
@@ -64,20 +69,66 @@ class Options:
     script_alias = "viewvc"
     config_file = None
     htpasswd_file = None
+    threads = 0  # serve requests one at a time
+    processes = 0  # serve requests in this process
+    backlog = 5  # connections the OS will queue awaiting acceptance
+    keepalive_timeout = 5  # seconds an idle persistent connection is kept
+    write_buffer_size = 65536  # response bytes buffered before sending
+
+
+# The CGI variables which describe a request (along with the HTTP_*
+# ones).  These come from each request's own environment, never from the
+# server process's.
+_cgi_variables = (
+    "AUTH_TYPE",
+    "CONTENT_LENGTH",
+    "CONTENT_TYPE",
+    "GATEWAY_INTERFACE",
+    "HTTPS",
+    "PATH_INFO",
+    "PATH_TRANSLATED",
+    "QUERY_STRING",
+    "REMOTE_ADDR",
+    "REMOTE_HOST",
+    "REMOTE_IDENT",
+    "REMOTE_USER",
+    "REQUEST_METHOD",
+    "SCRIPT_NAME",
+    "SERVER_NAME",
+    "SERVER_PORT",
+    "SERVER_PROTOCOL",
+    "SERVER_SOFTWARE",
+)
 
 
 class StandaloneServer(sapi.Server):
     """Custom sapi interface that uses a BaseHTTPRequestHandler HANDLER
-    to generate output."""
+    to generate output, for a request whose CGI variables are in the
+    dictionary ENVIRON.
 
-    def __init__(self, handler, uri_host):
+    Output is buffered, and the response headers held back until the
+    buffer first fills.  A response which fits in the buffer is sent with
+    a Content-Length header; a longer one (lacking one of its own) is
+    streamed with chunked transfer encoding to HTTP/1.1 clients, or
+    ended by closing the connection for older ones."""
+
+    def __init__(self, handler, uri_host, environ):
         sapi.Server.__init__(self, uri_host, "http")
         self._headers = []
         self._handler = handler
         self._out_fp = handler.wfile
+        self._environ = environ
         self._iis = False
-        global server
-        server = self
+        self._status = None
+        self._content_type = None
+        self._buffer = bytearray()
+        self._headers_sent = False
+        self._bodiless = False
+        self._chunked = False
+        # The length the response body is declared to have, and the bytes
+        # sent of it so far.
+        self._content_length = None
+        self._sent = 0
 
     def add_header(self, name, value):
         self._headers.append((name, value))
@@ -95,14 +146,66 @@ class StandaloneServer(sapi.Server):
             else:
                 statusCode = int(status[:p])
                 statusText = status[(p + 1) :]
-        self._handler.send_response(statusCode, statusText)
-        self._handler.send_header("Content-type", content_type)
+        self._status = (statusCode, statusText)
+        self._content_type = content_type
+
+    def _send_headers(self, content_length=None):
+        # Send the response headers, declaring the body to be
+        # CONTENT_LENGTH bytes long if that's known.
+        handler = self._handler
+        code, text = self._status
+        handler.send_response(code, text)
+        handler.send_header("Content-type", self._content_type)
         for name, value in self._headers:
-            self._handler.send_header(name, value)
-        self._handler.end_headers()
+            if name.lower() == "content-length":
+                self._content_length = int(value)
+            handler.send_header(name, value)
+        if code < 200 or code in (204, 304):
+            self._bodiless = True
+        elif self._content_length is None:
+            if content_length is not None:
+                self._content_length = content_length
+                handler.send_header("Content-Length", str(content_length))
+            elif handler.request_version >= "HTTP/1.1":
+                self._chunked = True
+                handler.send_header("Transfer-Encoding", "chunked")
+            else:
+                handler.close_connection = True
+        if handler.close_connection:
+            handler.send_header("Connection", "close")
+        elif handler.request_version < "HTTP/1.1":
+            handler.send_header("Connection", "keep-alive")
+        handler.end_headers()
+        self._headers_sent = True
+
+    def _send_buffer(self):
+        # Send what's buffered of the response body (if it may have one).
+        if self._buffer and not self._bodiless:
+            if self._chunked:
+                self._out_fp.write(b"%x\r\n%s\r\n" % (len(self._buffer), self._buffer))
+            else:
+                self._out_fp.write(self._buffer)
+            self._sent = self._sent + len(self._buffer)
+        self._buffer = bytearray()
+
+    def finish(self):
+        """Send whatever remains of the response, and return True iff the
+        connection may be used for another request."""
+        handler = self._handler
+        if not self.response_started():
+            return False
+        if not self._headers_sent:
+            self._send_headers(len(self._buffer))
+        self._send_buffer()
+        if self._chunked:
+            self._out_fp.write(b"0\r\n\r\n")
+            self._chunked = False
+        elif self._content_length is not None and self._sent != self._content_length:
+            handler.close_connection = True
+        return not handler.close_connection
 
     def write_text(self, s):
-        self.write(self, s.encode("utf-8", "surrogateesape"))
+        self.write(s.encode("utf-8", "surrogateescape"))
 
     def redirect(self, url):
         self.add_header("Location", url)
@@ -110,7 +213,12 @@ class StandaloneServer(sapi.Server):
         self.write_text(sapi.redirect_notice(url))
 
     def getenv(self, name, value=None):
-        # we should always use UTF-8 to decode OS's environment variable.
+        # The request's CGI variables are its own...
+        if name in _cgi_variables or name[:5] == "HTTP_":
+            return self._environ.get(name, value)
+
+        # ... but anything else comes from the OS's environment, which we
+        # should always use UTF-8 to decode.
         if sys.getfilesystemencoding().lower() == "utf-8":
             ret = os.environ.get(name, value)
         else:
@@ -127,16 +235,23 @@ class StandaloneServer(sapi.Server):
         return ret
 
     def params(self):
-        return sapi.cgi_parse()
+        return sapi.cgi_parse(self._environ)
 
     def write(self, s):
-        self._out_fp.write(s)
+        self._buffer += s
+        if len(self._buffer) >= options.write_buffer_size:
+            if not self._headers_sent:
+                self._send_headers()
+            self._send_buffer()
 
     def flush(self):
-        self._out_fp.flush()
+        # Until the headers are sent, there's still a chance the whole
+        # response fits in the buffer and can go with a Content-Length.
+        if self._headers_sent:
+            self._send_buffer()
 
     def file(self):
-        return self._out_fp
+        return sapi.ServerFile(self)
 
 
 class NotViewVCLocationException(Exception):
@@ -154,6 +269,54 @@ class AuthenticationException(Exception):
 class ViewVCHTTPRequestHandler(_http_server.BaseHTTPRequestHandler):
     """Custom HTTP request handler for ViewVC."""
 
+    # Serve HTTP/1.1, keeping connections open for further requests.
+    protocol_version = "HTTP/1.1"
+
+    # Responses are buffered, so there's nothing to gain by having the OS
+    # hold back what we send, and much to lose on a persistent connection.
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        """Handle requests on the connection until it's closed, or it's
+        idle for too long."""
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and self.await_request():
+            self.handle_one_request()
+
+    def await_request(self):
+        """Wait for another request on the connection, and return True
+        iff one arrives.  Give up after options.keepalive_timeout seconds,
+        or as soon as the server is stopping or has other connections
+        waiting to be served."""
+
+        # A request may have been read along with the last one.
+        self.connection.setblocking(False)
+        try:
+            if self.rfile.peek(1):
+                return True
+        finally:
+            self.connection.setblocking(True)
+        deadline = time.monotonic() + options.keepalive_timeout
+        while True:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0 or self.server.quit or self.server.connections_waiting():
+                return False
+            rd, wr, ex = select.select([self.connection], [], [], min(timeout, 0.05))
+            if rd:
+                return bool(self.rfile.peek(1))
+
+    def send_page(self, code, message, body, headers=()):
+        """Send a complete response with status CODE and MESSAGE, the
+        (name, value) HEADERS, and the HTML document BODY (in bytes)."""
+        self.send_response(code, message)
+        self.send_header("Content-type", "text/html")
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
     def do_GET(self):
         """Serve a GET request."""
         self.handle_request("GET")
@@ -164,6 +327,11 @@ class ViewVCHTTPRequestHandler(_http_server.BaseHTTPRequestHandler):
 
     def handle_request(self, method):
         """Handle a request of type METHOD."""
+        # ViewVC never reads request bodies, so don't try to find the next
+        # request after one.
+        has_body = self.headers.get("content-length", "0") != "0"
+        if has_body or "transfer-encoding" in self.headers or not options.keepalive_timeout:
+            self.close_connection = True
         try:
             self.run_viewvc()
         except NotViewVCLocationException:
@@ -172,10 +340,6 @@ class ViewVCHTTPRequestHandler(_http_server.BaseHTTPRequestHandler):
             # script_alias.  Otherwise, just return a 404 and shrug.
             if (not self.path or self.path == "/") and options.script_alias:
                 new_url = self.server.url + options.script_alias + "/"
-                self.send_response(301, "Moved Permanently")
-                self.send_header("Content-type", "text/html")
-                self.send_header("Location", new_url)
-                self.end_headers()
                 body = f"""<html>
 <head>
 <meta http-equiv="refresh" content="10; url="{new_url}" />
@@ -188,17 +352,18 @@ class ViewVCHTTPRequestHandler(_http_server.BaseHTTPRequestHandler):
 </body>
 </html>
 """
-                self.wfile.write(body.encode("utf-8"))
+                self.send_page(
+                    301, "Moved Permanently", body.encode("utf-8"), [("Location", new_url)]
+                )
             else:
                 self.send_error(404)
         except IOError:  # ignore IOError: [Errno 32] Broken pipe
-            pass
+            self.close_connection = True
         except AuthenticationException:
-            self.send_response(401, "Unauthorized")
-            self.send_header("WWW-Authenticate", 'Basic realm="ViewVC"')
-            self.send_header("Content-type", "text/html")
-            self.end_headers()
-            self.wfile.write(b"""<html>
+            self.send_page(
+                401,
+                "Unauthorized",
+                b"""<html>
 <head>
 <title>Authentication failed</title>
 </head>
@@ -207,15 +372,17 @@ class ViewVCHTTPRequestHandler(_http_server.BaseHTTPRequestHandler):
 <p>Authentication has failed.  Please retry with the correct username
    and password.</p>
 </body>
-</html>""")
+</html>""",
+                [("WWW-Authenticate", 'Basic realm="ViewVC"')],
+            )
         except sapi.UriValidateException:
             # This should not happen, but can happen, if the host name
             # supplied from command line does not honor RFC1123 and
             # that hostname was resolved (by hosts file, etc.)
-            self.send_response(500, "Internal Server Error")
-            self.send_header("Content-type", "text/html")
-            self.end_headers()
-            self.wfile.write(b"""<html>
+            self.send_page(
+                500,
+                "Internal Server Error",
+                b"""<html>
 <head>
 <title>Internal Server Error</title>
 </head>
@@ -223,7 +390,8 @@ class ViewVCHTTPRequestHandler(_http_server.BaseHTTPRequestHandler):
 <h1>Internal Server Error</h1>
 <p>Invalid host name was supplied by the server configuration.</p>
 </body>
-</html>""")
+</html>""",
+            )
 
     def is_viewvc(self, path):
         """Check whether self.path is, or is a child of, the ScriptAlias"""
@@ -283,28 +451,15 @@ class ViewVCHTTPRequestHandler(_http_server.BaseHTTPRequestHandler):
                 raise AuthenticationException()
             self.username = username
 
-        # Setup the environment in preparation of executing ViewVC's core code.
-        env = os.environ
+        # Setup the environment in preparation of executing ViewVC's core
+        # code.  Each request gets an environment of its own (rather than
+        # using the process's), so requests can be served concurrently.
+        env = {}
 
         scriptname = options.script_alias and "/" + options.script_alias or ""
 
         rest = path[len(scriptname) :]
 
-        # Since we're going to modify the env in the parent, provide empty
-        # values to override previously set values
-        for k in env.keys():
-            if k[:5] == "HTTP_":
-                del env[k]
-        for k in (
-            "QUERY_STRING",
-            "REMOTE_HOST",
-            "CONTENT_LENGTH",
-            "HTTP_USER_AGENT",
-            "HTTP_COOKIE",
-        ):
-            if k in env:
-                env[k] = ""
-
         # XXX Much of the following could be prepared ahead of time!
         env["SERVER_SOFTWARE"] = self.version_string()
         env["SERVER_NAME"] = self.server.server_name
@@ -314,8 +469,7 @@ class ViewVCHTTPRequestHandler(_http_server.BaseHTTPRequestHandler):
         env["REQUEST_METHOD"] = self.command
         env["PATH_INFO"] = rest
         env["SCRIPT_NAME"] = scriptname
-        if query:
-            env["QUERY_STRING"] = query
+        env["QUERY_STRING"] = query
         uri_host = sapi.normalize_urihost(f"{self.server.address[0]}:{self.server.address[1]}", 80)
         env["HTTP_HOST"] = uri_host
         host = self.address_string()
@@ -349,10 +503,20 @@ class ViewVCHTTPRequestHandler(_http_server.BaseHTTPRequestHandler):
         # XXX Other HTTP_* headers
 
         # make a one time cfg for a single request
-        ot_cfg = cfg.copy()
+        ot_cfg = cfg.shallow_copy()
+        server = StandaloneServer(self, uri_host, env)
         try:
             try:
-                viewvc.main(StandaloneServer(self, uri_host), ot_cfg)
+                viewvc.main(server, ot_cfg)
+            except BaseException:
+                # Finishing the response would make what was sent of it
+                # look complete (a chunked one would get its last chunk),
+                # so drop the rest and close the connection instead.
+                self.close_connection = True
+                raise
+            else:
+                if not server.finish():
+                    self.close_connection = True
             finally:
                 if not self.wfile.closed:
                     self.wfile.flush()
@@ -363,20 +527,135 @@ class ViewVCHTTPRequestHandler(_http_server.BaseHTTPRequestHandler):
 
 
 class ViewVCHTTPServer(_http_server.HTTPServer):
-    """Customized HTTP server for ViewVC."""
+    """Customized HTTP server for ViewVC.  It serves up to THREADS
+    requests at once, each in a thread of its own (or one at a time, in
+    the calling thread, if THREADS is 0), and has the OS queue up to
+    BACKLOG connections awaiting acceptance."""
 
-    def __init__(self, host, port, callback):
+    def __init__(self, host, port, callback, threads=0, backlog=5):
         self.address = (host, port)
         self.url = f"http://{host}:{port}/"
         self.callback = callback
+        self.threads = threads
+        self.request_queue_size = backlog
+        self.quit = 0
+        # Accepted connections awaiting a free thread.  Once it's full,
+        # connections are left to the OS's backlog.
+        self._requests = queue.Queue(threads)
         _http_server.HTTPServer.__init__(self, self.address, self.handler)
 
+    def connections_waiting(self):
+        """Return True iff there are connections waiting to be served."""
+        if self.threads:
+            return not self._requests.empty()
+        rd, wr, ex = select.select([self.socket], [], [], 0)
+        return bool(rd)
+
+    def stop(self, signum=None, frame=None):
+        """Stop accepting connections (within a second or so).  This may
+        be used as a signal handler."""
+        self.quit = 1
+
     def serve_until_quit(self):
-        self.quit = 0
-        while not self.quit:
-            rd, wr, ex = select.select([self.socket.fileno()], [], [], 1)
-            if rd:
-                self.handle_request()
+        """Serve requests until stop() is called or the process is
+        interrupted, then finish serving the requests already accepted."""
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+        workers = []
+        for i in range(self.threads):
+            worker = threading.Thread(target=self._serve_requests, name=f"viewvc-worker-{i}")
+            worker.start()
+            workers.append(worker)
+        try:
+            while not self.quit:
+                rd, wr, ex = select.select([self.socket.fileno()], [], [], 1)
+                if rd:
+                    self._handle_request_noblock()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for worker in workers:
+                self._requests.put(None)
+            for worker in workers:
+                worker.join()
+
+    def serve_forked(self, processes):
+        """Serve requests in PROCESSES pre-forked child processes, each of
+        which runs serve_until_quit(), replacing any which exit, until
+        this process is told to stop (by SIGTERM or an interrupt).  Then
+        tell the children to stop, and wait for them to finish serving
+        the requests they've accepted."""
+
+        # Every child waits for connections on the same socket, but only
+        # one of them will get each; the rest mustn't block in accept().
+        self.socket.setblocking(False)
+        children = set()
+
+        def _stop(signum, frame):
+            self.quit = 1
+            for pid in children:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except OSError:
+                    pass
+
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGINT, _stop)
+        signals = {signal.SIGTERM, signal.SIGINT}
+        while children or not self.quit:
+            while not self.quit and len(children) < processes:
+                # Hold off the signals until the new child is one of the
+                # children, lest it miss being told to stop.
+                signal.pthread_sigmask(signal.SIG_BLOCK, signals)
+                pid = os.fork()
+                if pid == 0:
+                    signal.signal(signal.SIGTERM, self.stop)
+                    signal.signal(signal.SIGINT, signal.default_int_handler)
+                    signal.pthread_sigmask(signal.SIG_UNBLOCK, signals)
+                    status = 0
+                    try:
+                        self.serve_until_quit()
+                    except BaseException:
+                        traceback.print_exc()
+                        status = 1
+                    sys.stdout.flush()
+                    sys.stderr.flush()
+                    os._exit(status)
+                children.add(pid)
+                signal.pthread_sigmask(signal.SIG_UNBLOCK, signals)
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            children.discard(pid)
+            if not self.quit:
+                sys.stderr.write(f"worker process {pid} exited unexpectedly; restarting it\n")
+                time.sleep(1)
+
+    def process_request(self, request, client_address):
+        if not self.threads:
+            _http_server.HTTPServer.process_request(self, request, client_address)
+            return
+        try:
+            self._requests.put((request, client_address))
+        except BaseException:
+            self.shutdown_request(request)
+            raise
+
+    def _serve_requests(self):
+        # Serve requests from the queue of accepted connections until told
+        # to stop (with a None).
+        while True:
+            item = self._requests.get()
+            if item is None:
+                break
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
 
     def server_activate(self):
         _http_server.HTTPServer.server_activate(self)
@@ -403,7 +682,8 @@ class ViewVCHTTPServer(_http_server.HTTPServer):
 
 def serve(host, port, callback=None):
     """Start an HTTP server for HOST on PORT.  Call CALLBACK function
-    when the server is ready to serve."""
+    when the server is ready to serve.  Serve requests per the threads,
+    processes and backlog options."""
 
     ViewVCHTTPServer.handler = ViewVCHTTPRequestHandler
 
@@ -431,7 +711,12 @@ def serve(host, port, callback=None):
         # always use default docroot location
         cfg.options.docroot = None
 
-        ViewVCHTTPServer(host, port, callback).serve_until_quit()
+        server = ViewVCHTTPServer(host, port, callback, options.threads, options.backlog)
+        if options.processes:
+            server.serve_forked(options.processes)
+        else:
+            server.serve_until_quit()
+        server.server_close()
     except (KeyboardInterrupt, select.error):
         pass
     print("server stopped", flush=True)
@@ -448,6 +733,8 @@ def usage():
     port = clean_options.port
     host = clean_options.host
     script_alias = clean_options.script_alias
+    backlog = clean_options.backlog
+    keepalive_timeout = clean_options.keepalive_timeout
     sys.stderr.write(f"""Usage: {cmd} [OPTIONS]
 
 Run a simple, standalone HTTP server configured to serve up ViewVC requests.
@@ -470,8 +757,19 @@ Options:
                              against FILE, which is an Apache HTTP Server
                              htpasswd file.
 
+  --keepalive-timeout=SECS   Keep connections open for further requests for
+                             up to SECS seconds, or not at all if SECS is 0.
+                             [default: {keepalive_timeout}]
+
+  --backlog=N                Have the OS queue up to N connections which the
+                             server hasn't accepted yet.  [default: {backlog}]
+
   --port=PORT (-p)           Listen on PORT.  [default: {port}]
 
+  --processes=N              Serve requests in N pre-forked processes (each
+                             with --threads threads).  Not available on
+                             Windows.  [default: 0, no separate processes]
+
   --repository=PATH (-r)     Serve the Subversion or CVS repository located
                              at PATH.  This option may be used more than once.
 
@@ -480,6 +778,12 @@ Options:
                              For example, "--script-alias=repo/view" will serve
                              ViewVC at "http://HOSTNAME:PORT/repo/view".
                              [default: {script_alias}]
+
+  --threads=N                Serve up to N requests at once, each in a thread
+                             of its own.  [default: 0, one at a time]
+
+The server stops on SIGTERM or an interrupt, after finishing the requests
+it has already accepted.
 """)
     sys.exit(0)
 
@@ -505,14 +809,18 @@ def main(argv):
         ]
     )
     long_opts = [
+        "backlog=",
         "daemon",
         "config-file=",
         "help",
         "host=",
         "htpasswd-file=",
+        "keepalive-timeout=",
         "port=",
+        "processes=",
         "repository=",
         "script-alias=",
+        "threads=",
     ]
 
     opt_daemon = False
@@ -522,6 +830,10 @@ def main(argv):
     opt_config_file = None
     opt_script_alias = None
     opt_repositories = []
+    opt_threads = None
+    opt_processes = None
+    opt_backlog = None
+    opt_keepalive_timeout = None
 
     # Parse command-line options.
     try:
@@ -543,6 +855,14 @@ def main(argv):
                 opt_config_file = val
             elif opt in ["--htpasswd-file"]:
                 opt_htpasswd_file = val
+            elif opt in ["--threads"]:
+                opt_threads = val
+            elif opt in ["--processes"]:
+                opt_processes = val
+            elif opt in ["--backlog"]:
+                opt_backlog = val
+            elif opt in ["--keepalive-timeout"]:
+                opt_keepalive_timeout = val
     except getopt.error as err:
         badusage(str(err))
 
@@ -558,6 +878,36 @@ def main(argv):
                 raise BadUsage(f"Port '{opt_port}' is not a valid port number")
             if not options.port:
                 raise BadUsage("You must supply a valid port.")
+        if opt_threads is not None:
+            try:
+                options.threads = int(opt_threads)
+            except ValueError:
+                raise BadUsage(f"Thread count '{opt_threads}' is not a valid number")
+            if options.threads < 0:
+                raise BadUsage("You must supply a valid thread count.")
+        if opt_processes is not None:
+            try:
+                options.processes = int(opt_processes)
+            except ValueError:
+                raise BadUsage(f"Process count '{opt_processes}' is not a valid number")
+            if options.processes < 0:
+                raise BadUsage("You must supply a valid process count.")
+            if options.processes and not hasattr(os, "fork"):
+                raise BadUsage("The --processes option is not available on this platform.")
+        if opt_backlog is not None:
+            try:
+                options.backlog = int(opt_backlog)
+            except ValueError:
+                raise BadUsage(f"Backlog '{opt_backlog}' is not a valid number")
+            if options.backlog < 1:
+                raise BadUsage("You must supply a valid backlog.")
+        if opt_keepalive_timeout is not None:
+            try:
+                options.keepalive_timeout = float(opt_keepalive_timeout)
+            except ValueError:
+                raise BadUsage(f"Timeout '{opt_keepalive_timeout}' is not a valid number")
+            if options.keepalive_timeout < 0:
+                raise BadUsage("You must supply a valid keep-alive timeout.")
         if opt_htpasswd_file is not None:
             if not os.path.isfile(opt_htpasswd_file):
                 raise BadUsage(
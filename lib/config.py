@@ -138,6 +138,12 @@ class Config:
 
     def __init__(self):
         self.root_options_overlayed = 0
+        self.root_parents_expanded = 0
+        # Mapping of the paths of files (and directories) whose contents
+        # went into this configuration to their modification times when
+        # they were read.  See is_fresh().
+        self.sources = {}
+        self._kv_cache = {}
         for section in self._base_sections:
             if section[-1] == "*":
                 continue
@@ -146,6 +152,38 @@ class Config:
     def copy(self):
         return copy.deepcopy(self)
 
+    def shallow_copy(self):
+        """Return a copy of this configuration suitable for per-request
+        use (overlaying root options, etc.) which is much cheaper to make
+        than copy().  Each option section is copied, as are any list or
+        dictionary option values, but the parsed configuration file, the
+        key/value file cache, and the record of source files are shared
+        with the original."""
+
+        new_cfg = copy.copy(self)
+        for name, value in vars(self).items():
+            if isinstance(value, _sub_config):
+                sc = _sub_config()
+                for opt, opt_value in vars(value).items():
+                    if isinstance(opt_value, (list, dict)):
+                        opt_value = opt_value.copy()
+                    setattr(sc, opt, opt_value)
+                setattr(new_cfg, name, sc)
+        return new_cfg
+
+    def add_source(self, path):
+        """Remember that PATH (a file or directory) contributed to this
+        configuration, noting its current modification time."""
+        self.sources[path] = _get_mtime(path)
+
+    def is_fresh(self):
+        """Return 1 iff none of this configuration's source files have
+        been modified (or created or removed) since they were read."""
+        for path, mtime in list(self.sources.items()):
+            if _get_mtime(path) != mtime:
+                return 0
+        return 1
+
     def load_config(self, pathname, vhost=None):
         """Load the configuration file at PATHNAME, applying configuration
         settings there as overrides to the built-in default values.  If
@@ -162,6 +200,7 @@ class Config:
 
         self.conf_path = os.path.isfile(pathname) and pathname or None
         self.base = os.path.dirname(pathname)
+        self.add_source(pathname)
         self.parser = CustomParser()
         self.parser.optionxform = lambda x: x  # don't case-normalize option names.
         self.parser.read(self.conf_path or [])
@@ -176,8 +215,12 @@ class Config:
     def load_kv_files(self, language):
         """Process the key/value (kv) files specified in the
         configuration, merging their values into the configuration as
-        dotted heirarchical items."""
+        dotted heirarchical items.  The result is cached per LANGUAGE, so
+        callers must treat it as read-only."""
 
+        kv = self._kv_cache.get(language)
+        if kv is not None:
+            return kv
         kv = _sub_config()
 
         for fname in self.general.kv_files:
@@ -189,9 +232,11 @@ class Config:
                 parts = []
             fname = fname.replace("%lang%", language)
 
+            fname = os.path.join(self.base, fname)
+            self.add_source(fname)
             parser = configparser.ConfigParser()
             parser.optionxform = lambda x: x  # don't case-normalize option names.
-            parser.read(os.path.join(self.base, fname))
+            parser.read(fname)
             for section in parser.sections():
                 for option in parser.options(section):
                     full_name = parts + [section]
@@ -205,6 +250,7 @@ class Config:
                             ob = c
                     setattr(ob, option, parser.get(section, option))
 
+        self._kv_cache[language] = kv
         return kv
 
     def path(self, path):
@@ -411,8 +457,18 @@ class Config:
         self.options.generate_etags = 1
         self.options.svn_ignore_mimetype = 0
         self.options.svn_config_dir = None
+        self.options.svn_revinfo_cache_size = 50000
         self.options.max_filesize_kbytes = 512
+        self.options.tarball_workers = 0
+        self.options.tarball_buffer_kbytes = 16384
         self.options.use_rcsparse = 0
+        self.options.cvs_snapshot_cache_dir = None
+        self.options.cvs_snapshot_cache_kbytes = 102400
+        self.options.cvs_snapshot_interval = 50
+        self.options.cvs_dir_index_dir = None
+        self.options.cvs_dir_index_kbytes = 102400
+        self.options.rlog_jobs = 4
+        self.options.rcsparse_workers = 0
         self.options.sort_by = "file"
         self.options.sort_group_dirs = 1
         self.options.hide_attic = 1
@@ -461,6 +517,7 @@ class Config:
         self.templates.roots = None
 
         self.cvsdb.enabled = 0
+        self.cvsdb.backend = "mysql"
         self.cvsdb.host = ""
         self.cvsdb.port = 3306
         self.cvsdb.database_name = ""
@@ -471,6 +528,15 @@ class Config:
         self.cvsdb.row_limit = 1000
         self.cvsdb.rss_row_limit = 100
         self.cvsdb.check_database_for_root = 0
+        self.cvsdb.pool_size = 4
+        self.cvsdb.lookup_cache_size = 100000
+
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
 
 
 def _startswith(somestr, substr):
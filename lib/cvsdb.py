@@ -14,6 +14,10 @@ import os
 import time
 import fnmatch
 import re
+import json
+import base64
+import threading
+from collections import OrderedDict
 import vclib
 import dbi
 
@@ -35,14 +39,115 @@ def reencode(s, encoding="utf-8", errors="backslashreplace"):
 # and renamed all the 'repository'-related stuff to be 'root'-
 #
 # Version 2 ...
-CURRENT_SCHEMA_VERSION = 2
+#
+# Version 3 added a full-text index of the descriptions in the 'descs'
+# table (an FTS table, for the SQLite backend).
+CURRENT_SCHEMA_VERSION = 3
 
 # The oldest schema version supported by this codebase.
 OLDEST_SUPPORTED_SCHEMA_VERSION = 2
 
+# Pooled connections idle for longer than this many seconds are checked
+# before they are handed out again.
+POOL_CHECK_INTERVAL = 30
+
+# How long to wait, in seconds, for a pooled connection to be returned
+# when all of them are in use.
+POOL_TIMEOUT = 30
+
+# Maximum number of ids or values to look up in one query (when hydrating
+# the results of a commits query, or adding commits in bulk).
+LOOKUP_BATCH_SIZE = 500
+
+# The columns of the commits table by which the results of queries are
+# ordered for each sort method (with "ASC" or "DESC"), ending with ones
+# which make the order total.  Queries so ordered can be run a page at a
+# time, each page picking up after the values of the last row of the
+# one before.
+PAGE_KEYS = {
+    "date": (
+        ("ci_when", "DESC"),
+        ("descid", "ASC"),
+        ("repositoryid", "ASC"),
+        ("dirid", "ASC"),
+        ("fileid", "ASC"),
+        ("revision", "ASC"),
+    ),
+    "author": (
+        ("whoid", "ASC"),
+        ("descid", "ASC"),
+        ("repositoryid", "ASC"),
+        ("dirid", "ASC"),
+        ("fileid", "ASC"),
+        ("revision", "ASC"),
+    ),
+    "file": (
+        ("fileid", "ASC"),
+        ("descid", "ASC"),
+        ("repositoryid", "ASC"),
+        ("dirid", "ASC"),
+        ("revision", "ASC"),
+    ),
+}
+
 # error
 error = "cvsdb error"
 
+
+# LookupCache holds the ids of the values in the dimension tables (people,
+# files, dirs, and so on), or the values with given ids.
+class LookupCache:
+    def __init__(self, max_entries=0):
+        """Create a cache of at most MAX_ENTRIES ids or values (or of any
+        number of them, if MAX_ENTRIES is 0).  When it is full, the least
+        recently used entries are dropped.  The cache is thread-safe, so
+        that the connections of a ConnectionPool can share one."""
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, table, column, key):
+        """Return the entry cached for KEY in the COLUMN of TABLE, or None."""
+        with self._lock:
+            try:
+                value = self._entries[(table, column, key)]
+            except KeyError:
+                return None
+            self._entries.move_to_end((table, column, key))
+            return value
+
+    def get_many(self, table, column, keys):
+        """Return a dictionary mapping those of KEYS which are cached for
+        the COLUMN of TABLE to their entries."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                try:
+                    found[key] = self._entries[(table, column, key)]
+                except KeyError:
+                    continue
+                self._entries.move_to_end((table, column, key))
+        return found
+
+    def update(self, table, column, entries):
+        """Cache the entries of the dictionary ENTRIES for the COLUMN of
+        TABLE."""
+        with self._lock:
+            for key, value in entries.items():
+                self._entries[(table, column, key)] = value
+                self._entries.move_to_end((table, column, key))
+            if self.max_entries:
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def put(self, table, column, key, value):
+        self.update(table, column, {key: value})
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
 # CheckinDatabase provides all interfaces needed to the SQL database
 # back-end; it needs to be subclassed, and have its "Connect" method
 # defined to actually be complete; it should run well off of any DBI 2.0
@@ -50,25 +155,37 @@ error = "cvsdb error"
 
 
 class CheckinDatabase:
-    def __init__(self, host, port, user, passwd, database):
+    def __init__(self, host, port, user, passwd, database, backend="mysql", readonly=0):
         self._host = host
         self._port = port
         self._user = user
         self._passwd = passwd
         self._database = database
+        self._backend = backend
+        self._readonly = readonly
         self._version = None
 
         # database lookup caches
-        self._get_cache = {}
-        self._get_id_cache = {}
+        self._get_cache = LookupCache()
+        self._get_id_cache = LookupCache()
         self._desc_id_cache = {}
 
-    def Connect(self):
-        self.db = dbi.connect(self._host, self._port, self._user, self._passwd, self._database)
-        cursor = self.db.cursor()
-        cursor.execute("SET AUTOCOMMIT=1")
-        table_list = self.GetTableList()
-        if "metadata" in table_list:
+    def Connect(self, version=None):
+        """Connect to the database, and check that its schema version is
+        one this software supports.  If VERSION is not None, it is the
+        schema version, already read from the database."""
+        self.db = dbi.connect(
+            self._host,
+            self._port,
+            self._user,
+            self._passwd,
+            self._database,
+            self._backend,
+            self._readonly,
+        )
+        if version is not None:
+            self._version = version
+        elif "metadata" in self.GetTableList():
             version = self.GetMetadataValue("version")
             if version is None:
                 self._version = 0
@@ -86,6 +203,21 @@ class CheckinDatabase:
                 f"Database version {self._version} is no longer supported by this software."
             )
 
+    def Ping(self):
+        """Return true iff the connection to the database still works."""
+        try:
+            cursor = self.db.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+        except Exception:
+            return False
+        return True
+
+    def Close(self):
+        """Close the connection to the database.  (Connections handed out
+        by a ConnectionPool are returned to it instead.)"""
+        self.db.close()
+
     def sql_get_id(self, table, column, value, auto_set):
         value = reencode(value)
         sql = f"SELECT id FROM {table} WHERE {column}=%s"
@@ -110,27 +242,16 @@ class CheckinDatabase:
 
     def get_id(self, table, column, value, auto_set):
         # attempt to retrieve from cache
-        try:
-            return self._get_id_cache[table][column][value]
-        except KeyError:
-            pass
+        id = self._get_id_cache.get(table, column, value)
+        if id is not None:
+            return id
 
         id = self.sql_get_id(table, column, value, auto_set)
         if id is None:
             return None
 
         # add to cache
-        try:
-            temp = self._get_id_cache[table]
-        except KeyError:
-            temp = self._get_id_cache[table] = {}
-
-        try:
-            temp2 = temp[column]
-        except KeyError:
-            temp2 = temp[column] = {}
-
-        temp2[value] = id
+        self._get_id_cache.put(table, column, value, id)
         return id
 
     def sql_get(self, table, column, id):
@@ -148,29 +269,85 @@ class CheckinDatabase:
 
     def get(self, table, column, id):
         # attempt to retrieve from cache
-        try:
-            return self._get_cache[table][column][id]
-        except KeyError:
-            pass
+        value = self._get_cache.get(table, column, id)
+        if value is not None:
+            return value
 
         value = self.sql_get(table, column, id)
         if value is None:
             return None
 
         # add to cache
-        try:
-            temp = self._get_cache[table]
-        except KeyError:
-            temp = self._get_cache[table] = {}
-
-        try:
-            temp2 = temp[column]
-        except KeyError:
-            temp2 = temp[column] = {}
-
-        temp2[id] = value
+        self._get_cache.put(table, column, id, value)
         return value
 
+    def sql_get_many(self, table, column, ids):
+        """Return a dictionary mapping each of the IDS found in TABLE to the
+        value of its COLUMN, fetched in as few queries as possible."""
+        values = {}
+        ids = list(ids)
+        cursor = self.db.cursor()
+        for i in range(0, len(ids), LOOKUP_BATCH_SIZE):
+            batch = ids[i : (i + LOOKUP_BATCH_SIZE)]
+            sql = f"SELECT id, {column} FROM {table} WHERE id IN ({','.join(['%s'] * len(batch))})"
+            cursor.execute(sql, tuple(batch))
+            for id, value in cursor.fetchall():
+                values[id] = value
+        return values
+
+    def prefetch(self, table, column, ids):
+        """Load the COLUMN values of the IDS in TABLE into the lookup cache
+        get() consults, with one query per batch of ids not already there."""
+        ids = set(id for id in ids if id is not None)
+        missing = ids.difference(self._get_cache.get_many(table, column, ids))
+        if not missing:
+            return
+        self._get_cache.update(table, column, self.sql_get_many(table, column, sorted(missing)))
+
+    def sql_get_ids(self, table, column, values):
+        """Return a dictionary mapping each of the (already reencoded)
+        VALUES found in the COLUMN of TABLE to its id."""
+        ids = {}
+        values = list(values)
+        cursor = self.db.cursor()
+        for i in range(0, len(values), LOOKUP_BATCH_SIZE):
+            batch = values[i : (i + LOOKUP_BATCH_SIZE)]
+            params = ",".join(["%s"] * len(batch))
+            sql = f"SELECT id, {column} FROM {table} WHERE {column} IN ({params})"
+            cursor.execute(sql, tuple(batch))
+            for id, value in cursor.fetchall():
+                ids[value] = str(int(id))
+        return ids
+
+    def get_ids(self, table, column, values):
+        """Return a dictionary mapping each of VALUES to its id in TABLE,
+        like get_id() with AUTO_SET does, but looking up (and inserting)
+        the values not already in the lookup cache in bulk."""
+        temp2 = self._get_id_cache.get_many(table, column, values)
+        missing = {}
+        for value in values:
+            if value not in temp2:
+                missing[reencode(value)] = value
+        if missing:
+            found = self.sql_get_ids(table, column, missing.keys())
+            new = [value for value in missing if value not in found]
+            if new:
+                sql = f"{self.db.insert_ignore_sql} INTO {table}({column}) VALUES "
+                cursor = self.db.cursor()
+                for i in range(0, len(new), LOOKUP_BATCH_SIZE):
+                    batch = new[i : (i + LOOKUP_BATCH_SIZE)]
+                    cursor.execute(sql + ",".join(["(%s)"] * len(batch)), tuple(batch))
+                found.update(self.sql_get_ids(table, column, new))
+            for value, original in missing.items():
+                if value in found:
+                    temp2[original] = found[value]
+                else:
+                    # The database considers this value equal to one which
+                    # is spelled differently (say, with trailing spaces).
+                    temp2[original] = self.sql_get_id(table, column, value, 1)
+            self._get_id_cache.update(table, column, temp2)
+        return temp2
+
     def get_list(self, table, field_index):
         sql = f"SELECT * FROM {table}"
         cursor = self.db.cursor()
@@ -189,9 +366,8 @@ class CheckinDatabase:
         return self._version >= 1 and "commits" or "checkins"
 
     def GetTableList(self):
-        sql = "SHOW TABLES"
         cursor = self.db.cursor()
-        cursor.execute(sql)
+        cursor.execute(self.db.table_list_sql)
         list = []
         while 1:
             row = cursor.fetchone()
@@ -221,6 +397,17 @@ class CheckinDatabase:
         except Exception as e:
             raise Exception(f"Error setting metadata: '{e}'\n\tname  = {name}\n\tvalue = {value}\n")
 
+    def BumpGeneration(self):
+        """Record that rows may have been removed from the database, so
+        that lookup caches shared across connections (see ConnectionPool),
+        which may map their ids to values (and back), are dropped."""
+        assert self._version > 0
+        cursor = self.db.cursor()
+        cursor.execute(
+            f"{self.db.insert_ignore_sql} INTO metadata (name, value) VALUES ('generation', '0')"
+        )
+        cursor.execute("UPDATE metadata SET value=value+1 WHERE name='generation'")
+
     def GetBranchID(self, branch, auto_set=1):
         return self.get_id("branches", "branch", branch, auto_set)
 
@@ -296,6 +483,60 @@ class CheckinDatabase:
         temp[description] = id
         return id
 
+    def GetDescriptionIDs(self, descriptions):
+        """Return a dictionary mapping each of DESCRIPTIONS to its id, like
+        GetDescriptionID() does, but looking up (and inserting) the
+        descriptions not already in the lookup cache in bulk."""
+        missing = {}
+        for description in descriptions:
+            if description not in self._desc_id_cache.get(len(description), {}):
+                missing[reencode(description)] = description
+
+        def _sql_get_ids(descs):
+            ids = {}
+            descs = list(descs)
+            cursor = self.db.cursor()
+            for i in range(0, len(descs), LOOKUP_BATCH_SIZE):
+                batch = descs[i : (i + LOOKUP_BATCH_SIZE)]
+                hashes = sorted(set(len(desc) for desc in batch))
+                sql = (
+                    f"SELECT id, description FROM descs WHERE hash IN "
+                    f"({','.join(['%s'] * len(hashes))}) AND description IN "
+                    f"({','.join(['%s'] * len(batch))})"
+                )
+                cursor.execute(sql, tuple(hashes) + tuple(batch))
+                for id, description in cursor.fetchall():
+                    ids[description] = str(int(id))
+            return ids
+
+        if missing:
+            found = _sql_get_ids(missing.keys())
+            new = [desc for desc in missing if desc not in found]
+            if new:
+                cursor = self.db.cursor()
+                for i in range(0, len(new), LOOKUP_BATCH_SIZE):
+                    batch = new[i : (i + LOOKUP_BATCH_SIZE)]
+                    sql = "INSERT INTO descs (hash,description) VALUES " + ",".join(
+                        ["(%s,%s)"] * len(batch)
+                    )
+                    sql_args = []
+                    for desc in batch:
+                        sql_args.extend((len(desc), desc))
+                    cursor.execute(sql, tuple(sql_args))
+                found.update(_sql_get_ids(new))
+            for desc, description in missing.items():
+                id = found.get(desc) or self.SQLGetDescriptionID(description)
+                try:
+                    temp = self._desc_id_cache[len(description)]
+                except KeyError:
+                    temp = self._desc_id_cache[len(description)] = {}
+                temp[description] = id
+
+        ids = {}
+        for description in descriptions:
+            ids[description] = self._desc_id_cache[len(description)][description]
+        return ids
+
     def GetDescription(self, id):
         return self.get("descs", "description", id)
 
@@ -309,8 +550,59 @@ class CheckinDatabase:
         return self.get_list("people", 1)
 
     def AddCommitList(self, commit_list):
-        for commit in commit_list:
-            self.AddCommit(commit)
+        """Add the commits in COMMIT_LIST to the database in one
+        transaction, looking up (and adding) the authors, files,
+        descriptions, and so on, they refer to in bulk, and recording the
+        commits themselves with multi-row statements."""
+        if not commit_list:
+            return
+        cursor = self.db.cursor()
+        cursor.execute(self.db.begin_sql)
+        try:
+            who_ids = self.get_ids("people", "who", set(c.GetAuthor() for c in commit_list))
+            repository_ids = self.get_ids(
+                "repositories", "repository", set(c.GetRepository() for c in commit_list)
+            )
+            directory_ids = self.get_ids("dirs", "dir", set(c.GetDirectory() for c in commit_list))
+            file_ids = self.get_ids("files", "file", set(c.GetFile() for c in commit_list))
+            branch_ids = self.get_ids("branches", "branch", set(c.GetBranch() for c in commit_list))
+            description_ids = self.GetDescriptionIDs(set(c.GetDescription() for c in commit_list))
+
+            sql = (
+                f"REPLACE INTO {self.GetCommitsTable()}"
+                " (type,ci_when,whoid,repositoryid,dirid,fileid,revision,"
+                "stickytag,branchid,addedlines,removedlines,descid) VALUES "
+            )
+            for i in range(0, len(commit_list), LOOKUP_BATCH_SIZE):
+                batch = commit_list[i : (i + LOOKUP_BATCH_SIZE)]
+                sql_args = []
+                for commit in batch:
+                    sql_args.extend(
+                        (
+                            commit.GetTypeString(),
+                            dbi.DateTimeFromTicks(commit.GetTime() or 0.0),
+                            who_ids[commit.GetAuthor()],
+                            repository_ids[commit.GetRepository()],
+                            directory_ids[commit.GetDirectory()],
+                            file_ids[commit.GetFile()],
+                            commit.GetRevision(),
+                            "NULL",
+                            branch_ids[commit.GetBranch()],
+                            commit.GetPlusCount() or "0",
+                            commit.GetMinusCount() or "0",
+                            description_ids[commit.GetDescription()],
+                        )
+                    )
+                values = ",".join(["(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)"] * len(batch))
+                cursor.execute(sql + values, tuple(sql_args))
+        except Exception as e:
+            self.db.rollback()
+            # The lookup caches may now refer to rows which were never
+            # committed.
+            self._get_id_cache.clear()
+            self._desc_id_cache = {}
+            raise Exception(f"Error adding commits: '{e}'")
+        self.db.commit()
 
     def AddCommit(self, commit):
         ci_when = dbi.DateTimeFromTicks(commit.GetTime() or 0.0)
@@ -369,6 +661,19 @@ Values were:
             msg = msg_format.format(*sql_args)
             raise Exception(f"Error adding commit: '{e}'\n{msg}")
 
+    def FullTextSearch(self, query):
+        """Return (TABLES, CONDITION, ORDER), as returned by the database
+        connection's fulltext_search(), which narrow the comment search of
+        QUERY down to the descriptions containing the words any match must
+        contain, using the full-text index, and order those by relevance.
+        Return None if the database has no full-text index, or if QUERY
+        doesn't have exactly one comment search, or if no such words can
+        be found."""
+        if self._version < 3 or len(query.comment_list) != 1:
+            return None
+        query_entry = query.comment_list[0]
+        return self.db.fulltext_search(FullTextTerms(query_entry.data, query_entry.match))
+
     def SQLQueryListString(self, field, query_entry_list):
         sqlList = []
 
@@ -404,15 +709,9 @@ Values were:
             elif query_entry.match == "notregex":
                 match = " NOT REGEXP "
 
-            # Some interfaces (such as mysqlclient) return bytestrings
-            # from the literal() call; others (like PyMySQL) do not.
-            # So we'll just detect and decode where necessary.
-            #
-            # Strictly speaking, we shouldn't even be using literal(),
-            # which not a part of the public interface.  But, yeah, we do.
             data_literal = self.db.literal(data)
-            if isinstance(data_literal, bytes):
-                data_literal = data_literal.decode("utf-8")
+            if query_entry.match == "like":
+                data_literal = data_literal + self.db.like_escape_sql
 
             sqlList.append(f"{field}{match}{data_literal}")
 
@@ -450,6 +749,12 @@ Values were:
 
         if len(query.comment_list):
             tableList.append(("descs", f"({commits_table}.descid=descs.id)"))
+            search = self.FullTextSearch(query)
+            if search:
+                # The comment test below still applies, but only to the
+                # descriptions the index finds, rather than to all of them.
+                tableList.extend(search[0])
+                condList.append(search[1])
             temp = self.SQLQueryListString("descs.description", query.comment_list)
             condList.append(temp)
 
@@ -461,14 +766,21 @@ Values were:
             temp = f"({commits_table}.ci_when<='{query.to_date}')"
             condList.append(temp)
 
-        if query.sort == "date":
-            order_by = f"ORDER BY {commits_table}.ci_when DESC,descid"
-        elif query.sort == "author":
-            tableList.append(("people", f"({commits_table}.whoid=people.id)"))
-            order_by = f"ORDER BY {commits_table}.whoid,descid"
-        elif query.sort == "file":
-            tableList.append(("files", f"({commits_table}.fileid=files.id)"))
-            order_by = f"ORDER BY {commits_table}.fileid,descid"
+        search = query.sort == "relevance" and self.FullTextSearch(query)
+        page_keys = self.GetPageKeys(query)
+        if search:
+            order_by = f"ORDER BY {search[2]},descid,{commits_table}.ci_when DESC"
+        else:
+            if query.sort == "author":
+                tableList.append(("people", f"({commits_table}.whoid=people.id)"))
+            elif query.sort == "file":
+                tableList.append(("files", f"({commits_table}.fileid=files.id)"))
+            order_by = "ORDER BY " + ",".join(
+                f"{self.SQLPageKeyColumn(commits_table, column)} {direction}"
+                for column, direction in page_keys
+            )
+            if query.page_after:
+                condList.append(self.SQLPageCondition(commits_table, page_keys, query.page_after))
 
         # exclude duplicates from the table list, and split out join
         # conditions from table names.  In future, the join conditions
@@ -495,12 +807,57 @@ Values were:
         sql = f"SELECT {commits_table}.* FROM {tables} {conditions} {order_by} {limit}"
         return sql
 
+    def GetPageKeys(self, query):
+        """Return the PAGE_KEYS by which the results of QUERY are ordered,
+        or None if they are ordered by relevance instead (in which case
+        they can't be paged through)."""
+        if query.sort == "relevance" and self.FullTextSearch(query):
+            return None
+        return PAGE_KEYS.get(query.sort, PAGE_KEYS["date"])
+
+    def SQLPageKeyColumn(self, commits_table, column):
+        if column == "descid":
+            # Commits recorded without a description would otherwise break
+            # the comparisons below.
+            return f"COALESCE({commits_table}.descid,0)"
+        return f"{commits_table}.{column}"
+
+    def SQLPageCondition(self, commits_table, page_keys, values):
+        """Return a SQL condition selecting the rows which come after the
+        row whose PAGE_KEYS columns have VALUES, in the order PAGE_KEYS
+        describes."""
+        literals = []
+        for (column, direction), value in zip(page_keys, values):
+            if isinstance(value, int):
+                literals.append(str(value))
+            else:
+                literals.append(self.db.literal(value))
+        terms = []
+        for i in range(len(page_keys)):
+            column, direction = page_keys[i]
+            equal = [
+                f"{self.SQLPageKeyColumn(commits_table, page_keys[j][0])}={literals[j]}"
+                for j in range(i)
+            ]
+            op = direction == "DESC" and "<" or ">"
+            equal.append(f"{self.SQLPageKeyColumn(commits_table, column)}{op}{literals[i]}")
+            terms.append(f"({' AND '.join(equal)})")
+        # The redundant bound on the leading column lets the database find
+        # the page's rows with a range scan of its index.
+        column, direction = page_keys[0]
+        op = direction == "DESC" and "<=" or ">="
+        first = f"{self.SQLPageKeyColumn(commits_table, column)}{op}{literals[0]}"
+        return f"({first} AND ({' OR '.join(terms)}))"
+
     def RunQuery(self, query):
         sql = self.CreateSQLQueryString(query, 1)
         cursor = self.db.cursor()
         cursor.execute(sql)
         query.SetExecuted()
+        page_keys = self.GetPageKeys(query)
         row_count = 0
+        commits = []
+        last_row = None
 
         while 1:
             row = cursor.fetchone()
@@ -509,7 +866,10 @@ Values were:
             row_count = row_count + 1
             if query.limit and (row_count > query.limit):
                 query.SetLimitReached()
+                if page_keys and last_row:
+                    query.SetNextPageKey(_page_key_values(page_keys, last_row))
                 break
+            last_row = row
 
             (
                 dbType,
@@ -543,9 +903,46 @@ Values were:
             commit.SetPlusCount(dbAddedLines)
             commit.SetMinusCount(dbRemovedLines)
             commit.SetDescriptionID(dbDescID)
-
+            commits.append(commit)
+
+        # Rather than let each commit look up its author, file, and so on
+        # as they are needed (one query apiece), fetch them all up front.
+        self.prefetch("people", "who", [commit.GetAuthorID() for commit in commits])
+        self.prefetch("repositories", "repository", [c.GetRepositoryID() for c in commits])
+        self.prefetch("dirs", "dir", [commit.GetDirectoryID() for commit in commits])
+        self.prefetch("files", "file", [commit.GetFileID() for commit in commits])
+        self.prefetch("branches", "branch", [commit.GetBranchID() for commit in commits])
+        self.prefetch("descs", "description", [c.GetDescriptionID() for c in commits])
+
+        for commit in commits:
             query.AddCommit(commit)
 
+    def GetLatestRevision(self, repository):
+        """Return the highest (numeric, Subversion-style) revision of the
+        commits recorded for REPOSITORY, or None if there are none."""
+        repository_id = self.GetRepositoryID(repository, 0)
+        if repository_id is None:
+            return None
+
+        # Revision numbers are stored as strings.  Without leading zeros,
+        # longer ones are greater, and those of equal length compare
+        # like strings do.
+        sql = (
+            f"SELECT revision FROM {self.GetCommitsTable()} WHERE repositoryid=%s "
+            "ORDER BY LENGTH(revision) DESC, revision DESC LIMIT 1"
+        )
+        sql_args = (repository_id,)
+        cursor = self.db.cursor()
+        cursor.execute(sql, sql_args)
+        try:
+            (revision,) = cursor.fetchone()
+        except TypeError:
+            return None
+        try:
+            return int(revision)
+        except ValueError:
+            return None
+
     def CheckCommit(self, commit):
         repository_id = self.GetRepositoryID(commit.GetRepository(), 0)
         if repository_id is None:
@@ -618,6 +1015,7 @@ Values were:
             self.sql_purge("branches", "id", "branchid", "commits")
             self.sql_purge("descs", "id", "descid", "commits")
             self.sql_purge("people", "id", "whoid", "commits")
+            self.BumpGeneration()
         else:
             sql = (
                 "SELECT type, ci_when, whoid, repositoryid, dirid, fileid, revision, stickytag, "
@@ -658,11 +1056,167 @@ Values were:
 
         # Reset all internal id caches.  We could be choosier here,
         # but let's just be as safe as possible.
-        self._get_cache = {}
-        self._get_id_cache = {}
+        self._get_cache.clear()
+        self._get_id_cache.clear()
         self._desc_id_cache = {}
 
 
+# BulkCommitLoader feeds commits to a CheckinDatabase in batches, for the
+# sake of bulk loads (such as rebuilds of a repository's commits), and
+# keeps some statistics about its progress.
+class BulkCommitLoader:
+    def __init__(self, db, batch_size=1000, progress_cb=None):
+        """Add commits to the CheckinDatabase DB, BATCH_SIZE commits at a
+        time.  PROGRESS_CB, if not None, is called with this loader after
+        each batch is added."""
+        self.db = db
+        self.batch_size = max(batch_size, 1)
+        self.progress_cb = progress_cb
+        self.pending = []
+        self.commit_count = 0
+        self.batch_count = 0
+        self.start_time = time.time()
+
+    def AddCommit(self, commit):
+        self.pending.append(commit)
+        if len(self.pending) >= self.batch_size:
+            self.Flush()
+
+    def Flush(self):
+        """Add the commits not yet added to the database."""
+        if not self.pending:
+            return
+        self.db.AddCommitList(self.pending)
+        if not self.batch_count:
+            # Bulk loads usually refill a purged repository; have pooled
+            # connections drop whatever they looked up in the meantime.
+            self.db.BumpGeneration()
+        self.commit_count = self.commit_count + len(self.pending)
+        self.batch_count = self.batch_count + 1
+        self.pending = []
+        if self.progress_cb:
+            self.progress_cb(self)
+
+    def GetElapsedTime(self):
+        return time.time() - self.start_time
+
+    def GetRate(self):
+        """Return the number of commits added per second so far."""
+        return self.commit_count / max(self.GetElapsedTime(), 0.001)
+
+
+# PooledCheckinDatabase is a read-only CheckinDatabase whose connection
+# belongs to a ConnectionPool, and which shares that pool's lookup caches.
+class PooledCheckinDatabase(CheckinDatabase):
+    def __init__(self, pool, host, port, user, passwd, database, backend):
+        CheckinDatabase.__init__(self, host, port, user, passwd, database, backend, 1)
+        self._pool = pool
+        self._get_cache = pool.get_cache
+        self._get_id_cache = pool.get_id_cache
+
+    def Close(self):
+        """Return the connection to the pool it came from."""
+        self._pool.release(self)
+
+
+# ConnectionPool keeps read-only connections to a commits database open
+# for reuse across the requests a long-lived ViewVC process serves, so
+# that each request needn't connect (and check the database's schema
+# version) anew.
+class ConnectionPool:
+    def __init__(self, host, port, user, passwd, database, backend, max_size, cache_size):
+        """Create a pool of at most MAX_SIZE connections to DATABASE (see
+        CheckinDatabase), whose connections share lookup caches of at
+        most CACHE_SIZE entries each."""
+        self._params = (host, port, user, passwd, database, backend)
+        self.max_size = max(max_size, 1)
+        self.get_cache = LookupCache(cache_size)
+        self.get_id_cache = LookupCache(cache_size)
+        self._version = None
+        self._generation = None  # the database's, when the caches were last checked
+        self._idle = []  # of (db, time returned) pairs
+        self._count = 0  # connections open, in use or idle
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=POOL_TIMEOUT):
+        """Return a connected PooledCheckinDatabase, waiting up to TIMEOUT
+        seconds for one to be returned if all MAX_SIZE are in use.  The
+        caller must Close() it when done, to return it to the pool."""
+        deadline = time.time() + timeout
+        with self._cond:
+            while not self._idle and self._count >= self.max_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise ConnectionPoolTimeoutError(
+                        f"All {self.max_size} commits database connections are in use"
+                    )
+                self._cond.wait(remaining)
+            if self._idle:
+                db, returned = self._idle.pop()
+            else:
+                db = None
+                self._count = self._count + 1
+
+        # Connections may have been dropped by the server (or the network)
+        # while idle, so check those idle for a while before reuse.
+        if db is not None and time.time() - returned > POOL_CHECK_INTERVAL and not db.Ping():
+            self._close(db)
+            db = None
+            with self._cond:
+                self._count = self._count + 1
+        if db is None:
+            db = PooledCheckinDatabase(self, *self._params)
+            try:
+                db.Connect(self._version)
+            except Exception:
+                with self._cond:
+                    self._count = self._count - 1
+                    self._cond.notify()
+                raise
+            self._version = db._version
+
+        # Rows may have been purged since the lookup caches were filled:
+        # drop them if the database's generation (see BumpGeneration())
+        # has changed.
+        try:
+            generation = db.GetMetadataValue("generation")
+        except Exception:
+            self._close(db)
+            raise
+        with self._cond:
+            if generation != self._generation:
+                self.get_cache.clear()
+                self.get_id_cache.clear()
+                self._generation = generation
+        return db
+
+    def release(self, db):
+        """Return DB, handed out by acquire(), to the pool."""
+        try:
+            # Don't hold on to any read transaction the request left open.
+            db.db.rollback()
+        except Exception:
+            self._close(db)
+            return
+        with self._cond:
+            self._idle.append((db, time.time()))
+            self._cond.notify()
+
+    def _close(self, db):
+        """Close DB, handed out by acquire(), for good."""
+        try:
+            db.db.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._count = self._count - 1
+            self._cond.notify()
+
+
+class ConnectionPoolTimeoutError(Exception):
+    pass
+
+
 class DatabaseVersionError(Exception):
     pass
 
@@ -873,6 +1427,11 @@ class CheckinDatabaseQuery:
         self.limit = None
         self.limit_reached = 0
 
+        # page keys of the row after which to start, and of the last row
+        # returned if there are more (see PAGE_KEYS)
+        self.page_after = None
+        self.next_page_key = None
+
         # list of commits -- filled in by CVS query
         self.commit_list = []
 
@@ -937,6 +1496,20 @@ class CheckinDatabaseQuery:
         assert self.executed
         return self.limit_reached
 
+    def SetPageAfter(self, page_key):
+        """Return only the results which come after the one with the
+        PAGE_KEY returned by an earlier run's GetNextPageKey()."""
+        self.page_after = page_key
+
+    def SetNextPageKey(self, page_key):
+        self.next_page_key = page_key
+
+    def GetNextPageKey(self):
+        """Return the page key of the last result returned, if the limit
+        was reached and there are more results, or else None."""
+        assert self.executed
+        return self.next_page_key
+
     def GetCommitList(self):
         assert self.executed
         return self.commit_list
@@ -960,12 +1533,52 @@ def ConnectDatabase(cfg, readonly=0):
     else:
         user = cfg.cvsdb.user
         passwd = cfg.cvsdb.passwd
-    db = CheckinDatabase(cfg.cvsdb.host, cfg.cvsdb.port, user, passwd, cfg.cvsdb.database_name)
+    db = CheckinDatabase(
+        cfg.cvsdb.host,
+        cfg.cvsdb.port,
+        user,
+        passwd,
+        cfg.cvsdb.database_name,
+        cfg.cvsdb.backend,
+        readonly,
+    )
     db.Connect()
     return db
 
 
+# The read-only connection pools of this process, keyed on the
+# database's connection parameters.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def GetConnectionPool(cfg):
+    """Return this process's pool of read-only connections to the commits
+    database CFG describes, creating it if necessary."""
+    params = (
+        cfg.cvsdb.host,
+        cfg.cvsdb.port,
+        cfg.cvsdb.readonly_user,
+        cfg.cvsdb.readonly_passwd,
+        cfg.cvsdb.database_name,
+        cfg.cvsdb.backend,
+    )
+    with _pools_lock:
+        pool = _pools.get(params)
+        if pool is None:
+            pool = _pools[params] = ConnectionPool(
+                *params, cfg.cvsdb.pool_size, cfg.cvsdb.lookup_cache_size
+            )
+        return pool
+
+
 def ConnectDatabaseReadOnly(cfg):
+    """Return a read-only CheckinDatabase, connected to the commits
+    database.  Its Close() method should be called when done with it:
+    when cfg.cvsdb.pool_size is not 0, the connection comes from (and
+    goes back to) this process's pool of them."""
+    if cfg.cvsdb.pool_size > 0:
+        return GetConnectionPool(cfg).acquire()
     return ConnectDatabase(cfg, 1)
 
 
@@ -1023,6 +1636,97 @@ def GetUnrecordedCommitList(repository, path_parts, db):
 _re_likechars = re.compile(r"([_%\\])")
 
 
+_re_glob_bracket = re.compile(r"\[!?\]?[^\]]*\]")
+_re_fulltext_word = re.compile(r"([^\W_]+)(\*?)")
+
+
+def FullTextTerms(data, match):
+    """Return the words which every description matched by the comment
+    search DATA must contain, as a list of (WORD, PREFIX) pairs, PREFIX
+    being true if WORD need only start a word of the description.  Only
+    "exact" and "glob" searches, which match whole descriptions, have
+    such words; for other MATCH types, return an empty list.
+
+    Words are the runs of letters and digits which a search places
+    between whitespace (or the start or end of the description), so
+    that full-text indexes of any flavor split descriptions into the
+    same words."""
+    if match == "glob":
+        # Bracket expressions may hold whitespace, so they're treated as
+        # the single-character wildcard they are.
+        data = _re_glob_bracket.sub("?", data)
+    elif match != "exact":
+        return []
+    terms = []
+    for chunk in data.split():
+        word = _re_fulltext_word.fullmatch(chunk)
+        if word is None or (word.group(2) and match != "glob"):
+            continue
+        terms.append((word.group(1), bool(word.group(2))))
+    return terms
+
+
+# Positions of the columns of the commits table in its rows.
+_commits_columns = {
+    "ci_when": 1,
+    "whoid": 2,
+    "repositoryid": 3,
+    "dirid": 4,
+    "fileid": 5,
+    "revision": 6,
+    "descid": 11,
+}
+
+_re_page_datetime = re.compile("[0-9]{4}-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9]$")
+
+
+def _page_key_values(page_keys, row):
+    """Return the values of the PAGE_KEYS columns of the commits table ROW."""
+    values = []
+    for column, direction in page_keys:
+        value = row[_commits_columns[column]]
+        if column == "ci_when":
+            if not isinstance(value, str):
+                value = value.strftime("%Y-%m-%d %H:%M:%S")
+        elif column == "revision":
+            value = str(value)
+        else:
+            value = int(value or 0)
+        values.append(value)
+    return tuple(values)
+
+
+def EncodePageKey(page_key):
+    """Return the page key PAGE_KEY (see CheckinDatabaseQuery) as a string
+    suitable for use in a URL."""
+    data = json.dumps(page_key, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def DecodePageKey(token, sort):
+    """Return the page key which EncodePageKey() encoded as TOKEN, for a
+    query using the sort method SORT.  Raise ValueError if TOKEN isn't
+    one."""
+    page_keys = PAGE_KEYS.get(sort, PAGE_KEYS["date"])
+    try:
+        data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(data.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("invalid page key")
+    if not isinstance(values, list) or len(values) != len(page_keys):
+        raise ValueError("invalid page key")
+    for (column, direction), value in zip(page_keys, values):
+        if column == "ci_when":
+            ok = isinstance(value, str) and _re_page_datetime.match(value)
+        elif column == "revision":
+            ok = isinstance(value, str)
+        else:
+            ok = isinstance(value, int) and not isinstance(value, bool)
+        if not ok:
+            raise ValueError("invalid page key")
+    return tuple(values)
+
+
 def EscapeLike(literal):
     """Escape literal string for use in a MySQL LIKE pattern"""
     return re.sub(_re_likechars, r"\\\1", literal)
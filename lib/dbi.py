@@ -10,25 +10,34 @@
 #
 # -----------------------------------------------------------------------
 
+import os
 import time
 import re
 import calendar
 
-# Try to import a MySQL database connector.  PyMySQL is the recommended
-# connector for Python 3, but mysqlclient is also supported.
-try:
-    import pymysql
 
-    pymysql.install_as_MySQLdb()
-    import pymysql as MySQLdb
-except ImportError:
+def _import_connector():
+    """Import and return a MySQL database connector.  PyMySQL is the
+    recommended connector for Python 3, but mysqlclient is also supported.
+    (This is done on demand so that the rest of this module, and cvsdb,
+    can be used with other connections.)"""
+
     try:
-        import MySQLdb
+        import pymysql
+
+        pymysql.install_as_MySQLdb()
+        return pymysql
     except ImportError:
-        raise ImportError(
-            "No MySQL database connector available.  Please install either"
-            "the 'PyMySQL' or 'mysqlclient' package."
-        )
+        try:
+            import MySQLdb
+
+            return MySQLdb
+        except ImportError:
+            raise ImportError(
+                "No MySQL database connector available.  Please install either"
+                "the 'PyMySQL' or 'mysqlclient' package."
+            )
+
 
 # set to 1 to store commit times in UTC, or 0 to use the ViewVC machine's
 # local timezone. Using UTC is recommended because it ensures that the
@@ -77,12 +86,211 @@ def TicksFromDateTime(datetime):
         return time.mktime(t[:8] + (-1,))
 
 
-def connect(host, port, user, passwd, db):
-    # on Python 3, mysqlclient supports only utf-8 connection.
-    # (https://github.com/PyMySQL/mysqlclient-python/issues/210)
-    # however, it seems to use charset 'latin-1' by default (only me?)
-    extra_args = {"user": user, "passwd": passwd, "db": db, "charset": "utf8mb4"}
-    if not host and isinstance(port, str):
-        return MySQLdb.connect(unix_socket=port, **extra_args)
-    else:
-        return MySQLdb.connect(host=host, port=port, **extra_args)
+# Query database backends, selected by the [cvsdb] 'backend' option.
+BACKENDS = ("mysql", "sqlite")
+
+
+class MySQLConnection:
+    """A connection to a MySQL query database.  This, and SQLiteConnection,
+    wrap a DB-API connection, and provide the bits of SQL whose spelling
+    varies between the database backends cvsdb supports."""
+
+    backend = "mysql"
+    table_list_sql = "SHOW TABLES"
+    begin_sql = "START TRANSACTION"
+    insert_ignore_sql = "INSERT IGNORE"
+    like_escape_sql = ""
+
+    # InnoDB's default full-text stopwords, and its shortest indexed word
+    # length.  Requiring any such word to match would find nothing.
+    fulltext_stopwords = frozenset(
+        "a about an are as at be by com de en for from how i in is it la of on or"
+        " that the this to was what when where who will with und www".split()
+    )
+    fulltext_min_length = 3
+
+    def __init__(self, host, port, user, passwd, db):
+        # on Python 3, mysqlclient supports only utf-8 connection.
+        # (https://github.com/PyMySQL/mysqlclient-python/issues/210)
+        # however, it seems to use charset 'latin-1' by default (only me?)
+        MySQLdb = _import_connector()
+        extra_args = {"user": user, "passwd": passwd, "db": db, "charset": "utf8mb4"}
+        if not host and isinstance(port, str):
+            self.db = MySQLdb.connect(unix_socket=port, **extra_args)
+        else:
+            self.db = MySQLdb.connect(host=host, port=port, **extra_args)
+        self.db.cursor().execute("SET AUTOCOMMIT=1")
+
+    def cursor(self):
+        return self.db.cursor()
+
+    def commit(self):
+        self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
+
+    def close(self):
+        self.db.close()
+
+    def literal(self, value):
+        """Return VALUE quoted as a SQL string literal."""
+        # Some interfaces (such as mysqlclient) return bytestrings
+        # from the literal() call; others (like PyMySQL) do not.
+        # So we'll just detect and decode where necessary.
+        #
+        # Strictly speaking, we shouldn't even be using literal(),
+        # which not a part of the public interface.  But, yeah, we do.
+        value = self.db.literal(value)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return value
+
+    def fulltext_search(self, terms):
+        """Return (TABLES, CONDITION, ORDER), which select the rows of the
+        descs table whose descriptions contain all the words in TERMS, and
+        order them by relevance, best first.  TABLES is a list of (TABLE,
+        JOIN_CONDITION) pairs to add to the query, and CONDITION and ORDER
+        are SQL expressions.  TERMS is a list of (WORD, PREFIX) pairs,
+        PREFIX being true if WORD need only start a word of the
+        description.  Return None if none of TERMS can be searched for."""
+        words = []
+        for word, prefix in terms:
+            if (
+                len(word) >= self.fulltext_min_length
+                and word.lower() not in self.fulltext_stopwords
+            ):
+                words.append("+" + word + (prefix and "*" or ""))
+        if not words:
+            return None
+        match = (
+            f"MATCH (descs.description) AGAINST ({self.literal(' '.join(words))} IN BOOLEAN MODE)"
+        )
+        return [], match, f"{match} DESC"
+
+
+class SQLiteCursor:
+    """A DB-API cursor on a SQLite database, which takes "%s" parameter
+    markers as MySQL's connectors do."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, sql, args=None):
+        # Statements run without arguments may hold literals containing
+        # "%s", so only translate the parameter markers of the others.
+        if args is None:
+            self.cursor.execute(sql)
+        else:
+            self.cursor.execute(sql.replace("%s", "?"), args)
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self.cursor.fetchmany()
+        return self.cursor.fetchmany(size)
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    def close(self):
+        self.cursor.close()
+
+
+def _sqlite_regexp(pattern, value):
+    """Implement "VALUE REGEXP PATTERN" for SQLite."""
+    if pattern is None or value is None:
+        return None
+    return re.search(pattern, value) is not None
+
+
+class SQLiteConnection:
+    """A connection to a SQLite query database, stored in the file PATH.
+
+    The database is put in write-ahead logging mode, so that the query
+    view can read it while the commit hooks and admin scripts write to
+    it.  LIKE is made case-sensitive, and REGEXP is provided by Python's
+    re module, to match the MySQL schema's binary collation."""
+
+    backend = "sqlite"
+    table_list_sql = "SELECT name FROM sqlite_master WHERE type='table'"
+    begin_sql = "BEGIN"
+    insert_ignore_sql = "INSERT OR IGNORE"
+    like_escape_sql = " ESCAPE '\\'"
+
+    # How long to wait for other writers to finish, in seconds.
+    timeout = 60
+
+    def __init__(self, path, readonly=0):
+        import sqlite3
+
+        if not os.path.exists(path):
+            # Don't let a misconfiguration create an empty database.
+            raise sqlite3.OperationalError(f"SQLite database '{path}' does not exist")
+        self.db = sqlite3.connect(
+            path, timeout=self.timeout, isolation_level=None, check_same_thread=False
+        )
+        self.db.create_function("REGEXP", 2, _sqlite_regexp, deterministic=True)
+        self.db.execute("PRAGMA case_sensitive_like=ON")
+        self.db.execute("PRAGMA foreign_keys=OFF")
+        if readonly:
+            self.db.execute("PRAGMA query_only=ON")
+        elif self.db.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+            self.db.execute("PRAGMA journal_mode=WAL")
+        # WAL mode is crash safe without a sync on every commit.
+        self.db.execute("PRAGMA synchronous=NORMAL")
+
+    def cursor(self):
+        return SQLiteCursor(self.db.cursor())
+
+    def commit(self):
+        if self.db.in_transaction:
+            self.db.execute("COMMIT")
+
+    def rollback(self):
+        if self.db.in_transaction:
+            self.db.execute("ROLLBACK")
+
+    def close(self):
+        self.db.close()
+
+    def literal(self, value):
+        """Return VALUE quoted as a SQL string literal."""
+        return "'" + value.replace("'", "''") + "'"
+
+    def fulltext_search(self, terms):
+        """Return (TABLES, CONDITION, ORDER), which select the rows of the
+        descs table whose descriptions contain all the words in TERMS, and
+        order them by relevance, best first.  See
+        MySQLConnection.fulltext_search()."""
+        if not terms:
+            return None
+        query = " ".join(f'"{word}"' + (prefix and "*" or "") for word, prefix in terms)
+        # Joining the FTS table (rather than testing "descs.id IN (...)")
+        # lets SQLite's planner start from the matching descriptions even
+        # when the database has never been analyzed.
+        return (
+            [("descs_fts", "(descs_fts.rowid=descs.id)")],
+            f"(descs_fts MATCH {self.literal(query)})",
+            "descs_fts.rank",
+        )
+
+
+def connect(host, port, user, passwd, db, backend="mysql", readonly=0):
+    """Connect to the query database DB, using the database backend
+    BACKEND (one of BACKENDS), and return a MySQLConnection or
+    SQLiteConnection.  For the SQLite backend, DB is the path of the
+    database file, and HOST, PORT, USER and PASSWD are unused; READONLY
+    makes the connection refuse to change the database."""
+
+    if backend == "sqlite":
+        return SQLiteConnection(db, readonly)
+    if backend != "mysql":
+        raise ValueError(f"Unknown query database backend '{backend}'")
+    return MySQLConnection(host, port, user, passwd, db)
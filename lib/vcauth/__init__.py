@@ -45,6 +45,26 @@ class GenericViewVCAuthorizer:
         repository ROOTNAME."""
         pass
 
+    def check_children_access(self, rootname, path_parts, children, rev=None):
+        """Return a list of the results of check_path_access() for each of
+        the children of the directory PATH_PARTS in repository ROOTNAME
+        given, as (NAME, PATHTYPE) tuples, in CHILDREN.  Authorizers which
+        can check a directory's children more cheaply all at once than one
+        by one should override this."""
+        return [
+            self.check_path_access(rootname, path_parts + [name], pathtype, rev)
+            for name, pathtype in children
+        ]
+
+    def check_subtree_access(self, rootname, path_parts, rev=None):
+        """Return 1 if the associated username is permitted to read
+        revision REV of the path PATH_PARTS in repository ROOTNAME and of
+        every path below it, 0 if the associated username is prohibited
+        from reading any of them, or None if no such determination can be
+        made.  Callers may skip checking paths within a subtree for which
+        this returns 1 or 0."""
+        return None
+
 
 ##############################################################################
 
@@ -60,3 +80,9 @@ class ViewVCAuthorizer(GenericViewVCAuthorizer):
 
     def check_path_access(self, rootname, path_parts, pathtype, rev=None):
         return 1
+
+    def check_children_access(self, rootname, path_parts, children, rev=None):
+        return [1] * len(children)
+
+    def check_subtree_access(self, rootname, path_parts, rev=None):
+        return 1
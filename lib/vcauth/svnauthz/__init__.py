@@ -12,16 +12,338 @@
 # (c) 2006 Sergey Lapin <slapin@dataart.com>
 
 import vcauth
+import os
 import os.path
+import threading
+from collections import OrderedDict
 from common import ViewVCException
 from configparser import ConfigParser
 
+# Maximum number of (username, repository) PathAccess trees memoized for each
+# compiled authz file.
+PATHS_CACHE_SIZE = 1000
+
+
+class _RuleList:
+    """The access sections of an authz file which apply to one
+    repository (or to all of them), in file order, indexed by the user
+    specifications which appear in them."""
+
+    def __init__(self):
+        self.sections = []  # [(path, [(userspec, allow), ...]), ...]
+        self.index = {}  # {userspec -> [section index, ...]}
+        self.inverted = []  # [index of section with "~" userspecs, ...]
+
+    def add(self, path, rules):
+        idx = len(self.sections)
+        self.sections.append((path, rules))
+        for userspec, allow in rules:
+            if userspec[0:1] == "~":
+                if not self.inverted or self.inverted[-1] != idx:
+                    self.inverted.append(idx)
+                continue
+            indices = self.index.setdefault(userspec, [])
+            if not indices or indices[-1] != idx:
+                indices.append(idx)
+
+    def apply(self, paths, userspecs, matches):
+        """Record in PATHS the access determinations of the sections for
+        the user whom the set of user specifications USERSPECS (exactly)
+        and the function MATCHES (for specifications in general) apply
+        to."""
+        candidates = set(self.inverted)
+        for userspec in userspecs:
+            candidates.update(self.index.get(userspec, ()))
+        for idx in sorted(candidates):
+            path, rules = self.sections[idx]
+
+            # Figure if this path is explicitly allowed or denied to the
+            # user.  (Entry order is not relevant -- we'll use the most
+            # permissive entry, meaning one 'allow' is all we need.)
+            allow = deny = 0
+            for userspec, rule_allow in rules:
+                if matches(userspec):
+                    allow = rule_allow
+                    deny = not allow
+                    if allow:
+                        break
+            if allow or deny:
+                paths[path] = allow
+
+
+def _build_path_tree(rule_lists):
+    """Return a tree of the path components of the section paths in the
+    _RuleLists RULE_LISTS.  Each node is [path, {name -> child node},
+    [the section paths strictly below the node]]."""
+    root = ["/", {}, []]
+    for rule_list in rule_lists:
+        for path, rules in rule_list.sections:
+            if path == "/":
+                continue
+            node = root
+            for part in path[1:].split("/"):
+                node[2].append(path)
+                child = node[1].get(part)
+                if child is None:
+                    child = node[1][part] = [node[0].rstrip("/") + "/" + part, {}, []]
+                node = child
+    return root
+
+
+class PathAccess:
+    """The access determinations of one user for the paths of one
+    repository, along with the tree of that repository's section paths,
+    so that a path (or all the children of a directory) can be checked
+    with a single walk down from the root."""
+
+    def __init__(self, paths, tree):
+        """PATHS is a dictionary mapping the paths with an explicit access
+        determination to that determination, and TREE is the tree of
+        section paths (see _build_path_tree()) which includes them."""
+        self.paths = paths
+        self.tree = tree
+
+    def _lookup(self, path_parts):
+        # Return the tree node for PATH_PARTS (or None if no section is
+        # for it, nor for anything below it) and its effective access.
+        paths = self.paths
+        node = self.tree
+        access = paths.get("/", 0)
+        for part in path_parts:
+            node = node[1].get(part)
+            if node is None:
+                return None, access
+            access = paths.get(node[0], access)
+        return node, access
+
+    def check(self, path_parts):
+        """Return the access determination for PATH_PARTS."""
+        return self._lookup(path_parts)[1]
+
+    def check_children(self, path_parts, names):
+        """Return a list of the access determinations for the children
+        NAMES of the directory PATH_PARTS."""
+        node, access = self._lookup(path_parts)
+        if node is None or not node[1]:
+            return [access] * len(names)
+        paths = self.paths
+        results = []
+        for name in names:
+            child = node[1].get(name)
+            if child is None:
+                results.append(access)
+            else:
+                results.append(paths.get(child[0], access))
+        return results
+
+    def check_subtree(self, path_parts):
+        """Return the access determination for PATH_PARTS if it applies
+        to everything below PATH_PARTS too, or else None."""
+        node, access = self._lookup(path_parts)
+        if node is None:
+            return access
+        paths = self.paths
+
+        # Look through whichever is shorter: the section paths below the
+        # node, or the paths this user has access determinations for.
+        found = {bool(access)}
+        if len(node[2]) < len(paths):
+            for path in node[2]:
+                if path in paths:
+                    found.add(paths[path])
+        else:
+            prefix = node[0].rstrip("/") + "/"
+            for path, path_access in paths.items():
+                if path.startswith(prefix):
+                    found.add(path_access)
+        if len(found) == 1:
+            return access
+        return None
+
+
+class CompiledAuthz:
+    """An authz file, parsed and indexed for quick derivation of the
+    paths each user can and can't read."""
+
+    def __init__(self, cp):
+        """Compile the authz file which the ConfigParser CP has read."""
+
+        # {alias -> username}
+        self.aliases = {}
+        if cp.has_section("aliases"):
+            for alias in cp.options("aliases"):
+                self.aliases[alias] = cp.get("aliases", alias)
+
+        # The groups directly containing each user, each alias, and each
+        # other group.
+        self.user_groups = {}
+        self.alias_groups = {}
+        self.group_groups = {}
+        if cp.has_section("groups"):
+            for group in cp.options("groups"):
+                groupname = group.strip()
+                for entry in cp.get("groups", group).split(","):
+                    entry = entry.strip()
+                    if entry[0:1] == "@":
+                        containers = self.group_groups.setdefault(entry[1:], [])
+                    elif entry[0:1] == "&":
+                        containers = self.alias_groups.setdefault(entry[1:], [])
+                    else:
+                        containers = self.user_groups.setdefault(entry, [])
+                    containers.append(groupname)
+
+        # Root-agnostic access sections, and root-specific ones by
+        # repository name.
+        self.common_rules = _RuleList()
+        self.repo_rules = {}
+        for section in cp.sections():
+            if section == "groups" or section == "aliases":
+                continue
+            if section.find(":") == -1:
+                rules = self.common_rules
+                path = section
+            else:
+                name, path = section.split(":", 1)
+                rules = self.repo_rules.get(name)
+                if rules is None:
+                    rules = self.repo_rules[name] = _RuleList()
+            if path != "/":
+                path = "/" + "/".join(filter(None, path.split("/")))
+            rules.add(
+                path,
+                [
+                    (user.strip(), cp.get(section, user).find("r") != -1)
+                    for user in cp.options(section)
+                ],
+            )
+
+        self._path_trees = {}  # {repository name or None -> path tree}
+        self._paths_cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_memberships(self, username):
+        """Return the aliases and the groups of USERNAME, as two sets."""
+        aliases = set()
+        for alias, value in self.aliases.items():
+            if value == username:
+                aliases.add(alias)
+
+        # A user belongs to the groups which list the user or one of the
+        # user's aliases, and to every group containing one of those.
+        groups = set()
+        pending = list(self.user_groups.get(username, ()))
+        for alias in aliases:
+            pending.extend(self.alias_groups.get(alias, ()))
+        while pending:
+            group = pending.pop()
+            if group not in groups:
+                groups.add(group)
+                pending.extend(self.group_groups.get(group, ()))
+        return aliases, groups
+
+    def _get_path_tree(self, repo_name):
+        # Return the tree of section paths which apply to the repository
+        # REPO_NAME, building it on first use.
+        if repo_name not in self.repo_rules:
+            repo_name = None
+        with self._lock:
+            tree = self._path_trees.get(repo_name)
+        if tree is None:
+            rule_lists = [self.common_rules]
+            if repo_name is not None:
+                rule_lists.append(self.repo_rules[repo_name])
+            tree = _build_path_tree(rule_lists)
+            with self._lock:
+                self._path_trees[repo_name] = tree
+        return tree
+
+    def get_path_access(self, username, repo_name):
+        """Return a PathAccess holding the access determinations for
+        USERNAME of the paths in the repository REPO_NAME, or None if
+        USERNAME can't read any path there.  The PathAccess is shared, so
+        must not be modified."""
+        key = (username, repo_name)
+        with self._lock:
+            if key in self._paths_cache:
+                self._paths_cache.move_to_end(key)
+                return self._paths_cache[key]
+
+        aliases, groups = self.get_memberships(username)
+        userspecs = {"*"}
+        if username is None:
+            userspecs.add("$anonymous")
+        else:
+            userspecs.add(username)
+            userspecs.add("$authenticated")
+        userspecs.update("@" + group for group in groups)
+        userspecs.update("&" + alias for alias in aliases)
+
+        def _userspec_matches_user(userspec):
+            # If there is an inversion character, recurse and return the
+            # opposite result.
+            if userspec[0:1] == "~":
+                return not _userspec_matches_user(userspec[1:])
+            return userspec in userspecs
+
+        # Figure out the root-agnostic access determinations, then
+        # superimpose those for this specific repository.
+        paths = {}
+        self.common_rules.apply(paths, userspecs, _userspec_matches_user)
+        if repo_name in self.repo_rules:
+            self.repo_rules[repo_name].apply(paths, userspecs, _userspec_matches_user)
+
+        # If the root isn't readable, there's no point in caring about all
+        # the specific paths the user can't see.
+        if True in paths.values():
+            access = PathAccess(paths, self._get_path_tree(repo_name))
+        else:
+            access = None
+
+        with self._lock:
+            self._paths_cache[key] = access
+            if len(self._paths_cache) > PATHS_CACHE_SIZE:
+                self._paths_cache.popitem(last=False)
+        return access
+
+
+# Compiled authz files, by path: (mtime_ns, size, CompiledAuthz).
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def get_compiled_authz(authz_file):
+    """Return the CompiledAuthz for the authz file at AUTHZ_FILE,
+    compiling it only if it has changed since it was last compiled."""
+    try:
+        st = os.stat(authz_file)
+        stamp = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        stamp = None
+    with _compiled_lock:
+        compiled = _compiled.get(authz_file)
+    if compiled and compiled[0] == stamp:
+        return compiled[1]
+
+    # Parse the authz file, replacing ConfigParser's optionxform()
+    # method with something that won't futz with the case of the
+    # option names.
+    cp = ConfigParser()
+    cp.optionxform = lambda x: x
+    try:
+        cp.read(authz_file)
+    except Exception:
+        raise ViewVCException("Unable to parse configured authzfile file")
+    authz = CompiledAuthz(cp)
+    with _compiled_lock:
+        _compiled[authz_file] = (stamp, authz)
+    return authz
+
 
 class ViewVCAuthorizer(vcauth.GenericViewVCAuthorizer):
     """Subversion authz authorizer module"""
 
     def __init__(self, root_lookup_func, username, params={}):
-        self.rootpaths = {}  # {root -> { paths -> access boolean for USERNAME }}
+        self.rootpaths = {}  # {root -> PathAccess for USERNAME, or None}
         self.root_lookup_func = root_lookup_func
 
         # Get the authz file location from exactly one of our related
@@ -55,184 +377,16 @@ class ViewVCAuthorizer(vcauth.GenericViewVCAuthorizer):
         if rootname in self.rootpaths:
             return self.rootpaths[rootname]
 
-        paths_for_root = {}
-
-        # Parse the authz file, replacing ConfigParser's optionxform()
-        # method with something that won't futz with the case of the
-        # option names.
-        cp = ConfigParser()
-        cp.optionxform = lambda x: x
-        try:
-            cp.read(self._get_authz_file(rootname))
-        except Exception:
-            raise ViewVCException("Unable to parse configured authzfile file")
+        # The authz file is compiled once (per change to it) for all
+        # requests and users; this user's paths are derived from that.
+        authz = get_compiled_authz(self._get_authz_file(rootname))
 
         # Ignore context; assume the authz file only has the repository URL's
         # basename, just like mod_dav_svn requires it.
         # Perhaps it's better to just use the repository directory's basename.
-        root_parts = rootname.split("/")
-        repo_name = root_parts[-1]
-
-        # Figure out if there are any aliases for the current username
-        aliases = []
-        if cp.has_section("aliases"):
-            for alias in cp.options("aliases"):
-                entry = cp.get("aliases", alias)
-                if entry == self.username:
-                    aliases.append(alias)
-
-        # Figure out which groups USERNAME has a part of.
-        groups = []
-        if cp.has_section("groups"):
-            all_groups = []
-
-            def _process_group(groupname):
-                """Inline function to handle groups within groups.
-
-                For a group to be within another group in SVN, the group
-                definitions must be in the correct order in the config file.
-                ie. If group A is a member of group B then group A must be
-                defined before group B in the [groups] section.
-
-                Unfortunately, the ConfigParser class provides no way of
-                finding the order in which groups were defined so, for reasons
-                of practicality, this function lets you get away with them
-                being defined in the wrong order.  Recursion is guarded
-                against though."""
-
-                # If we already know the user is part of this already-
-                # processed group, return that fact.
-                if groupname in groups:
-                    return 1
-                # Otherwise, ensure we don't process a group twice.
-                if groupname in all_groups:
-                    return 0
-                # Store the group name in a global list so it won't be processed again
-                all_groups.append(groupname)
-                group_member = 0
-                groupname = groupname.strip()
-                entries = cp.get("groups", groupname).split(",")
-                for entry in entries:
-                    entry = entry.strip()
-                    if entry == self.username:
-                        group_member = 1
-                        break
-                    elif entry[0:1] == "@" and _process_group(entry[1:]):
-                        group_member = 1
-                        break
-                    elif entry[0:1] == "&" and entry[1:] in aliases:
-                        group_member = 1
-                        break
-                if group_member:
-                    groups.append(groupname)
-                return group_member
-
-            # Process the groups
-            for group in cp.options("groups"):
-                _process_group(group)
-
-        def _userspec_matches_user(userspec):
-            # If there is an inversion character, recurse and return the
-            # opposite result.
-            if userspec[0:1] == "~":
-                return not _userspec_matches_user(userspec[1:])
-
-            # See if the userspec applies to our current user.
-            return (
-                userspec == "*"
-                or userspec == self.username
-                or (self.username is not None and userspec == "$authenticated")
-                or (self.username is None and userspec == "$anonymous")
-                or (userspec[0:1] == "@" and userspec[1:] in groups)
-                or (userspec[0:1] == "&" and userspec[1:] in aliases)
-            )
-
-        def _process_access_section(section):
-            """Inline function for determining user access in a single
-            config secction.  Return a two-tuple (ALLOW, DENY) containing
-            the access determination for USERNAME in a given authz file
-            SECTION (if any)."""
-
-            # Figure if this path is explicitly allowed or denied to USERNAME.
-            allow = deny = 0
-            for user in cp.options(section):
-                user = user.strip()
-                if _userspec_matches_user(user):
-                    # See if the 'r' permission is among the ones granted to
-                    # USER.  If so, we can stop looking.  (Entry order is not
-                    # relevant -- we'll use the most permissive entry, meaning
-                    # one 'allow' is all we need.)
-                    allow = cp.get(section, user).find("r") != -1
-                    deny = not allow
-                    if allow:
-                        break
-            return allow, deny
-
-        # Read the other (non-"groups") sections, and figure out in which
-        # repositories USERNAME or his groups have read rights.  We'll
-        # first check groups that have no specific repository designation,
-        # then superimpose those that have a repository designation which
-        # matches the one we're asking about.
-        root_sections = []
-        for section in cp.sections():
-
-            # Skip the "groups" section -- we handled that already.
-            if section == "groups":
-                continue
-
-            if section == "aliases":
-                continue
-
-            # Process root-agnostic access sections; skip (but remember)
-            # root-specific ones that match our root; ignore altogether
-            # root-specific ones that don't match our root.  While we're at
-            # it, go ahead and figure out the repository path we're talking
-            # about.
-            if section.find(":") == -1:
-                path = section
-            else:
-                name, path = section.split(":", 1)
-                if name == repo_name:
-                    root_sections.append(section)
-                continue
-
-            # Check for a specific access determination.
-            allow, deny = _process_access_section(section)
-
-            # If we got an explicit access determination for this path and this
-            # USERNAME, record it.
-            if allow or deny:
-                if path != "/":
-                    path = "/" + "/".join(filter(None, path.split("/")))
-                paths_for_root[path] = allow
-
-        # Okay.  Superimpose those root-specific values now.
-        for section in root_sections:
-
-            # Get the path again.
-            name, path = section.split(":", 1)
-
-            # Check for a specific access determination.
-            allow, deny = _process_access_section(section)
-
-            # If we got an explicit access determination for this path and this
-            # USERNAME, record it.
-            if allow or deny:
-                if path != "/":
-                    path = "/" + "/".join(filter(None, path.split("/")))
-                paths_for_root[path] = allow
-
-        # If the root isn't readable, there's no point in caring about all
-        # the specific paths the user can't see.  Just point the rootname
-        # to a None paths dictionary.
-        root_is_readable = 0
-        for path in paths_for_root.keys():
-            if paths_for_root[path]:
-                root_is_readable = 1
-                break
-        if not root_is_readable:
-            paths_for_root = None
+        repo_name = rootname.split("/")[-1]
 
+        paths_for_root = authz.get_path_access(self.username, repo_name)
         self.rootpaths[rootname] = paths_for_root
         return paths_for_root
 
@@ -241,46 +395,31 @@ class ViewVCAuthorizer(vcauth.GenericViewVCAuthorizer):
         return (paths is not None) and 1 or 0
 
     def check_universal_access(self, rootname):
-        paths = self._get_paths_for_root(rootname)
-        if not paths:  # None or empty.
-            return 0
+        # A universal denial is denial of the whole tree, and a universal
+        # allowance is an allowance of the whole tree (including, that
+        # is, the root directory itself).
+        return self.check_subtree_access(rootname, [])
 
-        # Search the access determinations.  If there's a mix, we can't
-        # claim a universal access determination.
-        found_allow = 0
-        found_deny = 0
-        for access in paths.values():
-            if access:
-                found_allow = 1
-            else:
-                found_deny = 1
-            if found_allow and found_deny:
-                return None
-
-        # We didn't find both allowances and denials, so we must have
-        # found one or the other.  Denials only is a universal denial.
-        if found_deny:
+    def check_path_access(self, rootname, path_parts, pathtype, rev=None):
+        # Walk down from the root of the repository toward the path
+        # represented by PATH_PARTS; the last explicit grant or denial of
+        # access along the way is the one which applies.
+        paths = self._get_paths_for_root(rootname)
+        if paths is None:
             return 0
+        return paths.check(path_parts)
 
-        # ... but allowances only is only a universal allowance if read
-        # access is granted to the root directory.
-        if found_allow and "/" in paths:
-            return 1
-
-        # Anything else is indeterminable.
-        return None
+    def check_children_access(self, rootname, path_parts, children, rev=None):
+        paths = self._get_paths_for_root(rootname)
+        if paths is None:
+            return [0] * len(children)
+        return paths.check_children(path_parts, [name for name, pathtype in children])
 
-    def check_path_access(self, rootname, path_parts, pathtype, rev=None):
-        # Crawl upward from the path represented by PATH_PARTS toward to
-        # the root of the repository, looking for an explicitly grant or
-        # denial of access.
+    def check_subtree_access(self, rootname, path_parts, rev=None):
         paths = self._get_paths_for_root(rootname)
         if paths is None:
             return 0
-        parts = path_parts[:]
-        while parts:
-            path = "/" + "/".join(parts)
-            if path in paths:
-                return paths[path]
-            del parts[-1]
-        return paths.get("/", 0)
+        access = paths.check_subtree(path_parts)
+        if access is None:
+            return None
+        return access and 1 or 0
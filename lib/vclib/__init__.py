@@ -543,6 +543,49 @@ def check_path_access(repos, path_parts, pathtype=None, rev=None):
     return auth.check_path_access(repos.rootname(), path_parts, pathtype, rev)
 
 
+def check_children_access(repos, path_parts, children, rev=None):
+    """Return a list of the results of check_path_access() for each of the
+    children of the directory PATH_PARTS in REPOS given, as (NAME,
+    PATHTYPE) tuples, in CHILDREN, as determined by consulting REPOS's
+    Authorizer object (if any) for all of them at once."""
+
+    auth = repos.authorizer()
+    if not auth:
+        return [1] * len(children)
+    return auth.check_children_access(repos.rootname(), path_parts, children, rev)
+
+
+def check_subtree_access(repos, path_parts, rev=None):
+    """Return 1 if the associated username is permitted to read revision
+    REV of PATH_PARTS in REPOS and everything below it, 0 if the username
+    may read none of it, or None if REPOS's Authorizer object can't tell
+    without checking each path."""
+
+    auth = repos.authorizer()
+    if not auth:
+        return 1
+    return auth.check_subtree_access(repos.rootname(), path_parts, rev)
+
+
+def common_path_parts(paths):
+    """Return the path components which all of the '/'-separated PATHS
+    have in common at their start."""
+
+    common = None
+    for path in paths:
+        parts = [x for x in path.split("/") if x]
+        if common is None:
+            common = parts
+            continue
+        i = 0
+        while i < len(common) and i < len(parts) and common[i] == parts[i]:
+            i = i + 1
+        del common[i:]
+        if not common:
+            break
+    return common or []
+
+
 if sys.platform == "win32":
 
     def _getfspath(path, encoding):
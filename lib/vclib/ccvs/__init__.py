@@ -67,18 +67,53 @@ def find_root_in_parent(parent_path, rootname, path_encoding):
 
 
 def CVSRepository(
-    name, rootpath, authorizer, utilities, use_rcsparse, content_encoding, path_encoding
+    name,
+    rootpath,
+    authorizer,
+    utilities,
+    use_rcsparse,
+    content_encoding,
+    path_encoding,
+    revision_cache=None,
+    dir_index=None,
+    rlog_jobs=1,
+    rcsparse_workers=0,
 ):
+    """Return a repository object for the CVS repository at ROOTPATH.
+
+    REVISION_CACHE, if not None, is a revcache.RevisionCache in which the
+    rcsparse-based implementation (used if USE_RCSPARSE is set) keeps
+    reconstructed revision texts.  DIR_INDEX, if not None, is a
+    dirindex.DirectoryIndex in which either implementation keeps the log
+    information it gathers for directory listings.  The rlog-based
+    implementation runs up to RLOG_JOBS rlog processes at once while
+    gathering it; the rcsparse-based one parses files in RCSPARSE_WORKERS
+    worker processes, if more than one."""
     rootpath = canonicalize_rootpath(rootpath)
     if use_rcsparse:
         from . import ccvs
 
         return ccvs.CCVSRepository(
-            name, rootpath, authorizer, utilities, content_encoding, path_encoding
+            name,
+            rootpath,
+            authorizer,
+            utilities,
+            content_encoding,
+            path_encoding,
+            revision_cache,
+            dir_index,
+            rcsparse_workers,
         )
     else:
         from . import bincvs
 
         return bincvs.BinCVSRepository(
-            name, rootpath, authorizer, utilities, content_encoding, path_encoding
+            name,
+            rootpath,
+            authorizer,
+            utilities,
+            content_encoding,
+            path_encoding,
+            dir_index,
+            rlog_jobs,
         )
@@ -35,7 +35,16 @@ def _path_join(path_parts):
 
 
 class BaseCVSRepository(vclib.Repository):
-    def __init__(self, name, rootpath, authorizer, utilities, content_encoding, path_encoding):
+    def __init__(
+        self,
+        name,
+        rootpath,
+        authorizer,
+        utilities,
+        content_encoding,
+        path_encoding,
+        dir_index=None,
+    ):
         if not os.path.isdir(vclib._getfspath(rootpath, path_encoding)):
             raise vclib.ReposNotFound(name)
 
@@ -45,6 +54,8 @@ class BaseCVSRepository(vclib.Repository):
         self.utilities = utilities
         self.content_encoding = content_encoding
         self.path_encoding = path_encoding
+        # A dirindex.DirectoryIndex for dirlogs() to use, if any.
+        self.dir_index = dir_index
 
         # See if this repository is even viewable, authz-wise.
         if not vclib.check_root_access(self):
@@ -105,8 +116,7 @@ class BaseCVSRepository(vclib.Repository):
                 name = file
             if not name:
                 continue
-            if vclib.check_path_access(self, path_parts + [name], kind, rev):
-                data.append(CVSDirEntry(name, kind, errors, 0))
+            data.append(CVSDirEntry(name, kind, errors, 0))
 
         full_name = os.path.join(full_name, "Attic")
         if os.path.isdir(self._getfspath(full_name)):
@@ -120,10 +130,57 @@ class BaseCVSRepository(vclib.Repository):
                     name = file
                 if not name:
                     continue
-                if vclib.check_path_access(self, path_parts + [name], kind, rev):
-                    data.append(CVSDirEntry(name, kind, errors, 1))
+                data.append(CVSDirEntry(name, kind, errors, 1))
 
-        return data
+        access = vclib.check_children_access(
+            self, path_parts, [(entry.name, entry.kind) for entry in data], rev
+        )
+        return [entry for entry, readable in zip(data, access) if readable]
+
+    def _indexed_logs(self, path_parts, rev, entries, subdirs, fetch):
+        """Fill in the log information of ENTRIES, in the directory
+        PATH_PARTS as seen at tag REV, from the directory index where it
+        has up-to-date records of them.  Call FETCH(ENTRIES, SUBDIRS) for
+        the rest; it fills in their log information and taginfo (the
+        tags in each file), and returns the tags of all of them.  Return
+        the tags of all ENTRIES."""
+        if not self.dir_index:
+            return fetch(entries, subdirs)
+
+        from . import dirindex
+
+        dirpath = self._getpath(path_parts)
+        records = self.dir_index.get(dirpath, rev, self.dir_index_backend)
+        alltags = {"MAIN": "", "HEAD": "1.1"}
+        missing = []
+        for entry in entries:
+            if entry.kind != vclib.FILE or entry.errors:
+                missing.append((entry, None, None))
+                continue
+            name = entry.in_attic and "Attic/" + entry.name or entry.name
+            path = _log_path(entry, dirpath, subdirs, self.path_encoding)
+            try:
+                st = os.stat(self._getfspath(path))
+            except OSError:
+                missing.append((entry, None, None))
+                continue
+            rec = dirindex.lookup(records, name, st)
+            if rec:
+                entry.path = path
+                dirindex.apply(entry, rec)
+                alltags.update(entry.taginfo or {})
+            else:
+                missing.append((entry, name, st))
+        if missing:
+            alltags.update(fetch([x[0] for x in missing], subdirs))
+            for entry, name, st in missing:
+                if name and not entry.errors:
+                    records[name] = dirindex.record(entry, st)
+            for name in list(records.keys()):
+                if not os.path.exists(self._getfspath(os.path.join(dirpath, name + ",v"))):
+                    del records[name]
+            self.dir_index.put(dirpath, rev, self.dir_index_backend, records)
+        return alltags
 
     def _getpath(self, path_parts):
         return os.path.join(*((self.rootpath,) + tuple(path_parts)))
@@ -200,6 +257,35 @@ class BaseCVSRepository(vclib.Repository):
 
 
 class BinCVSRepository(BaseCVSRepository):
+    # The name of this implementation, in the directory index.
+    dir_index_backend = "rlog"
+
+    def __init__(
+        self,
+        name,
+        rootpath,
+        authorizer,
+        utilities,
+        content_encoding,
+        path_encoding,
+        dir_index=None,
+        rlog_jobs=1,
+    ):
+        BaseCVSRepository.__init__(
+            self, name, rootpath, authorizer, utilities, content_encoding, path_encoding, dir_index
+        )
+        # The number of rlog processes dirlogs() may run at once.
+        self.rlog_jobs = rlog_jobs
+        # The environment of the RCS programs we run, whose CVSROOT must be
+        # this repository's for $CVSHeader$ to expand correctly.  (Setting
+        # it in the process's own environment won't do when the process
+        # serves requests for several repositories at once.)
+        if sys.platform == "win32":
+            self.rcs_environ = dict(os.environ, CVSROOT=rootpath)
+        else:
+            self.rcs_environ = dict(os.environb)
+            self.rcs_environ[b"CVSROOT"] = self._getfspath(rootpath)
+
     def _get_tip_revision(self, rcs_file, rev=None):
         """Get the (basically) youngest revision (filtered by REV)."""
         args = (rcs_file,)
@@ -299,11 +385,17 @@ class BinCVSRepository(BaseCVSRepository):
             raise vclib.Error(f"Path '{_path_join(path_parts)}' is not a directory.")
 
         subdirs = options.get("cvs_subdirs", 0)
-        entries_to_fetch = []
-        for entry in entries:
-            if vclib.check_path_access(self, path_parts + [entry.name], None, rev):
-                entries_to_fetch.append(entry)
-        alltags = _get_logs(self, path_parts, entries_to_fetch, rev, subdirs)
+        access = vclib.check_children_access(
+            self, path_parts, [(entry.name, None) for entry in entries], rev
+        )
+        entries_to_fetch = [entry for entry, readable in zip(entries, access) if readable]
+        alltags = self._indexed_logs(
+            path_parts,
+            rev,
+            entries_to_fetch,
+            subdirs,
+            lambda entries, subdirs: _get_logs(self, path_parts, entries, rev, subdirs),
+        )
         branches = options["cvs_branches"] = []
         tags = options["cvs_tags"] = []
         for name, rev in alltags.items():
@@ -390,6 +482,7 @@ class BinCVSRepository(BaseCVSRepository):
                 encoding=self.content_encoding,
                 errors="surrogateescape",
                 close_fds=(sys.platform != "win32"),
+                env=self.rcs_environ,
             )
         else:
             proc = subprocess.Popen(
@@ -398,6 +491,7 @@ class BinCVSRepository(BaseCVSRepository):
                 stdout=subprocess.PIPE,
                 stderr=stderr,
                 close_fds=(sys.platform != "win32"),
+                env=self.rcs_environ,
             )
         return proc.stdout
 
@@ -1060,30 +1154,46 @@ def _file_log(revs, taginfo, lockinfo, cur_branch, filter):
 def _get_logs(repos, dir_path_parts, entries, view_tag, get_dirs):
     alltags = {"MAIN": "", "HEAD": "1.1"}  # all the tags seen in the files of this dir
 
-    entries_idx = 0
-    entries_len = len(entries)
+    files = []
+    dirpath = repos._getpath(dir_path_parts)
+    for entry in entries:
+        path = _log_path(entry, dirpath, get_dirs, repos.path_encoding)
+        if path:
+            entry.path = path
+            files.append(entry)
+
+        # set properties even if we don't retrieve logs
+        entry.rev = entry.date = entry.author = None
+        entry.dead = entry.log = entry.lockinfo = None
+
+    # Run rlog on up to max_args files at a time, in up to repos.rlog_jobs
+    # processes at once.  Each chunk's entries are filled in by the thread
+    # which runs rlog on it; only the tags it saw need merging afterwards,
+    # and that's done in chunk order.
     max_args = 100
+    chunks = [files[i : (i + max_args)] for i in range(0, len(files), max_args)]
+    jobs = min(repos.rlog_jobs, len(chunks))
+    if jobs > 1:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(jobs) as executor:
+            results = list(
+                executor.map(lambda chunk: _get_chunk_logs(repos, chunk, view_tag), chunks)
+            )
+    else:
+        results = [_get_chunk_logs(repos, chunk, view_tag) for chunk in chunks]
+    for taginfo in results:
+        alltags.update(taginfo)
+    return alltags
 
-    while 1:
-        chunk = []
-
-        while len(chunk) < max_args and entries_idx < entries_len:
-            entry = entries[entries_idx]
-            path = _log_path(entry, repos._getpath(dir_path_parts), get_dirs, repos.path_encoding)
-            if path:
-                entry.path = path
-                entry.idx = entries_idx
-                chunk.append(entry)
-
-            # set properties even if we don't retrieve logs
-            entry.rev = entry.date = entry.author = None
-            entry.dead = entry.log = entry.lockinfo = None
-
-            entries_idx = entries_idx + 1
 
-        if not chunk:
-            return alltags
+def _get_chunk_logs(repos, chunk, view_tag):
+    """Fill in the log information of the entries in CHUNK, whose paths
+    have been set, from the output of rlog.  Return the tags seen in
+    them."""
+    alltags = {}
 
+    while chunk:
         args = []
         if not view_tag:
             # NOTE: can't pass tag on command line since a tag may contain "-"
@@ -1092,6 +1202,7 @@ def _get_logs(repos, dir_path_parts, entries, view_tag, get_dirs):
             args.append("-r")
         args.extend([x.path for x in chunk])
         rlog = repos.rcs_popen("rlog", args, True)
+        remaining = []
 
         # consume each file found in the resulting log
         chunk_idx = 0
@@ -1110,9 +1221,7 @@ def _get_logs(repos, dir_path_parts, entries, view_tag, get_dirs):
 
                 # if current file has errors, restart on the next one
                 if file.errors:
-                    chunk_idx = chunk_idx + 1
-                    if chunk_idx < len(chunk):
-                        entries_idx = chunk[chunk_idx].idx
+                    remaining = chunk[(chunk_idx + 1) :]
                     break
 
                 # otherwise just error out
@@ -1153,6 +1262,7 @@ def _get_logs(repos, dir_path_parts, entries, view_tag, get_dirs):
             # merge the set of keys and keep values that allow us to make the
             # distinction between branch tags and normal tags
             alltags.update(taginfo)
+            file.taginfo = taginfo
 
             # read all of the log entries until we find the revision we want
             wanted_entry = None
@@ -1206,6 +1316,9 @@ def _get_logs(repos, dir_path_parts, entries, view_tag, get_dirs):
             chunk_idx = chunk_idx + 1
 
         rlog.close()
+        chunk = remaining
+
+    return alltags
 
 
 def _log_path(entry, dirpath, getdirs, encoding):
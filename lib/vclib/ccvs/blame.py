@@ -26,8 +26,10 @@
 #
 # -----------------------------------------------------------------------
 
+import json
 import re
 from . import rcsparse
+from . import delta
 import vclib
 
 
@@ -36,14 +38,19 @@ class CVSParser(rcsparse.Sink):
     trunk_rev = re.compile(b"^[0-9]+\\.[0-9]+$")
     last_branch = re.compile(b"(.*)\\.[0-9]+")
     is_branch = re.compile(b"^(.*)\\.0\\.([0-9]+)$")
-    d_command = re.compile(rb"^d(\d+)\s(\d+)")
-    a_command = re.compile(rb"^a(\d+)\s(\d+)")
 
     SECONDS_PER_DAY = 86400
 
-    def __init__(self, encoding):
+    def __init__(self, encoding, cache=None, cache_key=None, need_text=True):
+        """Initialize.  CACHE, if provided, is a revcache.RevisionCache in
+        which to keep revision maps of the RCS file CACHE_KEY identifies.
+        NEED_TEXT is false if extract_revision() won't be called, so only
+        the deltatexts needed for the revision map are required."""
         self.Reset()
         self.encoding = encoding
+        self.cache = cache
+        self.cache_key = cache_key
+        self.need_text = need_text
 
     def Reset(self):
         self.last_revision = {}
@@ -58,6 +65,8 @@ class CVSParser(rcsparse.Sink):
         self.revision_map = []  # map line numbers to revisions
         self.lines_added = {}
         self.lines_removed = {}
+        self.wanted_deltas = None  # None means all of them
+        self.cached_map = None  # (revision, revision map) to start from
 
     # Map a tag to a numerical revision number.  The tag can be a symbolic
     # branch tag, a symbolic revision tag, or an ordinary numerical
@@ -100,13 +109,14 @@ class CVSParser(rcsparse.Sink):
             del lines[-1]
         return lines
 
+    # Parse deltatext specified by rev into its edit commands.
+    def delta_script(self, rev):
+        return delta.parse_script(self.deltatext_split(rev))
+
     # Extract the given revision from the digested RCS file.
     # (Essentially the equivalent of cvs up -rXXX)
     def extract_revision(self, revision):
         path = []
-        add_lines_remaining = 0
-        start_line = 0
-        count = 0
         while revision:
             path.append(revision)
             revision = self.prev_delta.get(revision)
@@ -117,40 +127,15 @@ class CVSParser(rcsparse.Sink):
 
         # Iterate, applying deltas to previous revision
         for revision in path:
-            adjust = 0
-            diffs = self.deltatext_split(revision)
+            script = self.delta_script(revision)
+            text = delta.apply(text, script)
             self.lines_added[revision] = 0
             self.lines_removed[revision] = 0
-            lines_added_now = 0
-            lines_removed_now = 0
-
-            for command in diffs:
-                dmatch = self.d_command.match(command)
-                amatch = self.a_command.match(command)
-                if add_lines_remaining > 0:
-                    # Insertion lines from a prior "a" command
-                    text.insert(start_line + adjust, command)
-                    add_lines_remaining = add_lines_remaining - 1
-                    adjust = adjust + 1
-                elif dmatch:
-                    # "d" - Delete command
-                    start_line = int(dmatch.group(1))
-                    count = int(dmatch.group(2))
-                    begin = start_line + adjust - 1
-                    del text[begin : (begin + count)]
-                    adjust = adjust - count
-                    lines_removed_now = lines_removed_now + count
-                elif amatch:
-                    # "a" - Add command
-                    start_line = int(amatch.group(1))
-                    count = int(amatch.group(2))
-                    add_lines_remaining = count
-                    lines_added_now = lines_added_now + count
+            for start, count, added in script:
+                if added is None:
+                    self.lines_removed[revision] = self.lines_removed[revision] + count
                 else:
-                    raise RuntimeError("Error parsing diff commands")
-
-            self.lines_added[revision] = self.lines_added[revision] + lines_added_now
-            self.lines_removed[revision] = self.lines_removed[revision] + lines_removed_now
+                    self.lines_added[revision] = self.lines_added[revision] + count
         return text
 
     def set_head_revision(self, revision):
@@ -232,9 +217,100 @@ class CVSParser(rcsparse.Sink):
     #                          revision if this revision is on the trunk or
     #                          relative to its immediate predecessor if this
     #                          revision is on a branch.
+    #
+    # If only some deltatexts are wanted (see tree_completed()), only those
+    # are kept, and parsing stops once they have all been seen.
     def set_revision_info(self, revision, log, text):
         self.revision_log[revision] = log
-        self.revision_deltatext[revision] = text
+        if self.wanted_deltas is None:
+            self.revision_deltatext[revision] = text
+        elif revision in self.wanted_deltas:
+            self.revision_deltatext[revision] = text
+            self.wanted_deltas.remove(revision)
+            if not self.wanted_deltas:
+                raise rcsparse.RCSStopParser
+
+    # Once the tree is known, find the revision to annotate and, if there
+    # is an annotate cache, the nearest ancestor of it (or the revision
+    # itself) whose revision map was cached.  Replaying the deltas from
+    # there on needs just a few deltatexts.
+    def tree_completed(self):
+        if self.cache is None or self.need_text:
+            return
+        revision = self.resolve_revision(self.opt_rev)
+        ancestors = [revision] + self.ancestor_revisions(revision)
+        for idx in range(len(ancestors) - 1):
+            revision_map = self.load_revision_map(ancestors[idx])
+            if revision_map is not None:
+                break
+        else:
+            return
+        self.cached_map = (ancestors[idx], revision_map)
+        self.wanted_deltas = set()
+        last_revision = ancestors[idx]
+        for revision in reversed(ancestors[:idx]):
+            if self.trunk_rev.match(revision):
+                self.wanted_deltas.add(last_revision)
+            else:
+                self.wanted_deltas.add(revision)
+            last_revision = revision
+        if not self.wanted_deltas:
+            raise rcsparse.RCSStopParser
+
+    # Return the cached revision map of the given revision, or None if it
+    # isn't cached or was cached before the RCS file was rewritten in a way
+    # that affects it.
+    def load_revision_map(self, revision):
+        data = self.cache.get(self.cache_key, revision.decode("latin-1"))
+        if data is None:
+            return None
+        try:
+            entry = json.loads(data)
+            timestamps = entry["timestamps"]
+            if revision.decode("latin-1") not in timestamps:
+                return None
+            for rev, timestamp in timestamps.items():
+                if self.timestamp.get(rev.encode("latin-1")) != timestamp:
+                    return None
+            revision_map = []
+            for rev, count in entry["map"]:
+                revision_map.extend([rev.encode("latin-1")] * count)
+        except (ValueError, KeyError, TypeError):
+            return None
+        return revision_map
+
+    # Cache the revision map of the given revision.  Along with it go the
+    # dates of the revision itself and of the revisions it refers to, so
+    # load_revision_map() can tell whether they are still the same
+    # revisions -- the revision itself may contribute no lines to its map.
+    def store_revision_map(self, revision):
+        runs = []
+        timestamps = {revision: self.timestamp[revision]}
+        for rev in self.revision_map:
+            if runs and runs[-1][0] == rev:
+                runs[-1][1] = runs[-1][1] + 1
+            else:
+                runs.append([rev, 1])
+                timestamps[rev] = self.timestamp[rev]
+        entry = {
+            "timestamps": dict((rev.decode("latin-1"), ts) for rev, ts in timestamps.items()),
+            "map": [[rev.decode("latin-1"), count] for rev, count in runs],
+        }
+        self.cache.put(
+            self.cache_key, revision.decode("latin-1"), json.dumps(entry).encode("latin-1")
+        )
+
+    # Map the requested revision (None, b"", or b"HEAD" for the head
+    # revision) to a revision number.
+    def resolve_revision(self, opt_rev):
+        if opt_rev in [None, b"", b"HEAD"]:
+            # Explicitly specified topmost revision in tree
+            return self.head_revision
+        # Symbolic tag or specific revision number specified.
+        revision = self.map_tag_to_revision(opt_rev)
+        if revision == b"":
+            raise RuntimeError("error: -r: No such revision: " + opt_rev.decode(self.encoding))
+        return revision
 
     def parse_cvs_file(self, rcs_pathname, opt_rev=None, opt_m_timestamp=None):
         # Args in:  opt_rev - requested revision in bytes type
@@ -252,63 +328,22 @@ class CVSParser(rcsparse.Sink):
                 "but the RCS file is inaccessible."
             )
 
-        rcsparse.parse(rcsfile, self)
+        # We keep every deltatext around, so have them left in the mapped
+        # file rather than copied into memory.
+        self.opt_rev = opt_rev
+        try:
+            rcsparse.parse(rcsfile, self, "mmap")
+        except rcsparse.RCSStopParser:
+            pass
         rcsfile.close()
 
-        if opt_rev in [None, b"", b"HEAD"]:
-            # Explicitly specified topmost revision in tree
-            revision = self.head_revision
-        else:
-            # Symbolic tag or specific revision number specified.
-            revision = self.map_tag_to_revision(opt_rev)
-            if revision == b"":
-                raise RuntimeError("error: -r: No such revision: " + opt_rev.decode(self.encoding))
-
-        # The primordial revision is not always 1.1!  Go find it.
-        primordial = revision
-        while self.prev_revision.get(primordial):
-            primordial = self.prev_revision[primordial]
+        revision = self.resolve_revision(opt_rev)
 
         # Don't display file at all, if -m option is specified and no
         # changes have been made in the specified file.
         if opt_m_timestamp and self.timestamp[revision] < opt_m_timestamp:
             return b""
 
-        # Figure out how many lines were in the primordial, i.e. version 1.1,
-        # check-in by moving backward in time from the head revision to the
-        # first revision.
-        line_count = 0
-        if self.revision_deltatext.get(self.head_revision):
-            tmp_array = self.deltatext_split(self.head_revision)
-            line_count = len(tmp_array)
-
-        skip = 0
-
-        rev = self.prev_revision.get(self.head_revision)
-        while rev:
-            diffs = self.deltatext_split(rev)
-            for command in diffs:
-                dmatch = self.d_command.match(command)
-                amatch = self.a_command.match(command)
-                if skip > 0:
-                    # Skip insertion lines from a prior "a" command
-                    skip = skip - 1
-                elif dmatch:
-                    # "d" - Delete command
-                    start_line = int(dmatch.group(1))
-                    count = int(dmatch.group(2))
-                    line_count = line_count - count
-                elif amatch:
-                    # "a" - Add command
-                    start_line = int(amatch.group(1))
-                    count = int(amatch.group(2))
-                    skip = count
-                    line_count = line_count + count
-                else:
-                    raise RuntimeError("error: illegal RCS file")
-
-            rev = self.prev_revision.get(rev)
-
         # Now, play the delta edit commands *backwards* from the primordial
         # revision forward, but rather than applying the deltas to the text of
         # each revision, apply the changes to an array of revision numbers.
@@ -320,104 +355,85 @@ class CVSParser(rcsparse.Sink):
         # Note: These are backward deltas for revisions on the trunk and
         # forward deltas for branch revisions.
 
-        # Create initial revision map for primordial version.
-        self.revision_map = [primordial] * line_count
-
         ancestors = [
             revision,
         ] + self.ancestor_revisions(revision)
-        ancestors = ancestors[:-1]  # Remove b"1.1"
-        last_revision = primordial
+        if self.cached_map:
+            # Start from the cached revision map.
+            last_revision, self.revision_map = self.cached_map
+            ancestors = ancestors[: ancestors.index(last_revision)]
+        else:
+            # Start from the primordial revision (which is not always 1.1!)
+            last_revision = ancestors.pop()
+            self.revision_map = [last_revision] * self.primordial_line_count()
         ancestors.reverse()
         for revision in ancestors:
             is_trunk_revision = self.trunk_rev.match(revision) is not None
 
             if is_trunk_revision:
-                diffs = self.deltatext_split(last_revision)
-
                 # Revisions on the trunk specify deltas that transform a
                 # revision into an earlier revision, so invert the translation
                 # of the 'diff' commands.
-                for command in diffs:
-                    if skip > 0:
-                        skip = skip - 1
-                    else:
-                        dmatch = self.d_command.match(command)
-                        amatch = self.a_command.match(command)
-                        if dmatch:
-                            start_line = int(dmatch.group(1))
-                            count = int(dmatch.group(2))
-                            temp = []
-                            while count > 0:
-                                temp.append(revision)
-                                count = count - 1
-                            self.revision_map = (
-                                self.revision_map[: (start_line - 1)]
-                                + temp
-                                + self.revision_map[(start_line - 1) :]
-                            )
-                        elif amatch:
-                            start_line = int(amatch.group(1))
-                            count = int(amatch.group(2))
-                            del self.revision_map[start_line : (start_line + count)]
-                            skip = count
-                        else:
-                            raise RuntimeError("Error parsing diff commands")
-
+                self.revision_map = delta.unapply(
+                    self.revision_map, self.delta_script(last_revision), revision
+                )
             else:
                 # Revisions on a branch are arranged backwards from those on
                 # the trunk.  They specify deltas that transform a revision
                 # into a later revision.
-                adjust = 0
-                diffs = self.deltatext_split(revision)
-                for command in diffs:
-                    if skip > 0:
-                        skip = skip - 1
-                    else:
-                        dmatch = self.d_command.match(command)
-                        amatch = self.a_command.match(command)
-                        if dmatch:
-                            start_line = int(dmatch.group(1))
-                            count = int(dmatch.group(2))
-                            adj_begin = start_line + adjust - 1
-                            adj_end = start_line + adjust - 1 + count
-                            del self.revision_map[adj_begin:adj_end]
-                            adjust = adjust - count
-                        elif amatch:
-                            start_line = int(amatch.group(1))
-                            count = int(amatch.group(2))
-                            skip = count
-                            temp = []
-                            while count > 0:
-                                temp.append(revision)
-                                count = count - 1
-                            self.revision_map = (
-                                self.revision_map[: (start_line + adjust)]
-                                + temp
-                                + self.revision_map[(start_line + adjust) :]
-                            )
-                            adjust = adjust + skip
-                        else:
-                            raise RuntimeError("Error parsing diff commands")
+                self.revision_map = delta.apply(
+                    self.revision_map, self.delta_script(revision), revision
+                )
 
             last_revision = revision
 
-        return revision
+        if self.cache is not None and ancestors:
+            self.store_revision_map(last_revision)
+        return last_revision
+
+    # Figure out how many lines were in the primordial, i.e. version 1.1,
+    # check-in by moving backward in time from the head revision to the
+    # first revision.
+    def primordial_line_count(self):
+        line_count = 0
+        if self.revision_deltatext.get(self.head_revision):
+            tmp_array = self.deltatext_split(self.head_revision)
+            line_count = len(tmp_array)
+
+        rev = self.prev_revision.get(self.head_revision)
+        while rev:
+            for start, count, added in self.delta_script(rev):
+                if added is None:
+                    line_count = line_count - count
+                else:
+                    line_count = line_count + count
+
+            rev = self.prev_revision.get(rev)
+        return line_count
 
 
 class BlameSource:
-    def __init__(self, rcs_file, opt_rev=None, include_text=False, encoding="utf-8"):
+    def __init__(self, rcs_file, opt_rev=None, include_text=False, encoding="utf-8", cache=None):
+        """Annotate revision OPT_REV (or the head revision) of RCS_FILE.
+        If CACHE, a revcache.RevisionCache, is provided, revision maps are
+        kept there, and new ones derived from those of their ancestors."""
         # Parse the CVS file
-        parser = CVSParser(encoding)
+        if cache is None:
+            parser = CVSParser(encoding, need_text=include_text)
+        else:
+            parser = CVSParser(encoding, cache, cache.key(rcs_file), include_text)
         if opt_rev is None:
             opt_rev_encoded = None
         else:
             opt_rev_encoded = opt_rev.encode(encoding)
         revision = parser.parse_cvs_file(rcs_file, opt_rev_encoded)
         count = len(parser.revision_map)
-        lines = parser.extract_revision(revision)
-        if len(lines) != count:
-            raise RuntimeError("Internal consistency error")
+        if include_text:
+            lines = parser.extract_revision(revision)
+            if len(lines) != count:
+                raise RuntimeError("Internal consistency error")
+        else:
+            lines = None
 
         # set up some state variables
         self.revision = revision
@@ -444,8 +460,9 @@ class BlameSource:
         prev_rev = self.parser.prev_revision.get(rev)
         line_number = idx + 1
         author = self.parser.revision_author[rev]
-        thisline = self.lines[idx]
-        if not self.include_text:
+        if self.include_text:
+            thisline = self.lines[idx]
+        else:
             thisline = None
         # TODO:  Put a real date in here.
         item = vclib.Annotation(
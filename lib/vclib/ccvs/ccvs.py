@@ -13,16 +13,19 @@
 import os
 import re
 import tempfile
+import threading
 from io import BytesIO
 from operator import attrgetter
 import vclib
 from . import rcsparse
 from . import blame
+from . import delta
 
 # TODO: The functionality shared with bincvs should probably be moved
 # to a separate module
 from .bincvs import (
     BaseCVSRepository,
+    CVSDirEntry,
     Revision,
     Tag,
     _file_log,
@@ -32,6 +35,29 @@ from .bincvs import (
 
 
 class CCVSRepository(BaseCVSRepository):
+    # The name of this implementation, in the directory index.
+    dir_index_backend = "rcsparse"
+
+    def __init__(
+        self,
+        name,
+        rootpath,
+        authorizer,
+        utilities,
+        content_encoding,
+        path_encoding,
+        revision_cache=None,
+        dir_index=None,
+        workers=0,
+    ):
+        BaseCVSRepository.__init__(
+            self, name, rootpath, authorizer, utilities, content_encoding, path_encoding, dir_index
+        )
+        # A revcache.RevisionCache for openfile() to use, if any.
+        self.revision_cache = revision_cache
+        # The number of worker processes dirlogs() may parse files in.
+        self.workers = workers
+
     def dirlogs(self, path_parts, rev, entries, options):
         """see vclib.Repository.dirlogs docstring
 
@@ -51,33 +77,20 @@ class CCVSRepository(BaseCVSRepository):
         """
         if self.itemtype(path_parts, rev) != vclib.DIR:  # does auth-check
             raise vclib.Error(f"Path '{_path_join(path_parts)}' is not a directory.")
-        entries_to_fetch = []
-        for entry in entries:
-            if vclib.check_path_access(self, path_parts + [entry.name], None, rev):
-                entries_to_fetch.append(entry)
+        access = vclib.check_children_access(
+            self, path_parts, [(entry.name, None) for entry in entries], rev
+        )
+        entries_to_fetch = [entry for entry, readable in zip(entries, access) if readable]
 
         subdirs = options.get("cvs_subdirs", 0)
 
-        dirpath = self._getpath(path_parts)
-        alltags = {"MAIN": "", "HEAD": "1.1"}  # all the tags seen in the files of this dir
-
-        for entry in entries_to_fetch:
-            entry.rev = entry.date = entry.author = None
-            entry.dead = entry.absent = entry.log = entry.lockinfo = None
-            path = _log_path(entry, dirpath, subdirs, self.path_encoding)
-            if path:
-                entry.path = path
-                try:
-                    rcsparse.parse(
-                        open(self._getfspath(path), "rb"),
-                        InfoSink(entry, rev, alltags, self.content_encoding),
-                    )
-                except IOError as e:
-                    entry.errors.append(f"rcsparse error: {e}")
-                except RuntimeError as e:
-                    entry.errors.append(f"rcsparse error: {e}")
-                except rcsparse.RCSStopParser:
-                    pass
+        alltags = self._indexed_logs(
+            path_parts,
+            rev,
+            entries_to_fetch,
+            subdirs,
+            lambda entries, subdirs: self._get_logs(path_parts, rev, entries, subdirs),
+        )
 
         branches = options["cvs_branches"] = []
         tags = options["cvs_tags"] = []
@@ -87,6 +100,45 @@ class CCVSRepository(BaseCVSRepository):
             else:
                 tags.append(name)
 
+    def _get_logs(self, path_parts, rev, entries, subdirs):
+        dirpath = self._getpath(path_parts)
+        alltags = {"MAIN": "", "HEAD": "1.1"}  # all the tags seen in the files of this dir
+
+        files = []
+        for entry in entries:
+            entry.rev = entry.date = entry.author = None
+            entry.dead = entry.absent = entry.log = entry.lockinfo = None
+            entry.taginfo = {}
+            path = _log_path(entry, dirpath, subdirs, self.path_encoding)
+            if path:
+                entry.path = path
+                files.append(entry)
+
+        args = [(self._getfspath(x.path), x.kind, rev, self.content_encoding) for x in files]
+        if self.workers > 1 and len(files) >= POOL_MIN_FILES:
+            # Hand each worker a few shards of the files, so that ones
+            # which finish early can pick up more.
+            chunksize = -(-len(files) // (self.workers * 4))
+            results = _get_pool(self.workers).starmap(_get_info, args, chunksize)
+        else:
+            results = [_get_info(*x) for x in args]
+
+        for entry, info in zip(files, results):
+            (
+                entry.rev,
+                entry.date,
+                entry.author,
+                entry.dead,
+                entry.absent,
+                entry.log,
+                entry.lockinfo,
+                errors,
+                entry.taginfo,
+            ) = info
+            entry.errors.extend(errors)
+            alltags.update(entry.taginfo)
+        return alltags
+
     def itemlog(self, path_parts, rev, sortby, first, limit, options):
         """see vclib.Repository.itemlog docstring
 
@@ -153,7 +205,11 @@ class CCVSRepository(BaseCVSRepository):
         if self.itemtype(path_parts, rev) != vclib.FILE:  # does auth-check
             raise vclib.Error(f"Path '{_path_join(path_parts)}' is not a file.")
         source = blame.BlameSource(
-            self._getfspath(self.rcsfile(path_parts, 1)), rev, include_text, self.content_encoding
+            self._getfspath(self.rcsfile(path_parts, 1)),
+            rev,
+            include_text,
+            self.content_encoding,
+            self.revision_cache,
         )
         return source, source.revision
 
@@ -164,12 +220,75 @@ class CCVSRepository(BaseCVSRepository):
         if self.itemtype(path_parts, rev) != vclib.FILE:  # does auth-check
             raise vclib.Error(f"Path '{_path_join(path_parts)}' is not a file.")
         path = self.rcsfile(path_parts, 1)
-        sink = COSink(rev, self.content_encoding)
-        rcsparse.parse(open(self._getfspath(path), "rb"), sink)
+        fp = open(self._getfspath(path), "rb")
+        if self.revision_cache:
+            cache_key = self.revision_cache.key(path, os.fstat(fp.fileno()))
+            sink = COSink(rev, self.content_encoding, self.revision_cache, cache_key)
+        else:
+            sink = COSink(rev, self.content_encoding)
+        try:
+            rcsparse.parse(fp, sink)
+        except rcsparse.RCSStopParser:
+            pass
+        fp.close()
         revision = sink.last and sink.last.string
         return BytesIO(b"".join(sink.sstext.text)), revision
 
 
+# Directories with fewer files than this are parsed in-process, even when
+# worker processes are allowed; handing so few files to them costs more
+# than it saves.
+POOL_MIN_FILES = 64
+
+# Pools of worker processes, by size.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    """Return a multiprocessing.Pool of WORKERS processes, created on
+    first use and kept for the life of this process."""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            import multiprocessing
+
+            pool = _pools[workers] = multiprocessing.Pool(workers)
+        return pool
+
+
+def _get_info(path, kind, rev, encoding):
+    """Parse the RCS file at PATH (a filesystem path) for the log
+    information of the directory entry of kind KIND it belongs to, as
+    seen at tag REV.  Return a tuple of the entry's rev, date, author,
+    dead, absent, log and lockinfo, a list of errors, and the file's
+    tags.  (This runs in worker processes, so takes and returns plain
+    values rather than entries.)"""
+    entry = CVSDirEntry(None, kind, [], 0)
+    entry.rev = entry.date = entry.author = None
+    entry.dead = entry.absent = entry.log = entry.lockinfo = None
+    taginfo = {}
+    try:
+        rcsparse.parse(open(path, "rb"), InfoSink(entry, rev, taginfo, encoding))
+    except IOError as e:
+        entry.errors.append(f"rcsparse error: {e}")
+    except rcsparse.RCSParseError as e:
+        entry.errors.append(f"rcsparse error: {e}")
+    except rcsparse.RCSStopParser:
+        pass
+    return (
+        entry.rev,
+        entry.date,
+        entry.author,
+        entry.dead,
+        entry.absent,
+        entry.log,
+        entry.lockinfo,
+        entry.errors,
+        taginfo,
+    )
+
+
 class MatchingSink(rcsparse.Sink):
     """Superclass for sinks that search for revisions based on tag or number"""
 
@@ -352,7 +471,7 @@ class TreeSink(rcsparse.Sink):
 
 
 def _msplit(s):
-    r"""Split (bytes) S into an array of lines.
+    r"""Split S (bytes, or an rcsparse.RCSText) into an array of lines.
 
     Only \n is a line separator. The line endings are part of the lines."""
 
@@ -365,47 +484,19 @@ def _msplit(s):
 
 
 class StreamText:
-    d_command = re.compile(rb"^d(\d+)\s(\d+)\n")
-    a_command = re.compile(rb"^a(\d+)\s(\d+)\n")
-
     def __init__(self, text):
         self.text = _msplit(text)
 
     def command(self, cmd):
-        start_line = None
-        adjust = 0
-        add_lines_remaining = 0
         diffs = _msplit(cmd)
         if len(diffs) == 0:
             return
         if diffs[0] == b"":
             del diffs[0]
-        for command in diffs:
-            if add_lines_remaining > 0:
-                # Insertion lines from a prior "a" command
-                # Note: Don't check if we insert a string which does not end
-                # with b'\n' before an existing line. Some CVS implementation
-                # can produce such edit commands.
-                self.text.insert(start_line + adjust, command)
-                add_lines_remaining = add_lines_remaining - 1
-                adjust = adjust + 1
-                continue
-            dmatch = self.d_command.match(command)
-            amatch = self.a_command.match(command)
-            if dmatch:
-                # "d" - Delete command
-                start_line = int(dmatch.group(1))
-                count = int(dmatch.group(2))
-                begin = start_line + adjust - 1
-                del self.text[begin : (begin + count)]
-                adjust = adjust - count
-            elif amatch:
-                # "a" - Add command
-                start_line = int(amatch.group(1))
-                count = int(amatch.group(2))
-                add_lines_remaining = count
-            else:
-                raise RuntimeError("Error parsing diff commands")
+        # Note: Don't check if we insert a string which does not end
+        # with b'\n' before an existing line. Some CVS implementation
+        # can produce such edit commands.
+        self.text = delta.apply(self.text, delta.parse_script(diffs))
 
 
 def secondnextdot(s, start):
@@ -414,8 +505,18 @@ def secondnextdot(s, start):
 
 
 class COSink(MatchingSink):
-    def __init__(self, rev, encoding):
+    def __init__(self, rev, encoding, cache=None, cache_key=None):
+        """Initialize with the tag name or revision number string to check out.
+
+        If CACHE, a revcache.RevisionCache, is provided, replay deltas from
+        the nearest revision cached for the RCS file CACHE_KEY identifies,
+        and cache the requested revision and a checkpoint every
+        CACHE.interval revisions along the way."""
         MatchingSink.__init__(self, rev, encoding)
+        self.cache = cache
+        self.cache_key = cache_key
+        self.revisions = []
+        self.path = None
 
     def set_head_revision(self, revision):
         self.head = Revision(self._to_str(revision))
@@ -427,6 +528,59 @@ class COSink(MatchingSink):
         if self.find_tag is None:
             raise vclib.InvalidRevision(self.find)
 
+    def define_revision(self, revision, date, author, state, branches, next):
+        if self.cache:
+            self.revisions.append(Revision(self._to_str(revision)))
+
+    def tree_completed(self):
+        if not self.cache:
+            return
+
+        # The deltas to replay, in the order their deltatexts appear: the
+        # trunk going back in time from the head, then each branch forward.
+        path = [rev for rev in self.revisions if self._on_path(rev)]
+        path.sort(
+            key=lambda rev: (
+                len(rev.number),
+                tuple(-n for n in rev.number) if len(rev.number) == 2 else rev.number,
+            )
+        )
+        path.insert(0, self.head)
+
+        # Start from the furthest cached revision along that path.  Only
+        # the requested revision and the checkpoints (see _checkpoint())
+        # can be cached, so there's no use looking for any others.
+        self.path = path
+        self.start = 0
+        last = len(path) - 1
+        candidates = list(range(last - last % self.cache.interval, 0, -self.cache.interval))
+        if last and last % self.cache.interval:
+            candidates.insert(0, last)
+        for idx in candidates:
+            data = self.cache.get(self.cache_key, path[idx].string)
+            if data is not None:
+                self.start = idx
+                self.sstext = StreamText(data)
+                break
+        self.pos = 0
+        if self.start and self.start == len(path) - 1:
+            # The requested revision itself was cached; we're done.
+            self.last = path[-1]
+            raise rcsparse.RCSStopParser
+
+    def _on_path(self, rev):
+        """Return true iff REV (other than the head revision) is one of the
+        revisions whose deltas are replayed to reach the requested one."""
+        tag = self.find_tag
+        depth = len(rev.number)
+        if rev.number == self.head.number:
+            return False
+        if depth == 2:
+            return bool(tag.number) and rev.number >= tag.number[:depth]
+        return rev.number[: (depth - 1)] == tag.number[: (depth - 1)] and (
+            rev.number <= tag.number or len(tag.number) == depth - 1
+        )
+
     def set_revision_info(self, revision, log, text):
         tag = self.find_tag
         rev = Revision(self._to_str(revision))
@@ -436,6 +590,22 @@ class COSink(MatchingSink):
 
         depth = len(rev.number)
 
+        if self.path is not None:
+            if rev.number != self.head.number and not self._on_path(rev):
+                return
+            assert rev.number == self.path[self.pos].number
+            if self.pos > self.start:
+                self.sstext.command(text)
+            elif self.start == 0:
+                self.sstext = StreamText(text)
+            self.last = rev
+            self._checkpoint()
+            self.pos = self.pos + 1
+            if self.pos == len(self.path):
+                # Nothing after this revision is of any use.
+                raise rcsparse.RCSStopParser
+            return
+
         if rev.number == self.head.number:
             assert self.sstext is None
             self.sstext = StreamText(text)
@@ -456,3 +626,20 @@ class COSink(MatchingSink):
 
         if rev:
             self.last = rev
+
+    def _checkpoint(self):
+        """Cache the current text if it is a checkpoint or the requested
+        revision, and isn't cached already."""
+        pos = self.pos
+        if pos <= self.start or (pos % self.cache.interval and pos != len(self.path) - 1):
+            return
+        if self.cache.has(self.cache_key, self.last.string):
+            return
+        lines = self.sstext.text
+        data = b"".join(lines)
+        # Some CVS implementations produce lines lacking newlines in the
+        # middle of the file; a text with one of those wouldn't be split
+        # back into the same lines, so isn't cached.
+        if lines and data.count(b"\n") != len(lines) - (not lines[-1].endswith(b"\n")):
+            return
+        self.cache.put(self.cache_key, self.last.string, data)
@@ -0,0 +1,140 @@
+# -*-python-*-
+#
+# Copyright (C) 1999-2026 The ViewCVS Group. All Rights Reserved.
+#
+# By using this file, you agree to the terms and conditions set forth in
+# the LICENSE.html file which can be found at the top level of the ViewVC
+# distribution or at http://viewvc.org/license-1.html.
+#
+# For more information, visit http://viewvc.org/
+#
+# -----------------------------------------------------------------------
+
+"""delta.py: apply RCS delta scripts to lists of lines.
+
+An RCS deltatext (other than the head revision's full text) is a script
+of "dSTART COUNT" commands, which delete COUNT lines starting at line
+START, and "aSTART COUNT" commands, which add the COUNT lines following
+the command after line START.  Line numbers always refer to the text the
+script is applied to, and the commands come in line order.
+
+Editing a list of lines command by command (and line by line) costs
+time proportional to the length of the list for every command, which
+makes big deltas against long files quadratic.  Here, a script with few
+commands is applied in place, back to front, with one slice assignment
+per command; a script with many commands is applied in one pass which
+merges its commands with the old lines into a new list."""
+
+import re
+
+_re_command = re.compile(rb"([ad])(\d+)\s(\d+)")
+
+# Scripts with more commands than this are applied by building a new
+# list.  Each in-place edit moves the tail of the list, so is cheap
+# compared to copying the whole list only while there are few of them.
+INPLACE_MAX_COMMANDS = 64
+
+
+def parse_script(diffs):
+    """Parse a delta script, given as the list of its lines DIFFS.
+
+    Return a list of (START, COUNT, ADDED) tuples, one per command.
+    START is the 0-based index of the line before which the command
+    applies.  ADDED is None for a delete command, or the list of lines
+    to insert for an add command.  Raise RuntimeError if DIFFS isn't a
+    valid delta script."""
+
+    script = []
+    pos = 0
+    idx = 0
+    num_diffs = len(diffs)
+    while idx < num_diffs:
+        match = _re_command.match(diffs[idx])
+        if not match:
+            raise RuntimeError("Error parsing diff commands")
+        start = int(match.group(2))
+        count = int(match.group(3))
+        idx = idx + 1
+        if match.group(1) == b"d":
+            start = start - 1
+            added = None
+        else:
+            added = diffs[idx : (idx + count)]
+            idx = idx + count
+        if start < pos:
+            raise RuntimeError("Out-of-order diff commands")
+        script.append((start, count, added))
+        pos = start if added is not None else start + count
+    return script
+
+
+def apply(lines, script, fill=None):
+    """Apply SCRIPT (as returned by parse_script()) to the list LINES,
+    and return the resulting list of lines.  LINES may be modified and
+    returned, or left alone.
+
+    If FILL is not None, use it as each added line instead of the line
+    itself.  (Applying a script to a list of per-line annotations this
+    way tracks which lines the script introduced.)"""
+
+    if len(script) <= INPLACE_MAX_COMMANDS:
+        for start, count, added in reversed(script):
+            if added is None:
+                del lines[start : (start + count)]
+            else:
+                lines[start:start] = added if fill is None else [fill] * count
+        return lines
+
+    result = []
+    pos = 0
+    for start, count, added in script:
+        result.extend(lines[pos:start])
+        if added is None:
+            pos = start + count
+        else:
+            pos = start
+            result.extend(added if fill is None else [fill] * count)
+    result.extend(lines[pos:])
+    return result
+
+
+def unapply(lines, script, fill):
+    """Invert apply().  LINES corresponds to the lines which result from
+    applying SCRIPT to some text; return a list corresponding to the lines
+    of that text instead.  Entries for lines the script added are dropped,
+    and FILL is used for each line the script deleted.  LINES may be
+    modified and returned, or left alone."""
+
+    if len(script) <= INPLACE_MAX_COMMANDS:
+        # Find where in LINES each command's START ended up, then edit
+        # back to front so those positions stay valid.
+        edits = []
+        adjust = 0
+        for start, count, added in script:
+            edits.append((start + adjust, count, added))
+            if added is None:
+                adjust = adjust - count
+            else:
+                adjust = adjust + count
+        for start, count, added in reversed(edits):
+            if added is None:
+                lines[start:start] = [fill] * count
+            else:
+                del lines[start : (start + count)]
+        return lines
+
+    result = []
+    pos = 0
+    source_pos = 0
+    for start, count, added in script:
+        end = pos + start - source_pos
+        result.extend(lines[pos:end])
+        pos = end
+        source_pos = start
+        if added is None:
+            result.extend([fill] * count)
+            source_pos = source_pos + count
+        else:
+            pos = pos + count
+    result.extend(lines[pos:])
+    return result
@@ -0,0 +1,157 @@
+# -*-python-*-
+#
+# Copyright (C) 1999-2026 The ViewCVS Group. All Rights Reserved.
+#
+# By using this file, you agree to the terms and conditions set forth in
+# the LICENSE.html file which can be found at the top level of the ViewVC
+# distribution or at http://viewvc.org/license-1.html.
+#
+# For more information, visit http://viewvc.org/
+#
+# -----------------------------------------------------------------------
+
+"""dirindex.py: an on-disk index of the log information of CVS files.
+
+Listing a CVS directory sorted by anything other than file name means
+knowing the revision, date, author and log message of every file in it,
+which takes an rlog run or a parse of every ,v file.  The dirlogs code
+records what it finds for each file here, one index per directory, tag
+and CVS implementation (rlog's findings differ slightly from rcsparse's),
+so later listings only need to look again at the files which have
+changed since.
+
+Each file's record is keyed on the ,v file's modification time and
+size, and is simply replaced when those change.  Records of files which
+have since been removed are dropped whenever the directory's index is
+rewritten.  Indexes of directories and tags nobody lists any more are
+evicted like revcache entries: whenever the index directory grows
+beyond its maximum size, the least recently used indexes are removed."""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from . import revcache
+
+# The fields of each record, after the ,v file's mtime and size.
+FIELDS = ("rev", "date", "author", "dead", "lockinfo", "absent", "log", "taginfo")
+
+# Indexes read by this process, by path: (mtime_ns, size, records),
+# least recently used first.  At most LOADED_MAX_BYTES worth of them (as
+# measured by the size of their files) are kept.
+_loaded = OrderedDict()
+_loaded_bytes = 0
+_loaded_lock = threading.Lock()
+LOADED_MAX_BYTES = 16 * 1024 * 1024
+
+# Reading an index marks it as recently used, for eviction, only if it
+# was last marked (or written) more than this many seconds ago.  Marking
+# it changes its mtime, which makes every process's copy of it stale.
+TOUCH_INTERVAL = 3600
+
+
+def _forget(path):
+    """Drop this process's copy of the index at PATH, if any."""
+    global _loaded_bytes
+    loaded = _loaded.pop(path, None)
+    if loaded:
+        _loaded_bytes = _loaded_bytes - loaded[1]
+
+
+class DirectoryIndex:
+    def __init__(self, directory, max_bytes):
+        """Create an index of CVS file log information in DIRECTORY (which
+        is created if necessary), taking up at most about MAX_BYTES."""
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, dirpath, rev, backend):
+        key = f"{backend}\0{dirpath}\0{rev or ''}"
+        digest = hashlib.sha1(key.encode("utf-8", "surrogateescape")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + ".json")
+
+    def get(self, dirpath, rev, backend):
+        """Return the records of the files in the CVS directory DIRPATH,
+        as seen at tag REV by the CVS implementation BACKEND ("rlog" or
+        "rcsparse", whose log information differs slightly), as a
+        dictionary mapping each file's name
+        (prefixed with "Attic/" for files in the Attic) to a list of the
+        ,v file's mtime (in nanoseconds) and size followed by the FIELDS.
+        The dictionary belongs to the caller."""
+        global _loaded_bytes
+        path = self._path(dirpath, rev, backend)
+        try:
+            with open(path, "rb") as fp:
+                st = os.fstat(fp.fileno())
+                if time.time() - st.st_mtime > TOUCH_INTERVAL:
+                    # Note the use, for LRU eviction.
+                    os.utime(path)
+                    st = os.fstat(fp.fileno())
+                with _loaded_lock:
+                    loaded = _loaded.get(path)
+                    if loaded and loaded[:2] == (st.st_mtime_ns, st.st_size):
+                        _loaded.move_to_end(path)
+                        return dict(loaded[2])
+                records = json.loads(fp.read().decode("utf-8"))
+        except (OSError, ValueError):
+            with _loaded_lock:
+                _forget(path)
+            return {}
+        if not isinstance(records, dict):
+            return {}
+        with _loaded_lock:
+            _forget(path)
+            if st.st_size <= LOADED_MAX_BYTES:
+                _loaded[path] = (st.st_mtime_ns, st.st_size, records)
+                _loaded_bytes = _loaded_bytes + st.st_size
+                while _loaded_bytes > LOADED_MAX_BYTES:
+                    _forget(next(iter(_loaded)))
+        return dict(records)
+
+    def put(self, dirpath, rev, backend, records):
+        """Replace the index of the CVS directory DIRPATH at tag REV, as
+        seen by BACKEND, with RECORDS, a dictionary like the ones get()
+        returns.  Failures are ignored; the index is only an aid."""
+        path = self._path(dirpath, rev, backend)
+        data = json.dumps(records, separators=(",", ":")).encode("ascii")
+        try:
+            old_size = os.stat(path).st_size
+        except OSError:
+            old_size = 0
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(data)
+            os.replace(temp, path)
+        except OSError:
+            return
+        with _loaded_lock:
+            _forget(path)
+        revcache.note_stored(self.directory, self.max_bytes, len(data) - old_size)
+
+
+def record(entry, st):
+    """Return the index record of the directory entry ENTRY, whose log
+    information has been filled in, for the ,v file whose os.stat_result
+    is ST."""
+    return [st.st_mtime_ns, st.st_size] + [getattr(entry, name, None) for name in FIELDS]
+
+
+def lookup(records, name, st):
+    """Return the record for NAME in RECORDS if it's for the ,v file whose
+    os.stat_result is ST, or else None."""
+    rec = records.get(name)
+    if rec and len(rec) == len(FIELDS) + 2 and rec[:2] == [st.st_mtime_ns, st.st_size]:
+        return rec
+    return None
+
+
+def apply(entry, rec):
+    """Fill in the log information of the directory entry ENTRY from the
+    index record REC."""
+    for name, value in zip(FIELDS, rec[2:]):
+        setattr(entry, name, value)
@@ -22,10 +22,43 @@ parse() to parse the file.
 # scope.  That way, applications never need to import any of the
 # sub-packages.
 from .common import *  # noqa: F401,F403
-from .default import Parser
+from . import default
+from . import mapped
 
+# The parsing backends we have available, keyed on name.  Each value is
+# a function taking (FILE, SINK) arguments, as parse() does.  The pure
+# Python "default" and "mmap" backends are always available; the latter
+# memory-maps the RCS file and hands deltatexts to the sink as RCSText
+# objects instead of copies.  The "tparse" backend is available if the
+# compiled tparse extension module (see misc/tparse) has been installed
+# into this package directory.
+backends = {
+    "default": lambda file, sink: default.Parser().parse(file, sink),
+    "mmap": lambda file, sink: mapped.Parser().parse(file, sink),
+}
 
-def parse(file, sink):
+try:
+    from . import tparse as _tparse
+except ImportError:
+    pass
+else:
+    backends["tparse"] = _tparse.parse
+
+# The backend parse() uses unless told otherwise: the fastest available.
+default_backend = "tparse" if "tparse" in backends else "mmap"
+
+
+def set_backend(name):
+    """Make NAME (a key of 'backends') the backend used by parse().
+    Raise ValueError if no such backend is available."""
+
+    global default_backend
+    if name not in backends:
+        raise ValueError(f"unknown or unavailable rcsparse backend: {name}")
+    default_backend = name
+
+
+def parse(file, sink, backend=None):
     """Parse an RCS file.
 
     Parameters: FILE is the binary input stream object to parse.  (I.e.
@@ -35,5 +68,9 @@ def parse(file, sink):
     SINK is an instance of (some subclass of) Sink.  It's methods will be
     called as the file is parsed; see the definition of Sink for the
     details.
+    BACKEND, if provided, is the name of the parsing backend to use (see
+    'backends'); otherwise, 'default_backend' is used.
+    All backends make the same SINK callbacks for a given file, except
+    that the "mmap" backend passes deltatexts as RCSText objects.
     """
-    return Parser().parse(file, sink)
+    return backends[backend or default_backend](file, sink)
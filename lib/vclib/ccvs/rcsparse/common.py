@@ -203,7 +203,9 @@ class Sink:
         LOG is a bytes string containing the log message.  This may be multi-line.
         TEXT is the contents of the file in this revision, either as full-text or
         as a diff, represented by a bytes object.  This is usually multi-line,
-        and often quite large and/or binary.
+        and often quite large and/or binary.  (The "mmap" backend passes an
+        RCSText object instead, to avoid copying TEXT out of the RCS file;
+        sinks which only use bytes(TEXT) and TEXT.split() work with both.)
         """
         pass
 
@@ -216,6 +218,54 @@ class Sink:
         pass
 
 
+class RCSText:
+    """The contents of an @-delimited string in an RCS file, referring to
+    the raw file data rather than holding a copy of it.
+
+    BUF is a buffer supporting slicing to bytes (usually a memory-mapped
+    RCS file), and the string's raw contents are BUF[START:END].  In the
+    raw contents, each "@" in the string is doubled; ESCAPED is true iff
+    there are any such doubled "@" characters.  They are unescaped only
+    when the contents are asked for, via bytes() or split().
+
+    Note that bytes() and split() return copies: what an RCSText saves is
+    copying the deltatexts a sink never asks for.  The sinks' consumers
+    (delta scripts, checked out and annotated lines) need bytes anyway,
+    and views of BUF would keep an mmap from being closed for as long as
+    any of them were alive.  The raw property gives a view, for callers
+    which can work with the still escaped contents."""
+
+    __slots__ = ("_buf", "_start", "_end", "escaped")
+
+    def __init__(self, buf, start, end, escaped):
+        self._buf = buf
+        self._start = start
+        self._end = end
+        self.escaped = escaped
+
+    @property
+    def raw(self):
+        """A memoryview of the raw (still escaped) contents."""
+        return memoryview(self._buf)[self._start : self._end]
+
+    def __bool__(self):
+        return self._end > self._start
+
+    def __bytes__(self):
+        data = self._buf[self._start : self._end]
+        if self.escaped:
+            data = data.replace(b"@@", b"@")
+        return data
+
+    def split(self, sep):
+        """Return the unescaped contents split on SEP (which must not
+        contain "@"), just as bytes.split() would, as a list of bytes."""
+        pieces = self._buf[self._start : self._end].split(sep)
+        if self.escaped:
+            pieces = [piece.replace(b"@@", b"@") for piece in pieces]
+        return pieces
+
+
 # --------------------------------------------------------------------------
 #
 # EXCEPTIONS USED BY RCSPARSE
@@ -238,6 +288,11 @@ class RCSExpected(RCSParseError):
         )
 
 
+class RCSUnexpectedEOF(RCSParseError):
+    def __init__(self):
+        RCSParseError.__init__(self, "Unexpected end of RCS file.")
+
+
 class RCSStopParser(Exception):
     pass
 
@@ -447,16 +502,14 @@ class _Parser:
 
     def parse_rcs_deltatext(self):
         while 1:
-            revision = self.ts.get()
+            revision = self.ts.get(allow_eof=True)
             if revision is None:
                 # EOF
                 break
-            text, sym2, log, sym1 = self.ts.mget(4)
-            if sym1 != b"log":
-                print(repr((text[:100], sym2[:100], log[:100], sym1[:100])))
-                raise RCSExpected(sym1, b"log")
-            if sym2 != b"text":
-                raise RCSExpected(sym2, b"text")
+            self.ts.match(b"log")
+            log = self.ts.get()
+            self.ts.match(b"text")
+            text = self.ts.get()
             # TODO: need to add code to chew up "newphrase"
             self.sink.set_revision_info(revision, log, text)
 
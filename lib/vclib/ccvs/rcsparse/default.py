@@ -40,10 +40,11 @@ class _TokenStream:
         self.idx = 0
         self.buf = self.rcsfile.read(self.CHUNK_SIZE)
         if self.buf == b"":
-            raise RuntimeError("EOF")
+            raise common.RCSUnexpectedEOF()
 
-    def get(self):
-        "Get the next token from the RCS file."
+    def get(self, allow_eof=False):
+        """Get the next token from the RCS file.  At the end of the file,
+        return None if ALLOW_EOF, else raise RCSUnexpectedEOF."""
 
         # Note: we can afford to loop within Python, examining individual
         # characters. For the whitespace and tokens, the number of iterations
@@ -58,8 +59,11 @@ class _TokenStream:
             if idx == lbuf:
                 buf = self.rcsfile.read(self.CHUNK_SIZE)
                 if buf == b"":
+                    if not allow_eof:
+                        raise common.RCSUnexpectedEOF()
                     # signal EOF by returning None as the token
-                    del self.buf  # so we fail if get() is called again
+                    self.buf = buf
+                    self.idx = 0
                     return None
                 lbuf = len(buf)
                 idx = 0
@@ -91,9 +95,10 @@ class _TokenStream:
                 # we stopped at the end of the buffer, so we may have a partial token
                 buf = self.rcsfile.read(self.CHUNK_SIZE)
                 if buf == b"":
-                    # signal EOF by returning None as the token
-                    del self.buf  # so we fail if get() is called again
-                    return None
+                    # the token ends at the end of the file
+                    self.buf = buf
+                    self.idx = 0
+                    return token
                 lbuf = len(buf)
                 idx = end = 0
 
@@ -112,7 +117,7 @@ class _TokenStream:
                 idx = 0
                 buf = self.rcsfile.read(self.CHUNK_SIZE)
                 if buf == b"":
-                    raise RuntimeError("EOF")
+                    raise common.RCSUnexpectedEOF()
                 lbuf = len(buf)
             i = buf.find(b"@", idx)
             if i == -1:
@@ -124,7 +129,10 @@ class _TokenStream:
                 idx = 0
                 buf = b"@" + self.rcsfile.read(self.CHUNK_SIZE)
                 if buf == b"@":
-                    raise RuntimeError("EOF")
+                    # the string ends at the end of the file
+                    self.buf = b""
+                    self.idx = 0
+                    return b"".join(chunks)
                 lbuf = len(buf)
                 continue
             if buf[(i + 1) : (i + 2)] == b"@":
@@ -159,12 +167,13 @@ class _TokenStream:
         # overridden method then returns the pushed token. Since this function
         # will not be looked up via the class mechanism, it should be a "normal"
         # function, meaning it won't have "self" automatically inserted.
-        # Therefore, we need to pass both self and the token thru via defaults.
+        # Therefore, we need to pass both self and the token thru via defaults
+        # (after the ALLOW_EOF argument get() takes).
 
         # note: we don't put this into the input buffer because it may have been
         # @-unescaped already.
 
-        def give_it_back(self=self, token=token):
+        def give_it_back(allow_eof=False, self=self, token=token):
             del self.get
             return token
 
@@ -0,0 +1,143 @@
+# -*-python-*-
+#
+# Copyright (C) 1999-2026 The ViewCVS Group. All Rights Reserved.
+#
+# By using this file, you agree to the terms and conditions set forth in
+# the LICENSE.html file which can be found at the top level of the ViewVC
+# distribution or at http://viewvc.org/license-1.html.
+#
+# For more information, visit http://viewvc.org/
+#
+# -----------------------------------------------------------------------
+
+"""mapped.py: an RCS parser working on a memory-mapped RCS file.
+
+Deltatexts are handed to the sink as RCSText objects which refer to the
+mapped file, so they are never copied (or unescaped) unless the sink
+actually uses them; those it does use are copied out as bytes.  Other
+strings are passed as bytes, as usual."""
+
+import io
+import mmap
+import os
+import re
+import stat
+from . import common
+from . import default
+
+# Skip whitespace, then match a ";" or ":", the "@" opening a string, or
+# any other token.
+_re_token = re.compile(rb"[ \t\n\r\v\f]*(?:([;:@])|([^ \t\n\r\v\f;:]+))")
+
+
+class _TokenStream:
+    def __init__(self, file):
+        try:
+            self.buf = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap() refuses empty files.
+            raise common.RCSUnexpectedEOF()
+        self.idx = file.tell()
+        self.pushback = None
+
+    def _get_string(self):
+        """Return (START, END, ESCAPED) for the raw contents of the
+        @-string whose opening "@" has just been consumed."""
+
+        buf = self.buf
+        start = idx = self.idx
+        escaped = False
+        while 1:
+            i = buf.find(b"@", idx)
+            if i == -1:
+                raise common.RCSUnexpectedEOF()
+            if buf[i + 1 : i + 2] == b"@":
+                escaped = True
+                idx = i + 2
+                continue
+            self.idx = i + 1
+            return start, i, escaped
+
+    def get(self, allow_eof=False):
+        """Get the next token from the RCS file.  At the end of the file,
+        return None if ALLOW_EOF, else raise RCSUnexpectedEOF."""
+
+        if self.pushback is not None:
+            token = self.pushback
+            self.pushback = None
+            return token
+
+        m = _re_token.match(self.buf, self.idx)
+        if m is None:
+            if not allow_eof:
+                raise common.RCSUnexpectedEOF()
+            # signal EOF by returning None as the token
+            return None
+        self.idx = m.end()
+        token = m.group(1)
+        if token is None:
+            return m.group(2)
+        if token != b"@":
+            return token
+        start, end, escaped = self._get_string()
+        data = self.buf[start:end]
+        if escaped:
+            data = data.replace(b"@@", b"@")
+        return data
+
+    def get_text(self):
+        "Get the next token, which must be an @-string, as an RCSText."
+
+        m = _re_token.match(self.buf, self.idx)
+        if m is None or m.group(1) != b"@":
+            # Not a string; let get() produce the token as usual.
+            return self.get()
+        self.idx = m.end()
+        start, end, escaped = self._get_string()
+        return common.RCSText(self.buf, start, end, escaped)
+
+    def match(self, match):
+        "Try to match the next token from the input buffer."
+
+        token = self.get()
+        if token != match:
+            raise common.RCSExpected(token, match)
+
+    def unget(self, token):
+        "Put this token back, for the next get() to return."
+
+        self.pushback = token
+
+    def mget(self, count):
+        "Return multiple tokens. 'next' is at the end."
+        result = []
+        for i in range(count):
+            result.append(self.get())
+        result.reverse()
+        return result
+
+
+class Parser(common._Parser):
+    stream_class = _TokenStream
+
+    def parse_rcs_deltatext(self):
+        while 1:
+            revision = self.ts.get(allow_eof=True)
+            if revision is None:
+                # EOF
+                break
+            self.ts.match(b"log")
+            log = self.ts.get()
+            self.ts.match(b"text")
+            text = self.ts.get_text()
+            self.sink.set_revision_info(revision, log, text)
+
+    def parse(self, file, sink):
+        try:
+            regular = stat.S_ISREG(os.fstat(file.fileno()).st_mode)
+        except (AttributeError, io.UnsupportedOperation):
+            regular = False
+        if not regular:
+            # Pipes, in-memory streams and the like can't be mapped.
+            return default.Parser().parse(file, sink)
+        return common._Parser.parse(self, file, sink)
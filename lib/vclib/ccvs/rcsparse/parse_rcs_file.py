@@ -37,6 +37,8 @@ class Logger:
         self.name = name
 
     def __call__(self, *args):
+        # Log RCSText arguments (from the "mmap" backend) by their contents.
+        args = [bytes(arg) if hasattr(arg, "raw") else arg for arg in args]
         arg_str = ", ".join([repr(arg) for arg in args])
         self.f.write(f"{self.name}({arg_str})\n")
 
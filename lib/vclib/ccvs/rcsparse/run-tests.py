@@ -16,7 +16,14 @@
 # history and logs, available at https://github.com/viewvc/viewvc/.
 # ====================================================================
 
-"""Run tests of rcsparse code."""
+"""Run tests of rcsparse code.
+
+Every available parsing backend is run over the ,v files in the
+test-data directory, and its sink callbacks are compared against the
+expected output recorded alongside each file.  Any additional ,v files
+(or directories containing them) named on the command line are parsed
+by every backend, and the backends' callbacks are compared against
+each other."""
 
 import sys
 import os
@@ -45,30 +52,58 @@ test_dir = os.path.join(script_dir, "test-data")
 filelist = glob.glob(os.path.join(test_dir, "*,v"))
 filelist.sort()
 
+extra_filelist = []
+for arg in sys.argv[1:]:
+    if os.path.isdir(arg):
+        for dirpath, dirnames, filenames in os.walk(arg):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith(",v"):
+                    extra_filelist.append(os.path.join(dirpath, filename))
+    else:
+        extra_filelist.append(arg)
+
+backends = sorted(rcsparse.backends.keys())
+
 all_tests_ok = 1
 
-for filename in filelist:
-    sys.stderr.write(f"{filename}: ")
+
+def parse_to_string(filename, backend):
     f = StringIO()
     try:
-        parse(open(filename, "rb"), LoggingSink(f))
+        parse(open(filename, "rb"), LoggingSink(f), backend)
     except Exception as e:
-        sys.stderr.write(f"Error parsing file: {e}!\n")
-        raise
-        all_tests_ok = 0
-    else:
-        output = f.getvalue()
-
-        expected_output_filename = filename[:-2] + ".out"
-        expected_output = open(expected_output_filename, "r").read()
-
-        if output == expected_output:
-            sys.stderr.write("OK\n")
-        else:
-            sys.stderr.write("Output does not match expected output!\n")
-            differ = Differ()
-            for diffline in differ.compare(expected_output.splitlines(1), output.splitlines(1)):
-                sys.stderr.write(diffline)
+        # Record the failure; all backends should fail the same way.
+        f.write(f"EXCEPTION: {e.__class__.__name__}\n")
+    return f.getvalue()
+
+
+def compare(expected_output, output):
+    if output == expected_output:
+        sys.stderr.write("OK\n")
+        return 1
+    sys.stderr.write("Output does not match expected output!\n")
+    differ = Differ()
+    for diffline in differ.compare(expected_output.splitlines(1), output.splitlines(1)):
+        sys.stderr.write(diffline)
+    return 0
+
+
+for filename in filelist:
+    expected_output_filename = filename[:-2] + ".out"
+    expected_output = open(expected_output_filename, "r").read()
+    for backend in backends:
+        sys.stderr.write(f"{filename} [{backend}]: ")
+        if not compare(expected_output, parse_to_string(filename, backend)):
+            all_tests_ok = 0
+
+for filename in extra_filelist:
+    expected_output = parse_to_string(filename, "default")
+    for backend in backends:
+        if backend == "default":
+            continue
+        sys.stderr.write(f"{filename} [{backend} vs. default]: ")
+        if not compare(expected_output, parse_to_string(filename, backend)):
             all_tests_ok = 0
 
 if all_tests_ok:
@@ -0,0 +1,179 @@
+# -*-python-*-
+#
+# Copyright (C) 1999-2026 The ViewCVS Group. All Rights Reserved.
+#
+# By using this file, you agree to the terms and conditions set forth in
+# the LICENSE.html file which can be found at the top level of the ViewVC
+# distribution or at http://viewvc.org/license-1.html.
+#
+# For more information, visit http://viewvc.org/
+#
+# -----------------------------------------------------------------------
+
+"""revcache.py: an on-disk cache of reconstructed RCS revision texts.
+
+Checking out an old revision of a ,v file means replaying every delta
+between the head revision and the one wanted.  The checkout code stores
+the text it reconstructs (and, along the way, a checkpoint every few
+revisions) here, so later checkouts of that revision, or of one further
+down the same line of development, can start from the nearest stored
+text instead of from the head revision.
+
+Entries are keyed on the ,v file's path, modification time and size, so
+changes to the file simply make its old entries unreachable.  Those are
+eventually evicted along with everything else: whenever the cache grows
+beyond its maximum size, the least recently used entries are removed.
+
+The annotate code keeps its per-revision line-to-revision maps here too,
+keyed on the path alone so that they outlive new commits to the file; it
+validates them itself."""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+# Each cache directory keeps the approximate total size of its files in
+# a file of this name, along with when that total was last recounted.
+# Processes storing files update the total without locking it, so it
+# can drift; it is recounted when it grows too large, and at least every
+# RECOUNT_INTERVAL seconds.
+SIZE_FILE = "size"
+RECOUNT_INTERVAL = 24 * 3600
+_size_lock = threading.Lock()
+
+
+class RevisionCache:
+    def __init__(self, directory, max_bytes, interval):
+        """Create a cache of revision texts in DIRECTORY (which is created
+        if necessary), holding at most about MAX_BYTES worth of texts.
+        The checkout code stores a checkpoint every INTERVAL revisions."""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.interval = max(interval, 1)
+
+    def key(self, pathname, st=None):
+        """Return the key for texts of the RCS file PATHNAME, whose
+        os.stat_result is ST.  If ST is None, the key covers every version
+        of the file, and users of the entries stored under it have to
+        check for themselves that those are still valid."""
+        if st is None:
+            return pathname
+        return f"{pathname}\0{st.st_mtime_ns}\0{st.st_size}"
+
+    def _path(self, key, revision):
+        digest = hashlib.sha1(f"{key}\0{revision}".encode("utf-8", "surrogateescape")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get(self, key, revision):
+        """Return the text of REVISION of the RCS file KEY identifies, as
+        bytes, or None if it isn't cached."""
+        path = self._path(key, revision)
+        try:
+            with open(path, "rb") as fp:
+                data = fp.read()
+            # Note the use, for LRU eviction.
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def has(self, key, revision):
+        """Return true iff the text of REVISION of the RCS file KEY
+        identifies is cached."""
+        return os.path.exists(self._path(key, revision))
+
+    def put(self, key, revision, data):
+        """Store the bytes DATA as the text of REVISION of the RCS file KEY
+        identifies.  Failures are ignored; the cache is only an aid."""
+        path = self._path(key, revision)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(data)
+            os.replace(temp, path)
+        except OSError:
+            return
+        note_stored(self.directory, self.max_bytes, len(data))
+
+
+def note_stored(directory, max_bytes, size):
+    """Note that SIZE more bytes (which may be negative) have been stored
+    in DIRECTORY, a cache directory of files kept in subdirectories of it,
+    and if that has grown beyond MAX_BYTES, remove the least recently used
+    files until it is within that size again."""
+    path = os.path.join(directory, SIZE_FILE)
+    with _size_lock:
+        total, recounted = _read_size(path)
+        if total is not None and time.time() - recounted < RECOUNT_INTERVAL:
+            total = total + size
+            _write_size(path, total, recounted)
+        else:
+            total = None
+    if total is None or total > max_bytes:
+        _evict(directory, max_bytes)
+
+
+def _read_size(path):
+    """Return the total size and the time it was recounted, as stored in
+    the size file PATH, or (None, None) if it can't be read."""
+    try:
+        with open(path) as fp:
+            total, recounted = fp.read().split()
+        return int(total), float(recounted)
+    except (OSError, ValueError):
+        return None, None
+
+
+def _write_size(path, total, recounted):
+    """Store the total size TOTAL, recounted at time RECOUNTED, in the size
+    file PATH.  Failures are ignored."""
+    try:
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "w") as fp:
+            fp.write(f"{total} {recounted}\n")
+        os.replace(temp, path)
+    except OSError:
+        pass
+
+
+def _evict(directory, max_bytes):
+    """Recount the size of the cache directory DIRECTORY, and remove least
+    recently used files until it is within MAX_BYTES again."""
+    recounted = time.time()
+    entries = []
+    total = 0
+    try:
+        subdirs = os.listdir(directory)
+    except OSError:
+        return
+    for subdir in subdirs:
+        subdir = os.path.join(directory, subdir)
+        try:
+            names = os.listdir(subdir)
+        except OSError:
+            continue
+        for name in names:
+            path = os.path.join(subdir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total = total + st.st_size
+    if total > max_bytes:
+        # Go down to 90% of the maximum, so we don't have to do this
+        # again on the very next store.
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total = total - size
+    with _size_lock:
+        _write_size(os.path.join(directory, SIZE_FILE), total, recounted)
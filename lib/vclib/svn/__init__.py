@@ -15,7 +15,9 @@
 import os
 import os.path
 import re
+import threading
 import urllib.parse
+from collections import OrderedDict
 from vclib import _getfspath, os_listdir
 
 _re_url = re.compile(r"^(http|https|file|svn|svn\+[^:]+)://")
@@ -90,19 +92,109 @@ def find_root_in_parent(parent_path, rootname, path_encoding):
     return None
 
 
+class RevisionInfoCache:
+    """A process-wide, size-bounded cache of the paths changed in
+    Subversion revisions.
+
+    What a committed revision changed never changes, so entries are keyed
+    on the repository's UUID and the revision number (plus a tag naming
+    the kind of records stored), and are shared by every repository object
+    this process opens.  Entries hold only raw, authz-independent records;
+    each repository object applies its own authz rules to them.  Revision
+    properties, which can be edited after the fact, aren't kept here.
+
+    The size of an entry is one plus the number of records it holds, and
+    when the total size exceeds the maximum, the least recently used
+    entries are dropped."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the tuple of records stored under KEY, or None."""
+        with self._lock:
+            records = self._entries.get(key)
+            if records is not None:
+                self._entries.move_to_end(key)
+            return records
+
+    def fits(self, count):
+        """Return True iff an entry of COUNT records would be stored."""
+        return count + 1 <= self.max_size
+
+    def put(self, key, records):
+        """Store the tuple RECORDS under KEY."""
+        if not self.fits(len(records)):
+            return
+        size = len(records) + 1
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size = self.size - len(old) - 1
+            self._entries[key] = records
+            self.size = self.size + size
+            while self.size > self.max_size:
+                key, old = self._entries.popitem(last=False)
+                self.size = self.size - len(old) - 1
+
+
+# This process's RevisionInfoCaches, by root name.
+_revinfo_caches = {}
+_revinfo_caches_lock = threading.Lock()
+
+
+def get_revision_info_cache(name, max_size):
+    """Return this process's RevisionInfoCache for the root NAME, created
+    with (or resized to) a maximum size of MAX_SIZE, or None if MAX_SIZE
+    is 0.  Each root has a cache of its own, so that roots configured
+    with different sizes don't keep resizing a shared one."""
+
+    if not max_size:
+        return None
+    with _revinfo_caches_lock:
+        revinfo_cache = _revinfo_caches.get(name)
+        if revinfo_cache is None:
+            revinfo_cache = _revinfo_caches[name] = RevisionInfoCache(max_size)
+        elif revinfo_cache.max_size != max_size:
+            revinfo_cache.max_size = max_size
+        return revinfo_cache
+
+
 def SubversionRepository(
-    name, rootpath, authorizer, utilities, config_dir, content_encoding, path_encoding
+    name,
+    rootpath,
+    authorizer,
+    utilities,
+    config_dir,
+    content_encoding,
+    path_encoding,
+    revinfo_cache=None,
 ):
+    """Return a repository object for the Subversion repository at
+    ROOTPATH (a local path or a URL).  REVINFO_CACHE, if not None, is the
+    RevisionInfoCache in which to share the paths changed in revisions
+    across requests."""
+
     rootpath = canonicalize_rootpath(rootpath)
     if re.search(_re_url, rootpath):
         from . import svn_ra
 
         return svn_ra.RemoteSubversionRepository(
-            name, rootpath, authorizer, utilities, config_dir, content_encoding
+            name, rootpath, authorizer, utilities, config_dir, content_encoding, revinfo_cache
         )
     else:
         from . import svn_repos
 
         return svn_repos.LocalSubversionRepository(
-            name, rootpath, authorizer, utilities, config_dir, content_encoding, path_encoding
+            name,
+            rootpath,
+            authorizer,
+            utilities,
+            config_dir,
+            content_encoding,
+            path_encoding,
+            revinfo_cache,
         )
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*-python-*-
+#
+# Copyright (C) 1999-2026 The ViewCVS Group. All Rights Reserved.
+#
+# By using this file, you agree to the terms and conditions set forth in
+# the LICENSE.html file which can be found at the top level of the ViewVC
+# distribution or at http://viewvc.org/license-1.html.
+#
+# For more information, visit http://viewvc.org/
+#
+# -----------------------------------------------------------------------
+
+"""Run tests of the local Subversion repository driver.
+
+A scratch repository is built with the Subversion Python bindings, some
+of its files are locked, and the lock owners the driver reports for the
+entries of its directories are compared against the expected ones."""
+
+import sys
+import os
+import shutil
+import tempfile
+
+# Get access to our library modules.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "..", ".."))
+
+import config
+import vclib.svn
+from svn import fs, repos, core
+
+# The scratch repository's files, and the owners of the locks on them.
+FILES = {
+    "top.txt": None,
+    "dir/locked.txt": "alice",
+    "dir/unlocked.txt": None,
+    "dir/sub/deep.txt": "bob",
+}
+
+# The directories to list, and the lock owners expected for their entries.
+# Locks below an entry mustn't show up as locks on the entry itself.
+EXPECTED = {
+    "": {"top.txt": None, "dir": None},
+    "dir": {"locked.txt": "alice", "unlocked.txt": None, "sub": None},
+    "dir/sub": {"deep.txt": "bob"},
+}
+
+
+def make_repos(path):
+    """Create a Subversion repository at PATH holding FILES, and lock those
+    of them that have an owner."""
+
+    repos_ptr = repos.create(path, None, None, None, None)
+    fs_ptr = repos.fs(repos_ptr)
+    txn = repos.fs_begin_txn_for_commit(repos_ptr, 0, "tester", "Add the files.")
+    root = fs.txn_root(txn)
+    dirs = set()
+    for filename in sorted(FILES):
+        parts = filename.split("/")
+        for i in range(1, len(parts)):
+            dirname = "/".join(parts[:i])
+            if dirname not in dirs:
+                fs.make_dir(root, dirname)
+                dirs.add(dirname)
+        fs.make_file(root, filename)
+        stream = fs.apply_text(root, filename, None)
+        core.svn_stream_write(stream, f"This is {filename}.\n".encode("utf-8"))
+        core.svn_stream_close(stream)
+    repos.fs_commit_txn(repos_ptr, txn)
+    rev = fs.youngest_rev(fs_ptr)
+    for filename, owner in FILES.items():
+        if owner is not None:
+            fs.set_access(fs_ptr, fs.create_access(owner))
+            fs.lock(fs_ptr, "/" + filename, None, "Locked for testing.", 0, 0, rev, 0)
+
+
+def run_tests(rootpath):
+    cfg = config.Config()
+    cfg.set_defaults()
+    svnrepos = vclib.svn.SubversionRepository(
+        "test", rootpath, None, cfg.utilities, None, "utf-8", "utf-8"
+    )
+    svnrepos.open()
+    all_tests_ok = 1
+    for path, expected in sorted(EXPECTED.items()):
+        sys.stderr.write(f"dirlogs of /{path}: ")
+        path_parts = [x for x in path.split("/") if x]
+        entries = svnrepos.listdir(path_parts, None, {})
+        svnrepos.dirlogs(path_parts, None, entries, {})
+        found = dict((entry.name, entry.lockinfo) for entry in entries)
+        if found == expected:
+            sys.stderr.write("OK\n")
+        else:
+            sys.stderr.write(f"expected locks {expected}, found {found}\n")
+            all_tests_ok = 0
+    return all_tests_ok
+
+
+tmpdir = tempfile.mkdtemp()
+try:
+    rootpath = os.path.join(tmpdir, "repos")
+    make_repos(rootpath)
+    all_tests_ok = run_tests(rootpath)
+finally:
+    shutil.rmtree(tmpdir)
+
+if all_tests_ok:
+    sys.exit(0)
+else:
+    sys.exit(1)
@@ -196,13 +196,16 @@ class SelfCleanFP:
 
 
 class RemoteSubversionRepository(vclib.Repository):
-    def __init__(self, name, rootpath, authorizer, utilities, config_dir, encoding):
+    def __init__(
+        self, name, rootpath, authorizer, utilities, config_dir, encoding, revinfo_cache=None
+    ):
         self.name = name
         self.rootpath = rootpath
         self.auth = authorizer
         self.diff_cmd = utilities.diff or "diff"
         self.config_dir = config_dir or None
         self.content_encoding = encoding
+        self.revinfo_cache = revinfo_cache
 
         # See if this repository is even viewable, authz-wise.
         if not vclib.check_root_access(self):
@@ -218,6 +221,7 @@ class RemoteSubversionRepository(vclib.Repository):
         self.youngest = ra.svn_ra_get_latest_revnum(self.ra_session)
         self._dirent_cache = {}
         self._revinfo_cache = {}
+        self._uuid = None
 
         # See if a universal read access determination can be made.
         if self.auth and self.auth.check_universal_access(self.name) == 1:
@@ -506,18 +510,21 @@ class RemoteSubversionRepository(vclib.Repository):
             tmp_dirents, locks = client.svn_client_ls3(
                 dir_url, _rev2optrev(rev), _rev2optrev(rev), 0, self.ctx
             )
-            dirents = {}
+            children = []
             for name, dirent in tmp_dirents.items():
-                dirent_parts = path_parts + [_strpath(name)]
                 kind = dirent.kind
-                if (
-                    kind == core.svn_node_dir or kind == core.svn_node_file
-                ) and vclib.check_path_access(
-                    self, dirent_parts, (kind == core.svn_node_dir and vclib.DIR or vclib.FILE), rev
-                ):
-                    lh_rev, c_rev = self._get_last_history_rev(dirent_parts, rev)
+                if kind == core.svn_node_dir or kind == core.svn_node_file:
+                    pathtype = kind == core.svn_node_dir and vclib.DIR or vclib.FILE
+                    children.append((_strpath(name), pathtype, dirent))
+            access = vclib.check_children_access(
+                self, path_parts, [(name, pathtype) for name, pathtype, dirent in children], rev
+            )
+            dirents = {}
+            for (name, pathtype, dirent), readable in zip(children, access):
+                if readable:
+                    lh_rev, c_rev = self._get_last_history_rev(path_parts + [name], rev)
                     dirent.created_rev = lh_rev
-                    dirents[_strpath(name)] = dirent
+                    dirents[name] = dirent
             dirents_locks = [dirents, locks]
             self._dirent_cache[key] = dirents_locks
 
@@ -558,6 +565,12 @@ class RemoteSubversionRepository(vclib.Repository):
 
     def _revinfo_fetch(self, rev, include_changed_paths=0):
         need_changes = include_changed_paths or self.auth
+        action_map = {
+            "D": vclib.DELETED,
+            "A": vclib.ADDED,
+            "R": vclib.REPLACED,
+            "M": vclib.MODIFIED,
+        }
         revs = []
 
         def _log_cb(log_entry, pool, retval=revs):
@@ -566,19 +579,10 @@ class RemoteSubversionRepository(vclib.Repository):
             if retval:
                 return
 
-            revision = log_entry.revision
-            msg, author, date, revprops = _split_revprops(log_entry.revprops)
-            action_map = {
-                "D": vclib.DELETED,
-                "A": vclib.ADDED,
-                "R": vclib.REPLACED,
-                "M": vclib.MODIFIED,
-            }
-
-            # Easy out: if we won't use the changed-path info, just return a
-            # changes-less tuple.
+            # Easy out: if we won't use the changed-path info, don't bother
+            # with it.
             if not need_changes:
-                return revs.append([date, author, msg, revprops, None])
+                return revs.append((log_entry.revprops, None))
 
             # Subversion 1.5 and earlier didn't offer the 'changed_paths2'
             # hash, and in Subversion 1.6, it's offered but broken.
@@ -590,10 +594,8 @@ class RemoteSubversionRepository(vclib.Repository):
                 paths = list((changed_paths or {}).keys())
             paths.sort(key=_sort_key_pathb)
 
-            # If we get this far, our caller needs changed-paths, or we need
-            # them for authz-related sanitization.
-            changes = []
-            found_readable = found_unreadable = 0
+            # Record the changes, without regard to authz for now.
+            records = []
             for path in paths:
                 change = changed_paths[path]
                 pathtype = _kind2type(change.node_kind)
@@ -614,58 +616,106 @@ class RemoteSubversionRepository(vclib.Repository):
                 else:
                     is_copy = 0
                     base_path = path
-                    base_rev = revision - 1
-
-                # Check authz rules (sadly, we have to lie about the path type)
-                parts = _path_parts(_strpath(path))
-                if vclib.check_path_access(self, parts, vclib.FILE, revision):
-                    if is_copy and base_path and (base_path != path):
-                        parts = _path_parts(_strpath(base_path))
-                        if not vclib.check_path_access(self, parts, vclib.FILE, base_rev):
-                            is_copy = 0
-                            base_path = None
-                            base_rev = None
-                            found_unreadable = 1
-                    changes.append(
-                        SVNChangedPath(
-                            _strpath(path),
-                            revision,
-                            pathtype,
-                            _strpath(base_path),
-                            base_rev,
-                            action,
-                            is_copy,
-                            text_modified,
-                            props_modified,
-                        )
+                    base_rev = rev - 1
+                records.append(
+                    (
+                        _strpath(path),
+                        pathtype,
+                        _strpath(base_path),
+                        base_rev,
+                        action,
+                        is_copy,
+                        text_modified,
+                        props_modified,
                     )
-                    found_readable = 1
-                else:
-                    found_unreadable = 1
-
-                # If our caller doesn't want changed-path stuff, and we have
-                # the info we need to make an authz determination already,
-                # quit this loop and get on with it.
-                if (not include_changed_paths) and found_unreadable and found_readable:
-                    break
-
-            # Filter unreadable information.
-            if found_unreadable:
-                msg = None
-                if not found_readable:
-                    author = None
-                    date = None
-
-            # Drop unrequested changes.
-            if not include_changed_paths:
-                changes = None
-
-            # Add this revision information to the "return" array.
-            retval.append([date, author, msg, revprops, changes])
-
-        optrev = _rev2optrev(rev)
-        client_log(self.rootpath, optrev, optrev, 1, need_changes, 0, _log_cb, self.ctx)
-        return tuple(revs[0])
+                )
+            revs.append((log_entry.revprops, tuple(records)))
+
+        # If the paths changed in this revision are in the shared revision
+        # info cache, we need only fetch its (mutable) properties.
+        # Otherwise, fetch its log entry (with changed paths if needed).
+        records = None
+        if need_changes and self.revinfo_cache is not None:
+            if self._uuid is None:
+                self._uuid = _strpath(ra.svn_ra_get_uuid2(self.ra_session))
+            records = self.revinfo_cache.get((self._uuid, rev, "changes"))
+        if records is not None:
+            revprops = ra.svn_ra_rev_proplist(self.ra_session, rev)
+        else:
+            optrev = _rev2optrev(rev)
+            client_log(self.rootpath, optrev, optrev, 1, need_changes, 0, _log_cb, self.ctx)
+            revprops, records = revs[0]
+            if records is not None and self.revinfo_cache is not None:
+                self.revinfo_cache.put((self._uuid, rev, "changes"), records)
+        msg, author, date, revprops = _split_revprops(revprops)
+        if not need_changes:
+            return date, author, msg, revprops, None
+
+        # Check authz rules (sadly, we have to lie about the path types),
+        # and build ChangedPath objects from the readable changes.
+        # If the user may read all (or none) of the tree the changes were
+        # made in, they needn't be checked one by one.
+        subtree_access = vclib.check_subtree_access(
+            self, vclib.common_path_parts([record[0] for record in records]), rev
+        )
+        changes = []
+        found_readable = found_unreadable = 0
+        for record in records:
+            (
+                spath,
+                pathtype,
+                base_path,
+                base_rev,
+                action,
+                is_copy,
+                text_modified,
+                props_modified,
+            ) = record
+            readable = subtree_access
+            if readable is None:
+                readable = vclib.check_path_access(self, _path_parts(spath), vclib.FILE, rev)
+            if readable:
+                if is_copy and base_path and (base_path != spath):
+                    parts = _path_parts(base_path)
+                    if not vclib.check_path_access(self, parts, vclib.FILE, base_rev):
+                        is_copy = 0
+                        base_path = None
+                        base_rev = None
+                        found_unreadable = 1
+                changes.append(
+                    SVNChangedPath(
+                        spath,
+                        rev,
+                        pathtype,
+                        base_path,
+                        base_rev,
+                        action,
+                        is_copy,
+                        text_modified,
+                        props_modified,
+                    )
+                )
+                found_readable = 1
+            else:
+                found_unreadable = 1
+
+            # If our caller doesn't want changed-path stuff, and we have
+            # the info we need to make an authz determination already,
+            # quit this loop and get on with it.
+            if (not include_changed_paths) and found_unreadable and found_readable:
+                break
+
+        # Filter unreadable information.
+        if found_unreadable:
+            msg = None
+            if not found_readable:
+                author = None
+                date = None
+
+        # Drop unrequested changes.
+        if not include_changed_paths:
+            changes = None
+        return date, author, msg, revprops, changes
 
     def _revinfo(self, rev, include_changed_paths=0):
         """Internal-use, cache-friendly revision information harvester."""
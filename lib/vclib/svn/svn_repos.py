@@ -365,7 +365,15 @@ class SVNChangedPath(vclib.ChangedPath):
 
 class LocalSubversionRepository(vclib.Repository):
     def __init__(
-        self, name, rootpath, authorizer, utilities, config_dir, content_encoding, path_encoding
+        self,
+        name,
+        rootpath,
+        authorizer,
+        utilities,
+        config_dir,
+        content_encoding,
+        path_encoding,
+        revinfo_cache=None,
     ):
         if sys.platform == "win32":
             if not (os.path.isdir(rootpath) and os.path.isfile(os.path.join(rootpath, "format"))):
@@ -384,6 +392,7 @@ class LocalSubversionRepository(vclib.Repository):
         self.diff_cmd = utilities.diff or "diff"
         self.config_dir = config_dir or None
         self.content_encoding = content_encoding
+        self.revinfo_cache = revinfo_cache
 
         # See if this repository is even viewable, authz-wise.
         if not vclib.check_root_access(self):
@@ -396,6 +405,7 @@ class LocalSubversionRepository(vclib.Repository):
         self.youngest = fs.youngest_rev(self.fs_ptr)
         self._fsroots = {}
         self._revinfo_cache = {}
+        self._uuid = None
 
         # See if a universal read access determination can be made.
         if self.auth and self.auth.check_universal_access(self.name) == 1:
@@ -439,11 +449,11 @@ class LocalSubversionRepository(vclib.Repository):
         dirents = fs.dir_entries(fsroot, path)
         entries = []
         for entry in dirents.values():
-            kind = _kind2type(entry.kind)
-            ent_path = _strpath(entry.name)
-            if vclib.check_path_access(self, path_parts + [ent_path], kind, rev):
-                entries.append(vclib.DirEntry(ent_path, kind))
-        return entries
+            entries.append(vclib.DirEntry(_strpath(entry.name), _kind2type(entry.kind)))
+        access = vclib.check_children_access(
+            self, path_parts, [(entry.name, entry.kind) for entry in entries], rev
+        )
+        return [entry for entry, readable in zip(entries, access) if readable]
 
     def dirlogs(self, path_parts, rev, entries, options):
         path = self._getpath(path_parts)
@@ -451,25 +461,56 @@ class LocalSubversionRepository(vclib.Repository):
             raise vclib.Error(f"Path '{path}' is not a directory.")
         fsroot = self._getroot(self._getrev(rev))
         rev = self._getrev(rev)
-        for entry in entries:
-            ent_path = entry.name
-            entry_path_parts = path_parts + [ent_path]
-            if not vclib.check_path_access(self, entry_path_parts, entry.kind, rev):
+
+        # Find the readable entries and the revisions in which they were
+        # last changed...
+        found = []
+        access = vclib.check_children_access(
+            self, path_parts, [(entry.name, entry.kind) for entry in entries], rev
+        )
+        for entry, readable in zip(entries, access):
+            if not readable:
                 continue
-            path = self._getpath(entry_path_parts)
-            entry_rev = _get_last_history_rev(fsroot, path)
-            date, author, msg, revprops, changes = self._revinfo(entry_rev)
+            ent_path = self._getpath(path_parts + [entry.name])
+            found.append((entry, ent_path, _get_last_history_rev(fsroot, ent_path)))
+        if not found:
+            return
+
+        # ...then fetch the information for each of those revisions just
+        # once, no matter how many entries share it, and the locks on all
+        # the entries at once.
+        revinfos = {}
+        for entry, ent_path, entry_rev in found:
+            if entry_rev not in revinfos:
+                revinfos[entry_rev] = self._revinfo(entry_rev)
+        locks = self._get_dir_locks(path)
+
+        for entry, ent_path, entry_rev in found:
+            date, author, msg, revprops, changes = revinfos[entry_rev]
             entry.rev = str(entry_rev)
             entry.date = date
             entry.author = author
             entry.log = msg
             if entry.kind == vclib.FILE:
-                entry.size = fs.file_length(fsroot, path)
-            lock = fs.get_lock(self.fs_ptr, path)
+                entry.size = fs.file_length(fsroot, ent_path)
+            lock = locks.get(ent_path)
             entry.lockinfo = (
                 lock and _normalize_property_value(lock.owner, self.content_encoding) or None
             )
 
+    def _get_dir_locks(self, path):
+        """Return a dictionary mapping the paths of the locked immediate
+        children of directory PATH to their locks."""
+        locks = repos.svn_repos_fs_get_locks2(
+            self.repos, "/" + path, core.svn_depth_immediates, _allow_all
+        )
+        dir_locks = {}
+        for lock_path, lock in locks.items():
+            if isinstance(lock_path, bytes):
+                lock_path = _strpath(lock_path)
+            dir_locks[_cleanup_path(lock_path)] = lock
+        return dir_locks
+
     def itemlog(self, path_parts, rev, sortby, first, limit, options):
         """see vclib.Repository.itemlog docstring
 
@@ -618,24 +659,19 @@ class LocalSubversionRepository(vclib.Repository):
     def _revinfo(self, rev, include_changed_paths=0):
         """Internal-use, cache-friendly revision information harvester."""
 
-        def _get_changed_paths(fsroot):
-            """Return a 3-tuple: found_readable, found_unreadable, changed_paths."""
+        def _get_changes():
+            """Return a tuple of (PATH, PATHTYPE, BASE_PATH, BASE_REV, ACTION,
+            IS_COPY, TEXT_CHANGED, PROP_CHANGES) records, one per path changed
+            in revision REV, without regard to authz."""
+            fsroot = self._getroot(rev)
             editor = repos.ChangeCollector(self.fs_ptr, fsroot)
             e_ptr, e_baton = delta.make_editor(editor)
             repos.svn_repos_replay(fsroot, e_ptr, e_baton)
-            changedpaths = {}
+            records = []
             changes = editor.get_changes()
-
-            # Copy the Subversion changes into a new hash, checking
-            # authorization and converting them into ChangedPath objects.
-            found_readable = found_unreadable = 0
             for path in changes.keys():
-                spath = _strpath(path)
                 change = changes[path]
-                if change.path:
-                    change.path = _cleanup_path(change.path)
-                if change.base_path:
-                    change.base_path = _cleanup_path(change.base_path)
+                base_path = change.base_path and _cleanup_path(change.base_path)
                 is_copy = 0
                 action = {
                     repos.CHANGE_ACTION_ADD: vclib.ADDED,
@@ -644,34 +680,68 @@ class LocalSubversionRepository(vclib.Repository):
                 }.get(change.action, vclib.MODIFIED)
                 if (
                     (action == vclib.ADDED or action == vclib.REPLACED)
-                    and change.base_path
+                    and base_path
                     and change.base_rev
                 ):
                     is_copy = 1
-                pathtype = _kind2type(change.item_kind)
-                parts = _path_parts(spath)
-                if vclib.check_path_access(self, parts, pathtype, rev):
-                    if is_copy and change.base_path and (change.base_path != path):
-                        parts = _path_parts(_strpath(change.base_path))
-                        if not vclib.check_path_access(self, parts, pathtype, change.base_rev):
+                records.append(
+                    (
+                        _strpath(path),
+                        _kind2type(change.item_kind),
+                        _strpath(base_path or None),
+                        change.base_rev,
+                        action,
+                        is_copy,
+                        change.text_changed,
+                        change.prop_changes,
+                    )
+                )
+            return tuple(records)
+
+        def _get_changed_paths(records):
+            """Return a 3-tuple: found_readable, found_unreadable, changed_paths."""
+            changedpaths = {}
+
+            # Check authorization of the changes, converting them into
+            # ChangedPath objects.  If the user may read all (or none) of
+            # the tree the changes were made in, they needn't be checked one
+            # by one.
+            subtree_access = vclib.check_subtree_access(
+                self, vclib.common_path_parts([record[0] for record in records]), rev
+            )
+            found_readable = found_unreadable = 0
+            for record in records:
+                (
+                    spath,
+                    pathtype,
+                    base_path,
+                    base_rev,
+                    action,
+                    is_copy,
+                    text_changed,
+                    prop_changes,
+                ) = record
+                readable = subtree_access
+                if readable is None:
+                    readable = vclib.check_path_access(self, _path_parts(spath), pathtype, rev)
+                if readable:
+                    if is_copy and base_path and (base_path != spath):
+                        parts = _path_parts(base_path)
+                        if not vclib.check_path_access(self, parts, pathtype, base_rev):
                             is_copy = 0
-                            change.base_path = None
-                            change.base_rev = None
+                            base_path = None
+                            base_rev = None
                             found_unreadable = 1
-                    if change.base_path:
-                        base_path = _strpath(change.base_path)
-                    else:
-                        base_path = None
                     changedpaths[spath] = SVNChangedPath(
                         spath,
                         rev,
                         pathtype,
                         base_path,
-                        change.base_rev,
+                        base_rev,
                         action,
                         is_copy,
-                        change.text_changed,
-                        change.prop_changes,
+                        text_changed,
+                        prop_changes,
                     )
                     found_readable = 1
                 else:
@@ -696,53 +766,102 @@ class LocalSubversionRepository(vclib.Repository):
                 copyfrom_path = None
             return copyfrom_path, copyfrom_rev
 
-        def _simple_auth_check(fsroot):
+        def _get_pathtype(fsroot, changes, path, change):
+            # Return the pathtype of PATH, changed by CHANGE (one of the
+            # CHANGES made in revision REV), for the authz subsystem.
+            pathtype = _kind2type(change.node_kind)
+            if pathtype is not None:
+                return pathtype
+            parts = _path_parts(_strpath(path))
+            if change.change_kind != fs.path_change_delete:
+                return self._gettype(self._getpath(parts), rev)
+
+            # Deletions are annoying, because they might be underneath
+            # copies (make their previous location non-trivial).
+            prev_parts = parts
+            prev_rev = rev - 1
+            parent_parts = parts[:-1]
+            while parent_parts:
+                parent_path = "/" + self._getpath(parent_parts)
+                pchange = changes.get(parent_path)
+                if not (
+                    pchange
+                    and (
+                        pchange.change_kind == fs.path_change_replace
+                        or pchange.change_kind == fs.path_change_add
+                    )
+                ):
+                    del parent_parts[-1]
+                    continue
+                copyfrom_path, copyfrom_rev = _get_change_copyinfo(fsroot, parent_path, pchange)
+                if copyfrom_path:
+                    prev_rev = copyfrom_rev
+                    prev_parts = _path_parts(_strpath(copyfrom_path)) + parts[len(parent_parts) :]
+                    break
+                del parent_parts[-1]
+            return self._gettype(self._getpath(prev_parts), prev_rev)
+
+        def _get_auth_paths(fsroot, changes):
+            """Return a tuple of (PATH, PATHTYPE, COPYFROM_PATH, COPYFROM_REV)
+            records, one per path in CHANGES (those changed in revision REV),
+            without regard to authz.  Unlike _get_changes(), this doesn't
+            replay the revision."""
+            records = []
+            for path, change in changes.items():
+                pathtype = _get_pathtype(fsroot, changes, path, change)
+                copyfrom_path, copyfrom_rev = _get_change_copyinfo(fsroot, path, change)
+                if not copyfrom_path or copyfrom_path == path:
+                    copyfrom_path = copyfrom_rev = None
+                records.append((_strpath(path), pathtype, _strpath(copyfrom_path), copyfrom_rev))
+            return tuple(records)
+
+        def _simple_auth_check(records):
             """Return a 2-tuple: found_readable, found_unreadable."""
+            subtree_access = vclib.check_subtree_access(
+                self, vclib.common_path_parts([record[0] for record in records]), rev
+            )
             found_unreadable = found_readable = 0
-            changes = fs.paths_changed2(fsroot)
-            paths = list(changes.keys())
-            for path in paths:
-                change = changes[path]
-                pathtype = _kind2type(change.node_kind)
-                parts = _path_parts(_strpath(path))
-                if pathtype is None:
-                    # Figure out the pathtype so we can query the authz subsystem.
-                    if change.change_kind == fs.path_change_delete:
-                        # Deletions are annoying, because they might be underneath
-                        # copies (make their previous location non-trivial).
-                        prev_parts = parts
-                        prev_rev = rev - 1
-                        parent_parts = parts[:-1]
-                        while parent_parts:
-                            parent_path = "/" + self._getpath(parent_parts)
-                            pchange = changes.get(parent_path)
-                            if not (
-                                pchange
-                                and (
-                                    pchange.change_kind == fs.path_change_replace
-                                    or pchange.change_kind == fs.path_change_add
-                                )
-                            ):
-                                del parent_parts[-1]
-                                continue
-                            copyfrom_path, copyfrom_rev = _get_change_copyinfo(
-                                fsroot, parent_path, pchange
-                            )
-                            if copyfrom_path:
-                                prev_rev = copyfrom_rev
-                                prev_parts = (
-                                    _path_parts(_strpath(copyfrom_path))
-                                    + parts[len(parent_parts) :]
-                                )
-                                break
-                            del parent_parts[-1]
-                        pathtype = self._gettype(self._getpath(prev_parts), prev_rev)
-                    else:
-                        pathtype = self._gettype(self._getpath(parts), rev)
-                if vclib.check_path_access(self, parts, pathtype, rev):
+            for spath, pathtype, copyfrom_path, copyfrom_rev in records:
+                readable = subtree_access
+                if readable is None:
+                    readable = vclib.check_path_access(self, _path_parts(spath), pathtype, rev)
+                if readable:
+                    found_readable = 1
+                    if copyfrom_path:
+                        parts = _path_parts(copyfrom_path)
+                        if not vclib.check_path_access(self, parts, pathtype, copyfrom_rev):
+                            found_unreadable = 1
+                else:
+                    found_unreadable = 1
+                if found_readable and found_unreadable:
+                    break
+            return found_readable, found_unreadable
+
+        def _lazy_auth_check(fsroot, changes):
+            """Return a 2-tuple: found_readable, found_unreadable.  Like
+            _simple_auth_check(), but working from CHANGES (those made in
+            revision REV) directly, looking up pathtypes and copy sources
+            only as needed and stopping as soon as the answer is known."""
+            subtree_access = vclib.check_subtree_access(
+                self, vclib.common_path_parts([_strpath(path) for path in changes]), rev
+            )
+            if changes and subtree_access == 0:
+                return 0, 1
+            found_unreadable = found_readable = 0
+            for path, change in changes.items():
+                if subtree_access is None:
+                    pathtype = _get_pathtype(fsroot, changes, path, change)
+                    parts = _path_parts(_strpath(path))
+                    readable = vclib.check_path_access(self, parts, pathtype, rev)
+                else:
+                    pathtype = None
+                    readable = subtree_access
+                if readable:
                     found_readable = 1
                     copyfrom_path, copyfrom_rev = _get_change_copyinfo(fsroot, path, change)
                     if copyfrom_path and copyfrom_path != path:
+                        if pathtype is None:
+                            pathtype = _get_pathtype(fsroot, changes, path, change)
                         parts = _path_parts(_strpath(copyfrom_path))
                         if not vclib.check_path_access(self, parts, pathtype, copyfrom_rev):
                             found_unreadable = 1
@@ -774,14 +893,27 @@ class LocalSubversionRepository(vclib.Repository):
             # were asked for them, or we need them to do authorization checks.
             #
             # If we only need them for authorization checks, though, we
-            # won't bother generating fully populated ChangedPath items (the
-            # cost is too great).
-            fsroot = self._getroot(rev)
+            # won't bother replaying the revision to generate fully populated
+            # ChangedPath items (the cost is too great).
             if include_changed_paths:
-                found_readable, found_unreadable, changedpaths = _get_changed_paths(fsroot)
+                records = self._get_shared_records(rev, "changes", _get_changes)
+                found_readable, found_unreadable, changedpaths = _get_changed_paths(records)
             else:
+                # Building the full records means looking up every path's
+                # type and copy source, which only pays off if they'll be
+                # shared.  Otherwise, look up only what's needed to tell.
                 changedpaths = None
-                found_readable, found_unreadable = _simple_auth_check(fsroot)
+                records = self._get_cached_records(rev, "authpaths")
+                if records is None:
+                    fsroot = self._getroot(rev)
+                    changes = fs.paths_changed2(fsroot)
+                    if self.revinfo_cache is not None and self.revinfo_cache.fits(len(changes)):
+                        records = _get_auth_paths(fsroot, changes)
+                        self.revinfo_cache.put(self._get_records_key(rev, "authpaths"), records)
+                if records is not None:
+                    found_readable, found_unreadable = _simple_auth_check(records)
+                else:
+                    found_readable, found_unreadable = _lazy_auth_check(fsroot, changes)
 
             # Filter our metadata where necessary, and return the requested data.
             if found_unreadable:
@@ -801,6 +933,31 @@ class LocalSubversionRepository(vclib.Repository):
             self._revinfo_cache[rev] = cached_info
         return tuple(cached_info)
 
+    def _get_records_key(self, rev, kind):
+        # Return the shared revision info cache's key for the KIND records
+        # of revision REV.
+        if self._uuid is None:
+            self._uuid = _strpath(fs.get_uuid(self.fs_ptr))
+        return (self._uuid, rev, kind)
+
+    def _get_cached_records(self, rev, kind):
+        """Return the tuple of KIND records for revision REV from the shared
+        revision info cache, or None if they aren't there."""
+        if self.revinfo_cache is None:
+            return None
+        return self.revinfo_cache.get(self._get_records_key(rev, kind))
+
+    def _get_shared_records(self, rev, kind, fetch):
+        """Return the tuple of KIND records for revision REV from the shared
+        revision info cache, calling FETCH to produce (and cache) them if
+        they aren't there."""
+        records = self._get_cached_records(rev, kind)
+        if records is None:
+            records = fetch()
+            if self.revinfo_cache is not None:
+                self.revinfo_cache.put(self._get_records_key(rev, kind), records)
+        return records
+
     def _log_helper(self, path, rev, lockinfo):
         rev_root = fs.revision_root(self.fs_ptr, rev)
         copyfrom_rev, copyfrom_path = fs.copied_from(rev_root, path)
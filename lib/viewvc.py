@@ -30,6 +30,7 @@ import email.utils
 import stat
 import struct
 import tempfile
+import threading
 import time
 from operator import attrgetter
 import io
@@ -127,7 +128,7 @@ class Request:
         # if we allow compressed output, see if the client does too
         self.gzip_compress_level = 0
         if cfg.options.allow_compress:
-            http_accept_encoding = os.environ.get("HTTP_ACCEPT_ENCODING", "")
+            http_accept_encoding = server.getenv("HTTP_ACCEPT_ENCODING", "")
             if "gzip" in [x.strip() for x in http_accept_encoding.split(",")]:
                 self.gzip_compress_level = 9  # make this configurable?
 
@@ -273,13 +274,11 @@ class Request:
                             cfg.options.use_rcsparse,
                             content_encoding,
                             path_encoding,
+                            get_revision_cache(cfg),
+                            get_dir_index(cfg),
+                            cfg.options.rlog_jobs,
+                            cfg.options.rcsparse_workers,
                         )
-                        # required so that spawned rcs programs correctly expand
-                        # $CVSHeader$
-                        if sys.platform == "win32":
-                            os.environ["CVSROOT"] = self.rootpath
-                        else:
-                            os.environb[b"CVSROOT"] = self.rootpath.encode(path_encoding)
                     elif roottype == "svn":
                         self.rootpath = vclib.svn.canonicalize_rootpath(rootpath)
                         self.repos = vclib.svn.SubversionRepository(
@@ -290,6 +289,9 @@ class Request:
                             cfg.options.svn_config_dir,
                             content_encoding,
                             path_encoding,
+                            vclib.svn.get_revision_info_cache(
+                                self.rootname, cfg.options.svn_revinfo_cache_size
+                            ),
                         )
                     else:
                         raise vclib.ReposNotFound()
@@ -742,6 +744,9 @@ _re_validate_revnum = re.compile("^[-_.a-zA-Z0-9:~\\[\\]/]*$")
 # date time values
 _re_validate_datetime = re.compile(r"^(\d\d\d\d-\d\d-\d\d(\s+\d\d:\d\d" r"(:\d\d)?)?)?$")
 
+# query result page keys (unpadded URL-safe base64)
+_re_validate_pagekey = re.compile("^[-_a-zA-Z0-9]*$")
+
 # The legal query parameters and their validator functions/regexes.
 #
 # Parameters with a 'None' validator will be dropped from the query_dict,
@@ -790,6 +795,7 @@ _legal_params = {
     "hours": _re_validate_number,
     "maxdate": _re_validate_datetime,
     "mindate": _re_validate_datetime,
+    "page": _re_validate_pagekey,
     "querysort": _re_validate_alpha,
     "who_match": _re_validate_alpha,
     "who": _validate_any,
@@ -929,6 +935,34 @@ def setup_authorizer(cfg, username, rootname=None):
     return my_auth.ViewVCAuthorizer(_root_lookup_func, username, params)
 
 
+def get_revision_cache(cfg):
+    """Return the vclib.ccvs.revcache.RevisionCache which CFG calls for, or
+    None if it doesn't call for one."""
+
+    if not (cfg.options.use_rcsparse and cfg.options.cvs_snapshot_cache_dir):
+        return None
+    from vclib.ccvs import revcache
+
+    return revcache.RevisionCache(
+        cfg.options.cvs_snapshot_cache_dir,
+        cfg.options.cvs_snapshot_cache_kbytes * 1024,
+        cfg.options.cvs_snapshot_interval,
+    )
+
+
+def get_dir_index(cfg):
+    """Return the vclib.ccvs.dirindex.DirectoryIndex which CFG calls for,
+    or None if it doesn't call for one."""
+
+    if not cfg.options.cvs_dir_index_dir:
+        return None
+    from vclib.ccvs import dirindex
+
+    return dirindex.DirectoryIndex(
+        cfg.options.cvs_dir_index_dir, cfg.options.cvs_dir_index_kbytes * 1024
+    )
+
+
 def check_freshness(request, mtime=None, etag=None, weak=0):
     cfg = request.cfg
 
@@ -976,6 +1010,92 @@ def check_freshness(request, mtime=None, etag=None, weak=0):
     return isfresh
 
 
+class _TemplateSources:
+    """Records the paths and modification times of the template files
+    read while an EZT template is being compiled."""
+
+    def __init__(self):
+        self.files = []
+        self.recording = True
+
+    def record(self, fname):
+        if self.recording:
+            self.files.append((fname, os.stat(fname).st_mtime))
+
+
+class _TemplateFileReader(ezt.Reader):
+    """An ezt.Reader which reads templates from the filesystem, noting
+    each file it reads in a _TemplateSources instance."""
+
+    def __init__(self, fname, sources):
+        # Stat the file before reading it, so a modification made while
+        # we're reading is caught by the next freshness check.
+        sources.record(fname)
+        self.text = open(fname, "r").read()
+        self.fname = fname
+        self._sources = sources
+
+    def read_other(self, relative):
+        return _TemplateFileReader(
+            os.path.join(os.path.dirname(self.fname), relative), self._sources
+        )
+
+    def filename(self):
+        return self.fname
+
+
+# Process-wide cache of compiled templates, keyed on (absolute template
+# path, language, base format).  Values are (template, sources) tuples,
+# where SOURCES is a tuple of (path, mtime) pairs covering the template
+# file and every file it [include]s by name.  This only pays off when the
+# interpreter outlives a single request (WSGI, standalone.py, etc.).
+_template_cache = {}
+_template_cache_lock = threading.Lock()
+_template_cache_stats = {"hits": 0, "misses": 0}
+
+
+def _template_sources_fresh(sources):
+    try:
+        for fname, mtime in sources:
+            if os.stat(fname).st_mtime != mtime:
+                return False
+    except OSError:
+        return False
+    return True
+
+
+def get_template_cache_stats():
+    """Return a dictionary with the number of template cache "hits" and
+    "misses" seen by this process."""
+    with _template_cache_lock:
+        return dict(_template_cache_stats)
+
+
+def get_cached_template(fname, language="en", base_format=ezt.FORMAT_RAW):
+    """Return a compiled ezt.Template for the template file FNAME,
+    reusing a previously compiled one if neither FNAME nor any of the
+    files it includes have changed since it was compiled."""
+    fname = os.path.abspath(fname)
+    key = (fname, language, base_format)
+    with _template_cache_lock:
+        cached = _template_cache.get(key)
+    if cached is not None and _template_sources_fresh(cached[1]):
+        with _template_cache_lock:
+            _template_cache_stats["hits"] += 1
+        return cached[0]
+
+    sources = _TemplateSources()
+    template = ezt.Template()
+    template.parse(_TemplateFileReader(fname, sources), base_format)
+    # Includes resolved at generation time (via [include VARIABLE]) are
+    # read fresh every time, so stop recording once compilation is done.
+    sources.recording = False
+    with _template_cache_lock:
+        _template_cache[key] = (template, tuple(sources.files))
+        _template_cache_stats["misses"] += 1
+    return template
+
+
 def get_view_template(cfg, view_name, language="en"):
     # See if the configuration specifies a template for this view.  If
     # not, use the default template path for this view.
@@ -988,8 +1108,9 @@ def get_view_template(cfg, view_name, language="en"):
     # Allow per-language template selection.
     tname = tname.replace("%lang%", language)
 
-    # Finally, construct the whole template path and return the Template.
-    return ezt.Template(cfg.path(tname))
+    # Finally, construct the whole template path and return the
+    # (possibly cached) compiled Template.
+    return get_cached_template(cfg.path(tname), language)
 
 
 def get_writeready_server_file(
@@ -1262,6 +1383,44 @@ _re_rewrite_email = re.compile(r"([-a-zA-Z0-9_.\+]+)@" r"(([-a-zA-Z0-9]+\.)+[A-Z
 # Matches revision references
 _re_rewrite_svnrevref = re.compile(r"\b(r|rev #?|revision #?)([0-9]+)\b")
 
+# Matches the regular expression constructs which can make a regular
+# expression match some line of a log message (or the rest of one) where
+# it doesn't match the message as a whole: anchors, and assertions about
+# what doesn't surround the match.  See ViewVCHtmlFormatter.tokenize_text().
+_re_line_sensitive = re.compile(r"[$^]|\\[ABZz]|\(\?<?!")
+
+# Matches word boundary assertions, which can make a regular expression
+# match the rest of a line where it doesn't match the message as a whole,
+# but only at the start of the rest of the line, and only if that follows
+# a word character.
+_re_word_boundary = re.compile(r"\\b")
+_re_word_char = re.compile(r"\w")
+
+# Process-wide cache of parsed custom_log_formatting rules, keyed on the
+# tuple of configured rules.  Values are lists of (regexp, format) pairs.
+_custom_log_rules = {}
+_custom_log_rules_lock = threading.Lock()
+
+
+def _get_custom_log_rules(rules):
+    """Return a list of (regexp, format) pairs, with each regexp compiled,
+    for the custom_log_formatting configuration option value RULES."""
+
+    key = tuple(rules)
+    with _custom_log_rules_lock:
+        if key in _custom_log_rules:
+            return _custom_log_rules[key]
+    parsed = []
+    for rule in rules:
+        rule = rule.replace("\\:", "\x01")
+        regexp, format = [x.strip() for x in rule.split(":", 1)]
+        regexp = regexp.replace("\x01", ":")
+        format = format.replace("\x01", ":")
+        parsed.append((re.compile(regexp), format))
+    with _custom_log_rules_lock:
+        _custom_log_rules[key] = parsed
+    return parsed
+
 
 class ViewVCHtmlFormatterTokens:
     def __init__(self, tokens):
@@ -1408,7 +1567,13 @@ class ViewVCHtmlFormatter:
         """
         if isinstance(regexp, str):
             regexp = re.compile(regexp)
-        self._formatters.append([regexp, conv, userdata])
+        if not isinstance(regexp.pattern, str) or _re_line_sensitive.search(regexp.pattern):
+            context = 2
+        elif _re_word_boundary.search(regexp.pattern):
+            context = 1
+        else:
+            context = 0
+        self._formatters.append([regexp, conv, userdata, context])
 
     def get_result(self, s, maxlen=0):
         """Format S per the set of formatters registered with this object,
@@ -1425,16 +1590,59 @@ class ViewVCHtmlFormatter:
         get_result() function to retrieve HTML-formatted text.
         """
         tokens = []
+        s = s.replace("\r\n", "\n")
+
+        # Searching each line with every formatter after each match adds
+        # up, with many formatters or lines, so each formatter's next match
+        # in the message as a whole is found first (once per match, not
+        # per line): no line which ends before that can have a match for
+        # that formatter.  This holds for the formatters whose regular
+        # expressions can't match (the rest of) a line without matching
+        # the same text in the message; word boundaries only break that at
+        # the start of the rest of a line, so are tried there separately.
+        # See add_formatter().
+        text = s + "\n"
+        next_starts = [-1] * len(self._formatters)
+        skip_lines = self._formatters and max(test[3] for test in self._formatters) < 2
+        line_start = 0
+
         # We could just have a "while s:" here instead of "for line: while
         # line:", but for really large log messages with heavy
         # tokenization, the cost in both performance and memory
         # consumption of the approach taken was atrocious.
-        for line in s.replace("\r\n", "\n").split("\n"):
+        for line in s.split("\n"):
             line = line + "\n"
+            line_end = line_start + len(line)
+
+            # If no formatter can match this line, it's all text.
+            if skip_lines:
+                if min(next_starts) < line_start:
+                    for i, test in enumerate(self._formatters):
+                        if next_starts[i] < line_start:
+                            match = test[0].search(text, line_start)
+                            next_starts[i] = match.start() if match else len(text)
+                if min(next_starts) >= line_end:
+                    tokens.append(_item(match=line, converter=self.format_text, userdata=None))
+                    line_start = line_end
+                    continue
+
+            offset = line_start
+            after_word = False
             while line:
                 best_match = best_conv = best_userdata = None
-                for test in self._formatters:
-                    match = test[0].search(line)
+                for i, test in enumerate(self._formatters):
+                    if test[3] < 2:
+                        if next_starts[i] < offset:
+                            match = test[0].search(text, offset)
+                            next_starts[i] = match.start() if match else len(text)
+                        if next_starts[i] >= line_end:
+                            if test[3] == 0 or not after_word:
+                                continue
+                            match = test[0].match(line)
+                        else:
+                            match = test[0].search(line)
+                    else:
+                        match = test[0].search(line)
                     # If we find and match and (a) its our first one, or (b) it
                     # matches text earlier than our previous best match, or (c) it
                     # matches text at the same location as our previous best match
@@ -1467,10 +1675,13 @@ class ViewVCHtmlFormatter:
                         _item(match=best_match, converter=best_conv, userdata=best_userdata)
                     )
                     line = line[end:]
+                    offset = offset + end
+                    after_word = end > 0 and _re_word_char.match(text, offset - 1) is not None
                 else:
                     # Otherwise, just add the rest of the string.
                     tokens.append(_item(match=line, converter=self.format_text, userdata=None))
                     line = ""
+            line_start = line_end
         return ViewVCHtmlFormatterTokens(tokens)
 
     def _entity_encode(self, s):
@@ -1520,12 +1731,8 @@ class LogFormatter:
                     lf.add_formatter(_re_rewrite_email, lf.format_email)
 
                 # Add custom rewrite handling per configuration.
-                for rule in cfg.options.custom_log_formatting:
-                    rule = rule.replace("\\:", "\x01")
-                    regexp, format = [x.strip() for x in rule.split(":", 1)]
-                    regexp = regexp.replace("\x01", ":")
-                    format = format.replace("\x01", ":")
-                    lf.add_formatter(re.compile(regexp), lf.format_custom_url, format)
+                for regexp, format in _get_custom_log_rules(cfg.options.custom_log_formatting):
+                    lf.add_formatter(regexp, lf.format_custom_url, format)
 
                 # Tokenize the log message.
                 self.tokens = lf.tokenize_text(self.log)
@@ -1854,6 +2061,49 @@ class CustomPygmentsSink:
         self.colorized_file_lines.append(markup_escaped_urls(buf.rstrip("\n\r")))
 
 
+# The Pygments functions and classes used by markup_file_contents(), or
+# None if Pygments isn't available.  Pygments loads its formatters and
+# lexers on first use, and threads doing so at once can fail to find
+# them, so they're loaded once (under a lock) and shared.
+_pygments = None
+_pygments_loaded = False
+_pygments_lock = threading.Lock()
+
+
+def _get_pygments():
+    """Return a (highlight, HtmlFormatter, ClassNotFound,
+    get_lexer_for_mimetype, get_lexer_for_filename, guess_lexer) tuple of
+    the Pygments objects we use, or None if Pygments isn't available."""
+
+    global _pygments, _pygments_loaded
+    if _pygments_loaded:
+        return _pygments
+    with _pygments_lock:
+        if not _pygments_loaded:
+            try:
+                from pygments import highlight
+                from pygments.formatters import HtmlFormatter
+                from pygments.lexers import (
+                    ClassNotFound,
+                    get_lexer_for_mimetype,
+                    get_lexer_for_filename,
+                    guess_lexer,
+                )
+
+                _pygments = (
+                    highlight,
+                    HtmlFormatter,
+                    ClassNotFound,
+                    get_lexer_for_mimetype,
+                    get_lexer_for_filename,
+                    guess_lexer,
+                )
+            except ImportError:
+                _pygments = None
+            _pygments_loaded = True
+    return _pygments
+
+
 def markup_file_contents(request, cfg, file_lines, filename, mime_type, encoding, colorize):
     """Perform syntax coloration via Pygments (where allowed and
     possible; a lesser bit of HTML-ification otherwise) on FILE_LINES,
@@ -1870,15 +2120,16 @@ def markup_file_contents(request, cfg, file_lines, filename, mime_type, encoding
     # configuration, b) not being able to import the Pygments modules,
     # and c) Pygments not having a lexer for our file's format.
     pygments_lexer = None
-    if colorize:
-        from pygments import highlight
-        from pygments.formatters import HtmlFormatter
-        from pygments.lexers import (
+    pygments = colorize and _get_pygments()
+    if pygments:
+        (
+            highlight,
+            HtmlFormatter,
             ClassNotFound,
             get_lexer_for_mimetype,
             get_lexer_for_filename,
             guess_lexer,
-        )
+        ) = pygments
 
         # First, see if there's a Pygments lexer associated with MIME_TYPE.
         if mime_type:
@@ -2473,7 +2724,9 @@ def view_directory(request):
     # performance by "cheating" -- first, we sort (we already have the
     # names), then we just fetch dirlogs for the needed entries.
     # however, when sorting by other properties or not paging, we've no
-    # choice but to fetch dirlogs for everything.
+    # choice but to fetch dirlogs for everything.  (for CVS, the directory
+    # index set up by get_dir_index() makes that cheap for files which
+    # haven't changed since it was last done.)
     if cfg.options.dir_pagesize and sortby == "file":
         dirlogs_first = int(request.query_dict.get("dir_pagestart", 0))
         if dirlogs_first > len(file_data):
@@ -4308,11 +4561,17 @@ def generate_tarball_header(
     out.write(block)
 
 
-def generate_tarball(out, request, reldir, stack, dir_mtime=None):
+def tarball_items(request, repos, reldir, stack, dir_mtime=None):
+    """Generate, in tarball order, the items of the tarball of REQUEST's
+    directory found (using the repository object REPOS) under its
+    subdirectory RELDIR: ("dir", TAR_NAME, MTIME) for directories, and
+    ("file", PATH_PARTS, TAR_NAME, MTIME) for files.  STACK holds the
+    names of the CVS directories not yet placed in the tarball."""
+
     # get directory info from repository
     rep_path = request.path_parts + reldir
-    entries = request.repos.listdir(rep_path, request.pathrev, {})
-    request.repos.dirlogs(rep_path, request.pathrev, entries, {})
+    entries = repos.listdir(rep_path, request.pathrev, {})
+    repos.dirlogs(rep_path, request.pathrev, entries, {})
     entries.sort(key=attrgetter("name"))
 
     # figure out corresponding path in tar file. everything gets put underneath
@@ -4348,7 +4607,7 @@ def generate_tarball(out, request, reldir, stack, dir_mtime=None):
     # regardless of its contents.  For CVS it will only get into the
     # tarball if it has files underneath it, which we determine later.
     if not cvs:
-        generate_tarball_header(out, tar_dir, mtime=dir_mtime)
+        yield "dir", tar_dir, dir_mtime
 
     # Run through the files in this directory, skipping busted and
     # unauthorized ones.
@@ -4363,68 +4622,10 @@ def generate_tarball(out, request, reldir, stack, dir_mtime=None):
         # directory parents to contain it, so we flush the stack.
         if cvs:
             for dir in stack:
-                generate_tarball_header(out, dir, mtime=dir_mtime)
+                yield "dir", dir, dir_mtime
             del stack[:]
 
-        # Calculate the mode for the file.  Sure, we could look directly
-        # at the ,v file in CVS, but that's a layering violation we'd like
-        # to avoid as much as possible.
-        if request.repos.isexecutable(rep_path + [file.name], request.pathrev):
-            mode = 0o0755
-        else:
-            mode = 0o0644
-
-        # Is this thing a symlink?
-        #
-        # FIXME: A better solution would be to have vclib returning
-        # symlinks with a new vclib.SYMLINK path type.
-        symlink_target = None
-        if hasattr(request.repos, "get_symlink_target"):
-            symlink_target = request.repos.get_symlink_target(
-                rep_path + [file.name], request.pathrev
-            )
-
-        # If the object is a symlink, generate the appropriate header.
-        # Otherwise, we're dealing with a regular file.
-        if symlink_target:
-            generate_tarball_header(
-                out,
-                tar_dir + file.name,
-                0,
-                mode,
-                file.date is not None and file.date or 0,
-                typeflag=b"2",
-                linkname=symlink_target.encode("utf-8"),
-            )
-        else:
-            filesize = request.repos.filesize(rep_path + [file.name], request.pathrev)
-            if filesize == -1:
-                # Bummer.  We have to calculate the filesize manually.
-                fp = request.repos.openfile(rep_path + [file.name], request.pathrev, {})[0]
-                filesize = 0
-                while 1:
-                    chunk = retry_read(fp)
-                    if not chunk:
-                        break
-                    filesize = filesize + len(chunk)
-                fp.close()
-
-            # Write the tarball header...
-            generate_tarball_header(
-                out, tar_dir + file.name, filesize, mode, file.date is not None and file.date or 0
-            )
-
-            # ...the file's contents ...
-            fp = request.repos.openfile(rep_path + [file.name], request.pathrev, {})[0]
-            while 1:
-                chunk = retry_read(fp)
-                if not chunk:
-                    break
-                out.write(chunk)
-            fp.close()
-
-            # ... and then add the block padding.
-            out.write(b"\0" * (511 - (filesize + 511) % 512))
+        yield "file", rep_path + [file.name], tar_dir + file.name, file.date or 0
 
     # Recurse into subdirectories, skipping busted and unauthorized (or
     # configured-to-be-hidden) ones.
@@ -4437,12 +4638,212 @@ def generate_tarball(out, request, reldir, stack, dir_mtime=None):
             continue
 
         mtime = request.roottype == "svn" and file.date or None
-        generate_tarball(out, request, reldir + [file.name], stack, mtime)
+        yield from tarball_items(request, repos, reldir + [file.name], stack, mtime)
 
     # Pop the current directory from the stack.
     del stack[-1:]
 
 
+def fetch_tarball_file(repos, path_parts, rev, max_inline):
+    """Return a (MODE, SYMLINK_TARGET, FILESIZE, DATA) tuple describing the
+    file at PATH_PARTS in revision REV of the repository object REPOS.
+    DATA is the file's contents if FILESIZE is at most MAX_INLINE bytes,
+    or else None."""
+
+    # Calculate the mode for the file.  Sure, we could look directly
+    # at the ,v file in CVS, but that's a layering violation we'd like
+    # to avoid as much as possible.
+    if repos.isexecutable(path_parts, rev):
+        mode = 0o0755
+    else:
+        mode = 0o0644
+
+    # Is this thing a symlink?
+    #
+    # FIXME: A better solution would be to have vclib returning
+    # symlinks with a new vclib.SYMLINK path type.
+    if hasattr(repos, "get_symlink_target"):
+        symlink_target = repos.get_symlink_target(path_parts, rev)
+        if symlink_target:
+            return mode, symlink_target, 0, None
+
+    filesize = repos.filesize(path_parts, rev)
+    if filesize != -1 and filesize > max_inline:
+        return mode, None, filesize, None
+
+    # Read the file, calculating its size manually if we have to.
+    fp = repos.openfile(path_parts, rev, {})[0]
+    chunks = []
+    size = 0
+    while 1:
+        chunk = retry_read(fp)
+        if not chunk:
+            break
+        size = size + len(chunk)
+        if size <= max_inline:
+            chunks.append(chunk)
+    fp.close()
+    if size > max_inline:
+        return mode, None, size, None
+    return mode, None, size, b"".join(chunks)
+
+
+def write_tarball_file(out, repos, path_parts, rev, tar_name, mtime, info):
+    """Write the tarball entry for the file at PATH_PARTS in revision REV
+    of the repository object REPOS to OUT, given the tuple INFO returned
+    for it by fetch_tarball_file()."""
+
+    mode, symlink_target, filesize, data = info
+
+    # If the object is a symlink, generate the appropriate header.
+    # Otherwise, we're dealing with a regular file.
+    if symlink_target:
+        generate_tarball_header(
+            out, tar_name, 0, mode, mtime, typeflag=b"2", linkname=symlink_target.encode("utf-8")
+        )
+        return
+
+    # Write the tarball header...
+    generate_tarball_header(out, tar_name, filesize, mode, mtime)
+
+    # ...the file's contents ...
+    if data is not None:
+        out.write(data)
+    else:
+        fp = repos.openfile(path_parts, rev, {})[0]
+        while 1:
+            chunk = retry_read(fp)
+            if not chunk:
+                break
+            out.write(chunk)
+        fp.close()
+
+    # ... and then add the block padding.
+    out.write(b"\0" * (511 - (filesize + 511) % 512))
+
+
+def clone_repository(repos):
+    """Return a newly opened copy of the repository object REPOS, for use
+    by another thread.  (Repository objects hold connections, handles and
+    caches which aren't safe to share between threads.)  The copy sees
+    the same youngest revision as REPOS, even if commits have landed
+    since REPOS was opened, so that HEAD means the same to both."""
+
+    youngest = getattr(repos, "youngest", None)
+    repos = copy.copy(repos)
+    repos.open()
+    if youngest is not None:
+        repos.youngest = youngest
+    return repos
+
+
+_END = object()
+
+
+def pipelined_tarball_items(request, workers, max_buffered):
+    """Generate the items of tarball_items() for REQUEST's directory, with
+    ("file", ...) items followed by the tuple fetch_tarball_file() returns
+    for them.
+
+    A thread walks the directory tree ahead of the caller, while WORKERS
+    threads fetch the files it finds.  The items are generated in the
+    same order as tarball_items() generates them; at most about
+    MAX_BUFFERED bytes of file contents are fetched ahead (bigger files
+    are left for the caller to stream)."""
+
+    import queue
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    window = workers * 4
+    max_inline = max_buffered // window
+    items = queue.Queue(window * 4)
+    stop = threading.Event()
+    local = threading.local()
+
+    def _walk(repos):
+        try:
+            for item in tarball_items(request, repos, [], []):
+                if stop.is_set():
+                    return
+                items.put(item)
+        except BaseException as e:
+            items.put(e)
+        items.put(_END)
+
+    def _fetch(path_parts):
+        repos = getattr(local, "repos", None)
+        if repos is None:
+            repos = local.repos = clone_repository(request.repos)
+        return fetch_tarball_file(repos, path_parts, request.pathrev, max_inline)
+
+    walker = threading.Thread(target=_walk, args=(clone_repository(request.repos),))
+    walker.daemon = True
+    executor = ThreadPoolExecutor(workers)
+    pending = deque()
+    walker.start()
+    try:
+        done = False
+        while not done or pending:
+            # Keep the window full of items in flight...
+            while not done and len(pending) < window:
+                item = items.get()
+                if item is _END:
+                    done = True
+                elif isinstance(item, BaseException):
+                    raise item
+                elif item[0] == "file":
+                    pending.append((item, executor.submit(_fetch, item[1])))
+                else:
+                    pending.append((item, None))
+
+            # ...and hand back the oldest one.
+            if pending:
+                item, future = pending.popleft()
+                if future is None:
+                    yield item
+                else:
+                    yield item + (future.result(),)
+    finally:
+        stop.set()
+        for item, future in pending:
+            if future is not None:
+                future.cancel()
+        executor.shutdown(wait=True)
+        while walker.is_alive():
+            try:
+                items.get_nowait()
+            except queue.Empty:
+                walker.join(0.1)
+
+
+def generate_tarball(out, request):
+    """Write the contents of the tarball of REQUEST's directory to OUT."""
+
+    cfg = request.cfg
+    workers = cfg.options.tarball_workers
+    if workers > 0:
+        items = pipelined_tarball_items(request, workers, cfg.options.tarball_buffer_kbytes * 1024)
+    else:
+        items = tarball_items(request, request.repos, [], [])
+    try:
+        for item in items:
+            if item[0] == "dir":
+                generate_tarball_header(out, item[1], mtime=item[2])
+                continue
+            if workers > 0:
+                kind, path_parts, tar_name, mtime, info = item
+            else:
+                kind, path_parts, tar_name, mtime = item
+                info = fetch_tarball_file(request.repos, path_parts, request.pathrev, 0)
+            write_tarball_file(
+                out, request.repos, path_parts, request.pathrev, tar_name, mtime, info
+            )
+    finally:
+        items.close()
+    out.write(b"\0" * 1024)
+
+
 def download_tarball(request):
     cfg = request.cfg
 
@@ -4471,9 +4872,7 @@ def download_tarball(request):
 
     # FIXME: For Subversion repositories, we can get the real mtime of
     # the top-level directory here.
-    generate_tarball(fp, request, [], [])
-
-    fp.write(b"\0" * 1024)
+    generate_tarball(fp, request)
     fp.close()
 
     if DEBUG_TARFILE_PATH:
@@ -4693,7 +5092,10 @@ def is_querydb_nonempty_for_root(request):
             import cvsdb
 
             db = cvsdb.ConnectDatabaseReadOnly(request.cfg)
-            repos_root, repos_dir = cvsdb.FindRepository(db, request.rootpath)
+            try:
+                repos_root, repos_dir = cvsdb.FindRepository(db, request.rootpath)
+            finally:
+                db.Close()
             if repos_root:
                 return 1
         else:
@@ -5099,6 +5501,7 @@ def view_query(request):
     mindate = request.query_dict.get("mindate", "")
     maxdate = request.query_dict.get("maxdate", "")
     format = request.query_dict.get("format")
+    page = request.query_dict.get("page", "")
     limit_changes = int(request.query_dict.get("limit_changes", cfg.options.limit_changes))
 
     match_types = {
@@ -5112,6 +5515,7 @@ def view_query(request):
         "date": 1,
         "author": 1,
         "file": 1,
+        "relevance": 1,
     }
     date_types = {
         "hours": 1,
@@ -5141,97 +5545,124 @@ def view_query(request):
     global cvsdb
     import cvsdb
 
-    db = cvsdb.ConnectDatabaseReadOnly(cfg)
-    repos_root, repos_dir = cvsdb.FindRepository(db, request.rootpath)
-    if not repos_root:
-        raise ViewVCException(
-            f"The root '{request.rootname}' was not found in the commit database "
-        )
-
-    # create the database query from the form data
-    query = cvsdb.CreateCheckinQuery()
-    query.SetRepository(repos_root)
-    # treat "HEAD" specially ...
-    if branch_match == "exact" and branch == "HEAD":
-        query.SetBranch("")
-    elif branch:
-        query.SetBranch(branch, branch_match)
-    if dir:
-        for subdir in dir.split(","):
-            path = _path_join(repos_dir + request.path_parts + _path_parts(subdir.strip()))
-            query.SetDirectory(path, "exact")
-            query.SetDirectory(f"{cvsdb.EscapeLike(path)}/%", "like")
-    else:
-        where = _path_join(repos_dir + request.path_parts)
-        if where:  # if we are in a subdirectory ...
-            query.SetDirectory(where, "exact")
-        query.SetDirectory(f"{cvsdb.EscapeLike(where)}/%", "like")
-    if file:
-        query.SetFile(file, file_match)
-    if who:
-        query.SetAuthor(who, who_match)
-    if comment:
-        query.SetComment(comment, comment_match)
-    query.SetSortMethod(querysort)
-    if date == "hours":
-        query.SetFromDateHoursAgo(int(hours))
-    elif date == "day":
-        query.SetFromDateDaysAgo(1)
-    elif date == "week":
-        query.SetFromDateDaysAgo(7)
-    elif date == "month":
-        query.SetFromDateDaysAgo(31)
-    elif date == "all":
-        pass
-    elif date == "explicit":
-        if mindate is not None:
-            query.SetFromDateObject(mindate)
-        if maxdate is not None:
-            query.SetToDateObject(maxdate)
-
-    # Set the admin-defined (via configuration) row limits.  This is to avoid
-    # slamming the database server with a monster query.
-    if format == "rss":
-        query.SetLimit(cfg.cvsdb.rss_row_limit)
-    else:
-        query.SetLimit(cfg.cvsdb.row_limit)
-
-    # run the query
-    db.RunQuery(query)
-    commit_list = query.GetCommitList()
-    row_limit_reached = query.GetLimitReached()
+    page_after = None
+    if page:
+        try:
+            page_after = cvsdb.DecodePageKey(page, querysort)
+        except ValueError:
+            raise ViewVCException(
+                'An illegal value was provided for the "page" parameter.', "400 Bad Request"
+            )
 
-    # gather commits
-    commits = []
-    plus_count = 0
-    minus_count = 0
-    mod_time = -1
-    if commit_list:
-        files = []
-        current_desc = commit_list[0].GetDescriptionID()
-        current_rev = commit_list[0].GetRevision()
-        dir_strip = _path_join(repos_dir)
-
-        for commit in commit_list:
-            commit_desc = commit.GetDescriptionID()
-            commit_rev = commit.GetRevision()
-
-            # base modification time on the newest commit
-            if commit.GetTime() > mod_time:
-                mod_time = commit.GetTime()
-
-            # For CVS, group commits with the same commit message.
-            # For Subversion, group them only if they have the same revision number
-            if request.roottype == "cvs":
-                if current_desc == commit_desc:
-                    files.append(commit)
-                    continue
-            else:
-                if current_rev == commit_rev:
-                    files.append(commit)
-                    continue
+    db = cvsdb.ConnectDatabaseReadOnly(cfg)
+    try:
+        repos_root, repos_dir = cvsdb.FindRepository(db, request.rootpath)
+        if not repos_root:
+            raise ViewVCException(
+                f"The root '{request.rootname}' was not found in the commit database "
+            )
 
-            # append this grouping
+        # create the database query from the form data
+        query = cvsdb.CreateCheckinQuery()
+        query.SetRepository(repos_root)
+        # treat "HEAD" specially ...
+        if branch_match == "exact" and branch == "HEAD":
+            query.SetBranch("")
+        elif branch:
+            query.SetBranch(branch, branch_match)
+        if dir:
+            for subdir in dir.split(","):
+                path = _path_join(repos_dir + request.path_parts + _path_parts(subdir.strip()))
+                query.SetDirectory(path, "exact")
+                query.SetDirectory(f"{cvsdb.EscapeLike(path)}/%", "like")
+        else:
+            where = _path_join(repos_dir + request.path_parts)
+            if where:  # if we are in a subdirectory ...
+                query.SetDirectory(where, "exact")
+            query.SetDirectory(f"{cvsdb.EscapeLike(where)}/%", "like")
+        if file:
+            query.SetFile(file, file_match)
+        if who:
+            query.SetAuthor(who, who_match)
+        if comment:
+            query.SetComment(comment, comment_match)
+        query.SetSortMethod(querysort)
+        if date == "hours":
+            query.SetFromDateHoursAgo(int(hours))
+        elif date == "day":
+            query.SetFromDateDaysAgo(1)
+        elif date == "week":
+            query.SetFromDateDaysAgo(7)
+        elif date == "month":
+            query.SetFromDateDaysAgo(31)
+        elif date == "all":
+            pass
+        elif date == "explicit":
+            if mindate is not None:
+                query.SetFromDateObject(mindate)
+            if maxdate is not None:
+                query.SetToDateObject(maxdate)
+
+        # Set the admin-defined (via configuration) row limits.  This is to avoid
+        # slamming the database server with a monster query.  Results beyond
+        # the limit are shown a page at a time, each page starting after the
+        # last row of the one before.
+        if format == "rss":
+            query.SetLimit(cfg.cvsdb.rss_row_limit)
+        else:
+            query.SetLimit(cfg.cvsdb.row_limit)
+        if page_after:
+            query.SetPageAfter(page_after)
+
+        # run the query
+        db.RunQuery(query)
+        commit_list = query.GetCommitList()
+        row_limit_reached = query.GetLimitReached()
+        next_page_key = query.GetNextPageKey()
+
+        # gather commits
+        commits = []
+        plus_count = 0
+        minus_count = 0
+        mod_time = -1
+        if commit_list:
+            files = []
+            current_desc = commit_list[0].GetDescriptionID()
+            current_rev = commit_list[0].GetRevision()
+            dir_strip = _path_join(repos_dir)
+
+            for commit in commit_list:
+                commit_desc = commit.GetDescriptionID()
+                commit_rev = commit.GetRevision()
+
+                # base modification time on the newest commit
+                if commit.GetTime() > mod_time:
+                    mod_time = commit.GetTime()
+
+                # For CVS, group commits with the same commit message.
+                # For Subversion, group them only if they have the same revision number
+                if request.roottype == "cvs":
+                    if current_desc == commit_desc:
+                        files.append(commit)
+                        continue
+                else:
+                    if current_rev == commit_rev:
+                        files.append(commit)
+                        continue
+
+                # append this grouping
+                commit_item = build_commit(request, files, limit_changes, dir_strip, format)
+                if commit_item:
+                    # update running plus/minus totals
+                    plus_count = plus_count + commit_item.plus
+                    minus_count = minus_count + commit_item.minus
+                    commits.append(commit_item)
+
+                files = [commit]
+                current_desc = commit_desc
+                current_rev = commit_rev
+
+            # we need to tack on our last commit grouping, if any
             commit_item = build_commit(request, files, limit_changes, dir_strip, format)
             if commit_item:
                 # update running plus/minus totals
@@ -5239,17 +5670,9 @@ def view_query(request):
                 minus_count = minus_count + commit_item.minus
                 commits.append(commit_item)
 
-            files = [commit]
-            current_desc = commit_desc
-            current_rev = commit_rev
-
-        # we need to tack on our last commit grouping, if any
-        commit_item = build_commit(request, files, limit_changes, dir_strip, format)
-        if commit_item:
-            # update running plus/minus totals
-            plus_count = plus_count + commit_item.plus
-            minus_count = minus_count + commit_item.minus
-            commits.append(commit_item)
+        sql = db.CreateSQLQueryString(query)
+    finally:
+        db.Close()
 
     # only show the branch column if we are querying all branches
     # or doing a non-exact branch match on a CVS repository.
@@ -5267,6 +5690,16 @@ def view_query(request):
     params["limit_changes"] = 0
     limit_changes_href = request.get_url(params=params, escape=1)
 
+    # links to the first and next pages of results
+    params = request.query_dict.copy()
+    params["page"] = None
+    first_page_href = page and request.get_url(params=params, escape=1) or None
+    queryform_href = request.get_url(view_func=view_queryform, params=params, escape=1)
+    next_page_href = None
+    if next_page_key:
+        params["page"] = cvsdb.EncodePageKey(next_page_key)
+        next_page_href = request.get_url(params=params, escape=1, prefix=format == "rss")
+
     # if we got any results, use the newest commit as the modification time
     if mod_time >= 0:
         if check_freshness(request, mod_time):
@@ -5280,10 +5713,12 @@ def view_query(request):
     data.merge(
         TemplateData(
             {
-                "sql": request.server.escape(db.CreateSQLQueryString(query)),
+                "sql": request.server.escape(sql),
                 "english_query": english_query(request),
-                "queryform_href": request.get_url(view_func=view_queryform, escape=1),
+                "queryform_href": queryform_href,
                 "backout_href": backout_href,
+                "first_page_href": first_page_href,
+                "next_page_href": next_page_href,
                 "plus_count": plus_count,
                 "minus_count": minus_count,
                 "show_branch": show_branch,
@@ -5427,11 +5862,16 @@ def _parse_root_parent(pp):
 def expand_root_parents(cfg):
     """Expand the configured root parents into individual roots."""
 
+    # Configurations cached by load_config() come pre-expanded.
+    if cfg.root_parents_expanded:
+        return
+
     path_encoding, _ = get_repos_encodings(cfg, None)
 
     # Each item in root_parents is a "directory [= context ]: repo_type" string.
     for pp in cfg.general.root_parents:
         path, context, repo_type = _parse_root_parent(pp)
+        cfg.add_source(path)
 
         if repo_type == "cvs":
             roots = vclib.ccvs.expand_root_parent(path, path_encoding)
@@ -5463,6 +5903,7 @@ def expand_root_parents(cfg):
                 f'The path "{pp}" in "root_parents" has an unrecognized repository type '
                 f'("{repo_type}").  Expected "cvs" or "svn".'
             )
+    cfg.root_parents_expanded = 1
 
 
 def find_root_in_parents(cfg, path_parts, roottype):
@@ -5546,13 +5987,25 @@ def locate_root(cfg, rootname):
     return roottype, rootpath
 
 
-def load_config(pathname=None, server=None):
+# Process-wide cache of base configurations, keyed on (configuration
+# path, virtual host).  See load_config().
+_config_cache = {}
+_config_cache_lock = threading.Lock()
+
+
+def load_config(pathname=None, server=None, cache=False):
     """Load the ViewVC configuration file.  SERVER is the server object
     that will be using this configuration.  Consult the environment for
     the variable VIEWVC_CONF_PATHNAME and VIEWCVS_CONF_PATHNAME (its
     legacy name) and, if set, use its value as the path of the
     configuration file; otherwise, use PATHNAME (if provided).  Failing
-    all else, use a hardcoded default configuration path."""
+    all else, use a hardcoded default configuration path.
+
+    If CACHE is set, the configuration is loaded (with its root parents
+    expanded) only once per process for each configuration path and
+    virtual host, and reloaded only when one of the files or directories
+    it was built from changes.  The caller gets a cheap per-request copy
+    of the cached configuration, which it is free to modify."""
 
     # See if the environment contains overrides to the configuration
     # path.  If we have a SERVER object, consult its environment; use
@@ -5577,14 +6030,36 @@ def load_config(pathname=None, server=None):
         or os.path.join(os.path.dirname(os.path.dirname(__file__)), "viewvc.conf")
     )
 
+    if cache:
+        key = (pathname, uri_host)
+        with _config_cache_lock:
+            cfg = _config_cache.get(key)
+        if cfg is None or not cfg.is_fresh():
+            cfg = _load_config(pathname, uri_host)
+            try:
+                expand_root_parents(cfg)
+            except Exception:
+                # Leave it to the views that need the expanded roots to
+                # report the problem.
+                cfg = _load_config(pathname, uri_host)
+            with _config_cache_lock:
+                _config_cache[key] = cfg
+        cfg = cfg.shallow_copy()
+    else:
+        cfg = _load_config(pathname, uri_host)
+
+    # Apply the stacktrace configuration immediately.
+    sys.tracebacklimit = 1000 if cfg.options.stacktraces else 0
+
+    return cfg
+
+
+def _load_config(pathname, uri_host):
     # Load the configuration!
     cfg = config.Config()
     cfg.set_defaults()
     cfg.load_config(pathname, uri_host)
 
-    # Apply the stacktrace configuration immediately.
-    sys.tracebacklimit = 1000 if cfg.options.stacktraces else 0
-
     # Load mime types file(s), but reverse the order -- our
     # configuration uses a most-to-least preferred approach, but the
     # 'mimetypes' package wants things the other way around.
@@ -5592,6 +6067,8 @@ def load_config(pathname=None, server=None):
         files = cfg.general.mime_types_files[:]
         files.reverse()
         files = list(map(lambda x, y=pathname: os.path.join(os.path.dirname(y), x), files))
+        for fname in files:
+            cfg.add_source(fname)
         mimetypes.init(files)
 
     return cfg
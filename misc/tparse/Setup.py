@@ -1,10 +1,10 @@
 #!/usr/bin/env python3
 
-from distutils.core import setup, Extension
+from setuptools import setup, Extension
 
 setup(
     name="tparse",
-    version="1.0",
+    version="0.20",
     description="A quick RCS file format parser",
     author="Lucas Bruand",
     author_email="lbruand@users.sourceforge.net",
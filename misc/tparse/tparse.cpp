@@ -27,29 +27,24 @@
 
 #include "tparse.h"
 
-#ifndef __USE_XOPEN
-#define __USE_XOPEN
-#endif
-#include <ctime>   /* for strptime */
+#include <cstdio>  /* for snprintf */
 
 
 using namespace std;
 
 #define Whitespace(c) (c == ' ' || c == '\t' || c == '\014' || c == '\n' || \
-                       c == '\r')
-#define Token_term(c) (c == ' ' || c == '\t' || c == '\014' || c == '\n' || \
-                       c == '\r' || c == ';' || c == ':')
-#define isdigit(c) ((c-'0')<10)
+                       c == '\r' || c == '\013')
+#define Token_term(c) (Whitespace(c) || c == ';' || c == ':')
+#define Isdigit(c) ((unsigned char)((c) - '0') < 10)
 
 
 
 void rcstoken::init(const char *mydata, size_t mylen)
 {
-  size = DEFAULT_TOKEN_SIZE;
+  size = 0;
   length = 0;
-  delta = DEFAULT_TOKEN_DELTA;
   data = NULL;
-  if (mydata && mylen)
+  if (mydata)
     append(mydata, mylen);
 };
 
@@ -68,28 +63,31 @@ void rcstoken::grow(size_t new_size)
 {
   if ((! data) || (new_size > size))
     {
+      /* Grow geometrically, so that building a large deltatext out of
+         many buffer-sized pieces costs linear time. */
+      if (size < DEFAULT_TOKEN_SIZE)
+        size = DEFAULT_TOKEN_SIZE;
       while (new_size > size)
-        size += delta;
+        size *= 2;
 
-      data = (char*) realloc(data, size);
+      char *new_data = (char*) realloc(data, size);
+      if (new_data == NULL)
+        throw bad_alloc();
+      data = new_data;
     };
 };
 
-rcstoken *rcstoken::copy_begin_end(size_t begin, size_t end)
-{
-  return new rcstoken(&data[begin], end - begin);
-};
 
-rcstoken *rcstoken::copy_begin_len(size_t begin, size_t len)
+/*--------- Tokenparser class -----------*/
+int TokenParser::fill(int offset)
 {
-  return new rcstoken(&data[begin], len);
-};
-
+  input->read(buf + offset, CHUNK_SIZE - offset);
+  return input->gcount();
+}
 
-/*--------- Tokenparser class -----------*/
 rcstoken *TokenParser::get(int allow_eof)
 {
-  auto_ptr<rcstoken> token;
+  unique_ptr<rcstoken> token;
 
   if (backget)
   {
@@ -104,13 +102,13 @@ rcstoken *TokenParser::get(int allow_eof)
   {
     if (idx == buflength)
     {
-      input->read(buf, CHUNK_SIZE);
-      if ( (buflength = input->gcount()) == 0 )
+      if ( (buflength = fill(0)) == 0 )
       {
+        /* signal EOF by returning the null token */
         if (allow_eof)
           return token.release();
         else
-          throw RCSParseError("Unexpected end of file.");
+          throw RCSUnexpectedEOF();
       };
 
       idx = 0;
@@ -122,8 +120,8 @@ rcstoken *TokenParser::get(int allow_eof)
 
   if (buf[idx] == ';' || buf[idx] == ':')
   {
-    idx++;
     (*token) = buf[idx];
+    idx++;
     return token.release();
   }
 
@@ -141,43 +139,47 @@ rcstoken *TokenParser::get(int allow_eof)
         idx = end;
         return token.release();
       }
-      input->read(buf, CHUNK_SIZE);
-      buflength = input->gcount();
+      buflength = fill(0);
       idx = 0;
       end = 0;
+      if (buflength == 0)
+        return token.release();
     }
   }
+
+  /* a "string" which starts with the "@" character. we'll skip it when we
+     search for content. */
   idx++;
 
   while (1)
   {
     int i;
+    char *at;
 
     if (idx == buflength)
     {
       idx = 0;
-      input->read(buf, CHUNK_SIZE);
-      if ( (buflength = input->gcount()) == 0 )
-        throw RCSIllegalCharacter("Unterminated string: @ missing!");
+      if ( (buflength = fill(0)) == 0 )
+        throw RCSUnexpectedEOF();
     }
-    //i=strchr(buf+idx,'@');
-    for (i = idx;i < buflength && (buf[i] != '@');i++)
-      ;
-    if (i == buflength)
+    at = (char *) memchr(buf + idx, '@', buflength - idx);
+    if (at == NULL)
     {
-      if ((buflength - idx) > 0)
-        token->append(buf + idx, buflength - idx);
+      token->append(buf + idx, buflength - idx);
       idx = buflength;
       continue;
     }
+    i = at - buf;
     if ( i == buflength - 1)
     {
+      /* we can't tell a closing "@" from an escaped "@@" without seeing
+         the next character, so carry the "@" over into the next chunk */
       token->append(buf + idx, i - idx);
       idx = 0;
       buf[0] = '@';
-      input->read(buf + 1, CHUNK_SIZE - 1);
-      if ( (buflength = input->gcount()) == 0 )
-        throw RCSIllegalCharacter("Unterminated string: @ missing!");
+      if ( (buflength = fill(1)) == 0 )
+        /* the string ends at the end of the file */
+        return token.release();
       buflength++;
       continue;
     }
@@ -187,8 +189,7 @@ rcstoken *TokenParser::get(int allow_eof)
       idx = i + 2;
       continue;
     }
-    if ((i - idx) > 0)
-      token->append(buf + idx, i - idx);
+    token->append(buf + idx, i - idx);
     idx = i + 1;
     return token.release();
   }
@@ -205,13 +206,91 @@ void TokenParser::unget(rcstoken *token)
 }
 
 /*--------- tparseParser class -----------*/
+
+/* Convert an RCS date (YY.mm.dd.HH.MM.SS or YYYY.mm.dd.HH.MM.SS, in UTC)
+   into seconds since the epoch, the way calendar.timegm() would. */
+static long long rcs_date_to_timestamp(rcstoken &date, rcstoken &revision)
+{
+  long long fields[6];
+  int nfields = 0;
+  size_t i = 0;
+  char msg[256];
+
+  while (i <= date.length && nfields < 6)
+  {
+    size_t start = i;
+    long long value = 0;
+
+    while (i < date.length && Isdigit(date[i]))
+      value = value * 10 + (date[i++] - '0');
+    if (i == start || (i < date.length && date[i] != '.'))
+      break;
+    if (nfields == 0 && i - start == 2)
+      value += 1900;
+    fields[nfields++] = value;
+    i++;
+  }
+  if (nfields != 6 || i <= date.length)
+  {
+    snprintf(msg, sizeof(msg), "invalid date for revision %s: %s",
+             revision.data, date.data);
+    throw RCSInvalidDate(msg);
+  }
+  if (fields[0] < 1970)
+  {
+    snprintf(msg, sizeof(msg), "invalid year for revision %s", revision.data);
+    throw RCSInvalidDate(msg);
+  }
+  if (fields[1] < 1 || fields[1] > 12)
+  {
+    snprintf(msg, sizeof(msg), "invalid date for revision %s: "
+             "month must be in 1..12", revision.data);
+    throw RCSInvalidDate(msg);
+  }
+
+  /* days since the epoch of the first of the month (Howard Hinnant's
+     days_from_civil algorithm) */
+  long long y = fields[0] - (fields[1] <= 2);
+  long long era = y / 400;
+  long long yoe = y - era * 400;
+  long long mp = (fields[1] + 9) % 12;
+  long long doy = (153 * mp + 2) / 5;
+  long long doe = yoe * 365 + yoe / 4 - yoe / 100 + doy;
+  long long days = era * 146097 + doe - 719468 + fields[2] - 1;
+
+  return ((days * 24 + fields[3]) * 60 + fields[4]) * 60 + fields[5];
+}
+
+/* Join TOKENS into RESULT, separated by single spaces. */
+static void join_tokens(tokenlist &tokens, rcstoken &result)
+{
+  result.init("", 0);
+  for (tokenlist_iter t = tokens.begin(); t != tokens.end(); t++)
+  {
+    if (t != tokens.begin())
+      result += ' ';
+    result += *t;
+  }
+}
+
+void tparseParser::read_until_semicolon(tokenlist &tokens)
+{
+  while (1)
+  {
+    unique_ptr<rcstoken> token(tokenstream->get(FALSE));
+    if (*token == ';')
+      break;
+    tokens.push_back(*token);
+  }
+}
+
 void tparseParser::parse_rcs_admin()
 {
   while (1)
   {
-    auto_ptr<rcstoken> token(tokenstream->get(FALSE));
+    unique_ptr<rcstoken> token(tokenstream->get(FALSE));
 
-    if (isdigit((*token)[0]))
+    if (*token == "desc")
     {
       tokenstream->unget(token.release());
       return;
@@ -219,9 +298,11 @@ void tparseParser::parse_rcs_admin()
     if (*token == "head")
     {
       token.reset(tokenstream->get(FALSE));
-      sink->set_head_revision(*token);
-
-      tokenstream->match(';');
+      if (*token != ';')
+      {
+        sink->set_head_revision(*token);
+        tokenstream->match(';');
+      }
       continue;
     }
     if (*token == "branch")
@@ -230,16 +311,23 @@ void tparseParser::parse_rcs_admin()
       if (*token != ';')
       {
         sink->set_principal_branch(*token);
-
         tokenstream->match(';');
       }
       continue;
     }
+    if (*token == "access")
+    {
+      tokenlist accessors;
+      read_until_semicolon(accessors);
+      if (!accessors.empty())
+        sink->set_access(accessors);
+      continue;
+    }
     if (*token == "symbols")
     {
       while (1)
       {
-        auto_ptr<rcstoken> rev;
+        unique_ptr<rcstoken> rev;
         token.reset(tokenstream->get(FALSE));
         if (*token == ';')
           break;
@@ -250,27 +338,53 @@ void tparseParser::parse_rcs_admin()
       }
       continue;
     }
-    if (*token == "comment")
-    {
-      token.reset(tokenstream->get(FALSE));
-      sink->set_comment((*token));
-
-      tokenstream->match(';');
-      continue;
-    }
-    if (*token == "locks" ||
-        *token == "strict" ||
-        *token == "expand" ||
-        *token == "access")
+    if (*token == "locks")
     {
       while (1)
       {
+        unique_ptr<rcstoken> rev;
         token.reset(tokenstream->get(FALSE));
         if (*token == ';')
           break;
+
+        tokenstream->match(':');
+        rev.reset(tokenstream->get(FALSE));
+        sink->set_locker(*rev, *token);
       }
       continue;
     }
+    if (*token == "strict")
+    {
+      rcstoken mode("strict");
+      sink->set_locking(mode);
+      tokenstream->match(';');
+      continue;
+    }
+    if (*token == "comment")
+    {
+      token.reset(tokenstream->get(FALSE));
+      sink->set_comment(*token);
+      tokenstream->match(';');
+      continue;
+    }
+    if (*token == "expand")
+    {
+      token.reset(tokenstream->get(FALSE));
+      sink->set_expansion(*token);
+      tokenstream->match(';');
+      continue;
+    }
+
+    /* We're done once we reach the description of the RCS tree */
+    if (token->length && Isdigit((*token)[0]))
+    {
+      tokenstream->unget(token.release());
+      return;
+    }
+
+    /* Chew up "newphrase" */
+    while (*token != ';')
+      token.reset(tokenstream->get(FALSE));
   }
 };
 
@@ -278,10 +392,10 @@ void tparseParser::parse_rcs_tree()
 {
   while (1)
   {
-    auto_ptr<rcstoken> revision, date, author, hstate, next;
-    long timestamp;
+    unique_ptr<rcstoken> revision, date, next;
+    rcstoken author, state;
+    long long timestamp;
     tokenlist branches;
-    struct tm tm;
 
     revision.reset(tokenstream->get(FALSE));
     if (*revision == "desc")
@@ -293,43 +407,31 @@ void tparseParser::parse_rcs_tree()
     // Parse date
     tokenstream->match("date");
     date.reset(tokenstream->get(FALSE));
-    tokenstream->match(";");
-
-    memset ((void *) &tm, 0, sizeof(struct tm));
-    if (strptime((*date).data, "%y.%m.%d.%H.%M.%S", &tm) == NULL)
-      strptime((*date).data, "%Y.%m.%d.%H.%M.%S", &tm);
-    timestamp = mktime(&tm);
-
-
-    tokenstream->match("author");
-    author.reset(tokenstream->get(FALSE));
     tokenstream->match(';');
+    timestamp = rcs_date_to_timestamp(*date, *revision);
 
-    tokenstream->match("state");
-    hstate.reset(new rcstoken());
-    while (1)
+    // Parse author.  Authors containing whitespace violate the RCS
+    // specification, but CVSNT is known to produce them.
     {
-      auto_ptr<rcstoken> token;
-      token.reset(tokenstream->get(FALSE));
-      if (*token == ';')
-        break;
+      tokenlist tokens;
+      tokenstream->match("author");
+      read_until_semicolon(tokens);
+      join_tokens(tokens, author);
+    }
 
-      if ((*hstate).length)
-        (*hstate) += ' ';
-      (*hstate) += *token;
+    // Parse state
+    {
+      tokenlist tokens;
+      tokenstream->match("state");
+      read_until_semicolon(tokens);
+      join_tokens(tokens, state);
     }
 
+    // Parse branches
     tokenstream->match("branches");
-    while (1)
-      {
-        auto_ptr<rcstoken> token;
-        token.reset(tokenstream->get(FALSE));
-        if (*token == ';')
-          break;
-
-        branches.push_front((*token));
-      }
+    read_until_semicolon(branches);
 
+    // Parse revision of next delta in chain
     tokenstream->match("next");
     next.reset(tokenstream->get(FALSE));
     if (*next == ';')
@@ -344,32 +446,32 @@ void tparseParser::parse_rcs_tree()
      *	group	15;
      *	permissions	644;
      *	hardlinks	@configure.in@;
+     *	commitid	mLiHw3bulRjnTDGr;
      *	this is "newphrase" in RCSFILE(5). we just want to skip over these.
      */
     while (1)
       {
-        auto_ptr<rcstoken> token;
-        token.reset(tokenstream->get(FALSE));
+        unique_ptr<rcstoken> token(tokenstream->get(FALSE));
 
-        if ((*token == "desc") || isdigit((*token)[0]) )
+        if ((*token == "desc") || (token->length && Isdigit((*token)[0])))
           {
             tokenstream->unget(token.release());
             break;
           };
 
-        while (*token != ";")
-          token.reset(tokenstream->get(FALSE));
+        tokenlist ignored;
+        read_until_semicolon(ignored);
       }
 
-    sink->define_revision(*revision, timestamp, *author,
-                          *hstate, branches, *next);
+    sink->define_revision(*revision, timestamp, author,
+                          state, branches, *next);
   }
   return;
 }
 
 void tparseParser::parse_rcs_description()
 {
-  auto_ptr<rcstoken> token;
+  unique_ptr<rcstoken> token;
   tokenstream->match("desc");
 
   token.reset(tokenstream->get(FALSE));
@@ -378,7 +480,7 @@ void tparseParser::parse_rcs_description()
 
 void tparseParser::parse_rcs_deltatext()
 {
-  auto_ptr<rcstoken> revision, log, text;
+  unique_ptr<rcstoken> revision, log, text;
 
   while (1)
   {
@@ -27,17 +27,18 @@
 
 #ifndef __PARSE_H
 #define __PARSE_H
-#include <memory>     /* for auto_ptr */
+#include <memory>     /* for unique_ptr */
 #include <algorithm>  /* for iterator */
 #include <exception>  /* for exception */
 #include <istream>    /* for istream */
 #include <list>       /* for list<> */
 #include <string>     /* for string */
+#include <cstdlib>    /* for realloc, free */
+#include <cstring>    /* for memcpy, memcmp, strlen */
 
 
-#define CHUNK_SIZE 30000
+#define CHUNK_SIZE 102400
 #define DEFAULT_TOKEN_SIZE 512
-#define DEFAULT_TOKEN_DELTA 10240
 
 #ifndef FALSE
 #define FALSE (0 != 0)
@@ -51,7 +52,6 @@ using namespace std;
 
 /* This class represents a exception that occured during the parsing
    of a file */
-
 class RCSParseError : public exception
 {
   public:
@@ -81,23 +81,41 @@ class RCSExpected : public RCSParseError
     string wanted;
     RCSExpected(const char *mygot, const char *mywanted)
     {
-      got = mygot;
+      got = mygot ? mygot : "";
       wanted = mywanted;
     };
     RCSExpected(const char *mygot, const char c)
     {
-      got = mygot;
+      got = mygot ? mygot : "";
       wanted = c;
     };
     virtual ~RCSExpected() throw() {};
 };
 
+/* Raised when the input ends in the middle of the RCS file. */
+class RCSUnexpectedEOF : public RCSParseError
+{
+  public:
+    RCSUnexpectedEOF() {};
+    virtual ~RCSUnexpectedEOF() throw() {};
+};
+
+/* Raised when a revision's date is unparseable or out of range. */
+class RCSInvalidDate : public RCSParseError
+{
+  public:
+    RCSInvalidDate(const char *myvalue)
+    {
+      value = myvalue;
+    };
+    virtual ~RCSInvalidDate() throw() {};
+};
+
 class rcstoken
 {
  public:
-  size_t length, size, delta;
+  size_t length, size;
   char *data;
-
  public:
   rcstoken(const char *mydata, size_t mylen)
   {
@@ -107,14 +125,17 @@ class rcstoken
     {
       init(mydata, strlen(mydata));
     };
-  rcstoken(size_t mysize = DEFAULT_TOKEN_SIZE,
-           size_t mydelta = DEFAULT_TOKEN_DELTA)
+  rcstoken()
     {
       data = NULL;
-      size = mysize;
+      size = 0;
       length = 0;
-      delta = mydelta;
     };
+  rcstoken(const rcstoken& token)
+    {
+      init(token.data, token.length);
+    };
+  rcstoken& operator=(const rcstoken& token) = delete;
   ~rcstoken()
     {
       if (data)
@@ -128,30 +149,25 @@ class rcstoken
     };
   rcstoken& operator=(const char b)
     {
-      grow(2);
-      length = 1;
-      data[0] = b;
-      data[1] = 0;
-
+      length = 0;
+      append(b);
       return *this;
     };
   rcstoken& operator+=(const char b)
     {
       append(b);
-
       return *this;
     };
   rcstoken& operator+=(rcstoken& token)
     {
       append(token);
-
       return *this;
     };
   int operator==(const char *b)
     {
       size_t b_len;
       return data && b && length == (b_len = strlen(b)) &&
-        memcmp(data, b, (b_len<length) ? b_len : length) == 0;
+        memcmp(data, b, length) == 0;
     };
   int operator!=(const char *b)
     {
@@ -172,26 +188,26 @@ class rcstoken
   void append(const char *b, size_t b_len);
   void append(const char b)
     {
-      grow(length+2);
-      data[length] = b;
-      data[length++] = 0;
+      grow(length + 2);
+      data[length++] = b;
+      data[length] = 0;
     };
   void append(rcstoken& token)
     {
       append(token.data, token.length);
     };
   void grow(size_t new_size);
-  rcstoken *copy_begin_end(size_t begin, size_t end);
-  rcstoken *copy_begin_len(size_t begin, size_t len);
 };
 
 typedef list<rcstoken> tokenlist;
 typedef tokenlist::iterator tokenlist_iter;
 
 
-
 /* This class is a handler that receive the event generated by the parser
-   i.e.: When we reach the head revision tag, etc... */
+   i.e.: When we reach the head revision tag, etc...
+
+   The callbacks (and the order in which they are made) mirror those of
+   the Sink class in the Python rcsparse package. */
 class Sink
 {
   public:
@@ -199,10 +215,15 @@ class Sink
     virtual ~Sink() throw () {};
     virtual void set_head_revision(rcstoken &revision) = 0;
     virtual void set_principal_branch(rcstoken &branch_name) = 0;
+    virtual void set_access(tokenlist &accessors) = 0;
     virtual void define_tag(rcstoken &name, rcstoken &revision) = 0;
+    virtual void set_locker(rcstoken &revision, rcstoken &locker) = 0;
+    virtual void set_locking(rcstoken &mode) = 0;
     virtual void set_comment(rcstoken &comment) = 0;
+    virtual void set_expansion(rcstoken &mode) = 0;
+    virtual void admin_completed() = 0;
     virtual void set_description(rcstoken &description) = 0;
-    virtual void define_revision(rcstoken &revision, long timestamp,
+    virtual void define_revision(rcstoken &revision, long long timestamp,
                                  rcstoken &author, rcstoken &state,
                                  tokenlist &branches, rcstoken &next) = 0;
     virtual void set_revision_info(rcstoken &revision,
@@ -220,23 +241,19 @@ class TokenParser
     int buflength;
     int idx;
     rcstoken *backget;
+    int fill(int offset);
   public:
     rcstoken *get(int allow_eof);
     void unget(rcstoken *token);
-    int eof()
-    {
-      return (input->gcount() == 0);
-    };
     void match(const char *token)
     {
-      auto_ptr<rcstoken> ptr(get(FALSE));
+      unique_ptr<rcstoken> ptr(get(FALSE));
       if (*ptr != token)
         throw RCSExpected(ptr->data, token);
     }
     void match(const char c)
     {
-      auto_ptr<rcstoken> token(get(FALSE));
-
+      unique_ptr<rcstoken> token(get(FALSE));
       if ((*token) != c)
         throw RCSExpected(token->data, c);
     };
@@ -245,9 +262,20 @@ class TokenParser
       input = myinput;
       backget = NULL;
       idx = 0;
-      input->read(buf, CHUNK_SIZE);
-      if ( (buflength = input->gcount()) == 0 )
-        throw RCSParseError("Non-existing file or empty file");
+      try
+      {
+        buflength = fill(0);
+      }
+      catch (...)
+      {
+        delete input;
+        throw;
+      }
+      if (buflength == 0)
+      {
+        delete input;
+        throw RCSUnexpectedEOF();
+      }
     };
     ~TokenParser()
     {
@@ -271,6 +299,7 @@ class tparseParser
   private:
     TokenParser *tokenstream;
     Sink *sink;
+    void read_until_semicolon(tokenlist &tokens);
     void parse_rcs_admin();
     void parse_rcs_tree();
     void parse_rcs_description();
@@ -279,11 +308,23 @@ class tparseParser
     tparseParser(istream *myinput, Sink* mysink)
     {
       sink = mysink;
-      tokenstream = new TokenParser(myinput);
+      try
+      {
+        tokenstream = new TokenParser(myinput);
+      }
+      catch (...)
+      {
+        delete sink;
+        throw;
+      }
     }
     void parse()
     {
       parse_rcs_admin();
+
+      // let sink know when the admin section has been completed
+      sink->admin_completed();
+
       parse_rcs_tree();
 
       // many sinks want to know when the tree has been completed so they can
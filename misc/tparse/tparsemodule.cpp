@@ -27,17 +27,11 @@
 */
 
 #include <fstream>
+#include <streambuf>
 
 #include "tparsemodule.h"
 #include "tparse.cpp"
 
-#if (__GNUC__ >= 4) || (__GNUC__ == 3 && __GNUC_MINOR__ >= 1)
-#include <memory> // for auto_ptr
-#include <ext/stdio_filebuf.h>
-typedef __gnu_cxx::stdio_filebuf<char> stdio_filebuf;
-#define GNUC_STDIO_FILEBUF_AVAILABLE
-#endif
-
 using namespace std;
 
 class PythonException
@@ -67,15 +61,37 @@ class pyobject
 };
 
 
-class pystring : public pyobject
+/* A Python bytes object holding a copy of an rcstoken (or None for the
+   null token). */
+class pybytes : public pyobject
 {
 public:
-  pystring(const char *s) :
-    pyobject(PyString_FromString(s))
-  {};
-  pystring(rcstoken& t) :
-    pyobject(PyString_FromStringAndSize(t.data, t.length))
-  {};
+  pybytes(rcstoken& t) :
+    pyobject(t.null_token() ? Py_NewRef(Py_None)
+                            : PyBytes_FromStringAndSize(t.data, t.length))
+  {
+    if (**this == NULL)
+      throw PythonException();
+  };
+};
+
+
+/* A Python list of bytes objects, one per token in a tokenlist. */
+class pybyteslist : public pyobject
+{
+public:
+  pybyteslist(tokenlist& tokens) :
+    pyobject(PyList_New(0))
+  {
+    if (**this == NULL)
+      throw PythonException();
+    for (tokenlist_iter t = tokens.begin(); t != tokens.end(); t++)
+      {
+        pybytes b(*t);
+        if (PyList_Append(**this, *b) < 0)
+          throw PythonException();
+      }
+  };
 };
 
 
@@ -88,46 +104,147 @@ void chkpy(PyObject *obj)
 };
 
 
+/* A streambuf which reads from a Python file object's read() method. */
+class pyfile_streambuf : public streambuf
+{
+  private:
+    PyObject *file;
+    char buffer[CHUNK_SIZE];
 
-static PyMethodDef tparseMethods[] = {
-  {"parse", tparse, METH_VARARGS, tparse__doc__},
-  {NULL, NULL}        /* Sentinel */
+    Py_ssize_t read_into(char *dest, Py_ssize_t n)
+    {
+      pyobject data(PyObject_CallMethod(file, "read", "n", n));
+      char *s;
+      Py_ssize_t len;
+
+      if (*data == NULL || PyBytes_AsStringAndSize(*data, &s, &len) < 0)
+        throw PythonException();
+      if (len > n)
+        len = n;
+      memcpy(dest, s, len);
+      return len;
+    };
+
+  public:
+    pyfile_streambuf(PyObject *myfile)
+    {
+      file = myfile;
+      Py_INCREF(file);
+    };
+    virtual ~pyfile_streambuf()
+    {
+      Py_DECREF(file);
+    };
+
+  protected:
+    virtual int_type underflow()
+    {
+      if (gptr() < egptr())
+        return traits_type::to_int_type(*gptr());
+      Py_ssize_t len = read_into(buffer, CHUNK_SIZE);
+      if (len == 0)
+        return traits_type::eof();
+      setg(buffer, buffer, buffer + len);
+      return traits_type::to_int_type(*gptr());
+    };
+
+    /* Bulk reads (all the tokenizer does) skip our buffer entirely. */
+    virtual streamsize xsgetn(char *dest, streamsize n)
+    {
+      streamsize got = 0;
+
+      if (gptr() < egptr())
+        {
+          got = min((streamsize) (egptr() - gptr()), n);
+          memcpy(dest, gptr(), got);
+          gbump(got);
+        }
+      while (got < n)
+        {
+          Py_ssize_t len = read_into(dest + got, n - got);
+          if (len == 0)
+            break;
+          got += len;
+        }
+      return got;
+    };
 };
 
-void inittparse()
+
+/* An istream which owns its streambuf. */
+class pyfile_istream : public istream
 {
-  PyObject *m, *d, *common, *commondict;
-  pystring ver(__version__),
-    dat(__date__),
-    aut(__author__);
-  m = Py_InitModule3("tparse", tparseMethods, __doc__);
+  private:
+    pyfile_streambuf sbuf;
+  public:
+    pyfile_istream(PyObject *file) : istream(NULL), sbuf(file)
+    {
+      rdbuf(&sbuf);
+      // Let Python exceptions raised by the file object's read() method
+      // escape from the istream.
+      exceptions(ios::badbit);
+    };
+};
 
-  common = PyImport_ImportModule("common");
-  if (!common)
-    return ; // Common not imported ?
 
-  commondict = PyModule_GetDict(common);
-  pyRCSStopParser = PyDict_GetItemString(commondict, "RCSStopParser");
-  Py_INCREF(pyRCSStopParser);
+static PyMethodDef tparseMethods[] = {
+  {"parse", tparse, METH_VARARGS, tparse__doc__},
+  {NULL, NULL}        /* Sentinel */
+};
 
-  pyRCSParseError = PyDict_GetItemString(commondict, "RCSParseError");
-  Py_INCREF(pyRCSParseError);
+static struct PyModuleDef tparsemodule = {
+  PyModuleDef_HEAD_INIT,
+  "tparse",
+  tparse_module__doc__,
+  -1,
+  tparseMethods
+};
 
-  pyRCSIllegalCharacter = PyDict_GetItemString(commondict, 
-                                               "RCSIllegalCharacter");
-  Py_INCREF(pyRCSIllegalCharacter);
+PyMODINIT_FUNC PyInit_tparse(void)
+{
+  PyObject *m, *common;
 
-  pyRCSExpected = PyDict_GetItemString(commondict, "RCSExpected");
-  Py_INCREF(pyRCSExpected);
+  m = PyModule_Create(&tparsemodule);
+  if (!m)
+    return NULL;
 
-  PySink = PyDict_GetItemString(commondict, "Sink");
-  Py_INCREF(PySink);
+  // When this module lives inside the rcsparse package, its name is
+  // fully qualified, and we want the package's "common" module.
+  // Otherwise, fall back to a top-level "common" module.
+  string common_name(PyModule_GetName(m));
+  size_t dot = common_name.rfind('.');
+  if (dot == string::npos)
+    common_name = "common";
+  else
+    common_name = common_name.substr(0, dot + 1) + "common";
 
-  d = PyModule_GetDict(m);
+  common = PyImport_ImportModule(common_name.c_str());
+  if (!common)
+    {
+      Py_DECREF(m);
+      return NULL;
+    }
+  pyRCSParseError = PyObject_GetAttrString(common, "RCSParseError");
+  pyRCSIllegalCharacter = PyObject_GetAttrString(common,
+                                                 "RCSIllegalCharacter");
+  pyRCSExpected = PyObject_GetAttrString(common, "RCSExpected");
+  pyRCSUnexpectedEOF = PyObject_GetAttrString(common, "RCSUnexpectedEOF");
+  Py_DECREF(common);
+  if (!pyRCSParseError || !pyRCSIllegalCharacter || !pyRCSExpected
+      || !pyRCSUnexpectedEOF)
+    {
+      Py_DECREF(m);
+      return NULL;
+    }
 
-  PyDict_SetItemString(d, "__version__", *ver);
-  PyDict_SetItemString(d, "__date__", *dat);
-  PyDict_SetItemString(d, "__author__", *aut);
+  if (PyModule_AddStringConstant(m, "__version__", tparse__version__) < 0
+      || PyModule_AddStringConstant(m, "__date__", tparse__date__) < 0
+      || PyModule_AddStringConstant(m, "__author__", tparse__author__) < 0)
+    {
+      Py_DECREF(m);
+      return NULL;
+    }
+  return m;
 }
 
 class PythonSink : public Sink
@@ -145,53 +262,69 @@ class PythonSink : public Sink
     };
     virtual void set_head_revision(rcstoken &revision)
     {
-      chkpy(PyObject_CallMethod(sink, "set_head_revision", "s",
-                                revision.data));
+      pybytes r(revision);
+      chkpy(PyObject_CallMethod(sink, "set_head_revision", "O", *r));
     };
     virtual void set_principal_branch(rcstoken &branch_name)
     {
-      chkpy(PyObject_CallMethod(sink, "set_principal_branch",
-                                "s", branch_name.data));
+      pybytes b(branch_name);
+      chkpy(PyObject_CallMethod(sink, "set_principal_branch", "O", *b));
+    };
+    virtual void set_access(tokenlist &accessors)
+    {
+      pybyteslist a(accessors);
+      chkpy(PyObject_CallMethod(sink, "set_access", "O", *a));
     };
     virtual void define_tag(rcstoken &name, rcstoken &revision)
     {
-      chkpy(PyObject_CallMethod(sink, "define_tag", "ss",
-                                name.data, revision.data));
+      pybytes n(name), r(revision);
+      chkpy(PyObject_CallMethod(sink, "define_tag", "OO", *n, *r));
+    };
+    virtual void set_locker(rcstoken &revision, rcstoken &locker)
+    {
+      pybytes r(revision), l(locker);
+      chkpy(PyObject_CallMethod(sink, "set_locker", "OO", *r, *l));
+    };
+    virtual void set_locking(rcstoken &mode)
+    {
+      pybytes m(mode);
+      chkpy(PyObject_CallMethod(sink, "set_locking", "O", *m));
     };
     virtual void set_comment(rcstoken &comment)
     {
-      pystring c(comment);
-      chkpy(PyObject_CallMethod(sink, "set_comment", "S", *c));
+      pybytes c(comment);
+      chkpy(PyObject_CallMethod(sink, "set_comment", "O", *c));
+    };
+    virtual void set_expansion(rcstoken &mode)
+    {
+      pybytes m(mode);
+      chkpy(PyObject_CallMethod(sink, "set_expansion", "O", *m));
+    };
+    virtual void admin_completed()
+    {
+      chkpy(PyObject_CallMethod(sink, "admin_completed", NULL));
     };
     virtual void set_description(rcstoken &description)
     {
-      pystring d(description);
-      chkpy(PyObject_CallMethod(sink, "set_description", "S", *d));
+      pybytes d(description);
+      chkpy(PyObject_CallMethod(sink, "set_description", "O", *d));
     };
-    virtual void define_revision(rcstoken &revision, long timestamp,
+    virtual void define_revision(rcstoken &revision, long long timestamp,
                                  rcstoken &author, rcstoken &state,
                                  tokenlist &branches, rcstoken &next)
     {
-      pyobject branchlist(PyList_New(0));
-      tokenlist_iter branch;
-
-      for (branch = branches.begin(); branch != branches.end(); branch++)
-        {
-          pystring str(*branch);
-          PyList_Append(*branchlist, *str);
-        }
+      pybytes r(revision), a(author), s(state), n(next);
+      pybyteslist b(branches);
 
-      chkpy(PyObject_CallMethod(sink, "define_revision", "slssOs",
-                                revision.data,timestamp,
-                                author.data,state.data,*branchlist,
-                                next.data));
+      chkpy(PyObject_CallMethod(sink, "define_revision", "OLOOOO",
+                                *r, timestamp, *a, *s, *b, *n));
     };
     virtual void set_revision_info(rcstoken& revision,
                                    rcstoken& log, rcstoken& text)
     {
-      pystring l(log), txt(text);
-      chkpy(PyObject_CallMethod(sink, "set_revision_info", "sSS",
-                                revision.data, *l, *txt));
+      pybytes r(revision), l(log), txt(text);
+      chkpy(PyObject_CallMethod(sink, "set_revision_info", "OOO",
+                                *r, *l, *txt));
     };
     virtual void tree_completed()
     {
@@ -205,92 +338,80 @@ class PythonSink : public Sink
 
 static PyObject * tparse( PyObject *self, PyObject *args)
 {
-  char *filename;
-  istream *input = NULL;
-  PyObject *file = NULL;
+  PyObject *file;
   PyObject *hsink;
-  PyObject *rv = Py_None;
-#ifdef GNUC_STDIO_FILEBUF_AVAILABLE
-  auto_ptr<streambuf> rdbuf;
-#endif
-
-  if (PyArg_ParseTuple(args, "sO!", &filename, &PyInstance_Type, &hsink))
-    input = new ifstream(filename, ios::in);
-  else if (PyArg_ParseTuple(args, "O!O!", &PyFile_Type, &file, 
-                            &PyInstance_Type, &hsink))
-  {
-    PyErr_Clear();   // Reset the exception PyArg_ParseTuple has raised.
-#ifdef GNUC_STDIO_FILEBUF_AVAILABLE
-    rdbuf.reset(new stdio_filebuf(PyFile_AsFile(file), ios::in | ios::binary));
-    input = new istream(rdbuf.get());
-#else
-    PyErr_SetString(PyExc_NotImplementedError,
-                    "tparse only implements the parsing of filehandles "
-                    "when compiled with GNU C++ version 3.1 or later - "
-                    "please pass a filename instead");
-    return NULL;
-#endif
-  }
-  else
-    return NULL;
-
-
+  istream *input = NULL;
 
-  if (!PyObject_IsInstance(hsink, PySink))
-  {
-    PyErr_SetString(PyExc_TypeError,
-                    "Sink has to be an instance of class Sink.");
+  if (!PyArg_ParseTuple(args, "OO", &file, &hsink))
     return NULL;
-  }
+
+  if (PyUnicode_Check(file) || PyBytes_Check(file))
+    {
+      PyObject *path = NULL;
+      ifstream *fstream;
+
+      if (!PyUnicode_FSConverter(file, &path))
+        return NULL;
+      pyobject path_holder(path);
+      fstream = new ifstream(PyBytes_AS_STRING(path), ios::in | ios::binary);
+      if (!fstream->is_open())
+        {
+          delete fstream;
+          PyErr_SetFromErrnoWithFilenameObject(PyExc_OSError, file);
+          return NULL;
+        }
+      input = fstream;
+    }
+  else
+    {
+      input = new pyfile_istream(file);
+    }
 
   try
   {
     tparseParser tp(input, new PythonSink(hsink));
     tp.parse();
   }
-  catch (RCSExpected e)
+  catch (PythonException &e)
   {
-    const char *got = e.got.c_str();
-    const char *wanted = e.wanted.c_str();
-
-    pyobject arg(Py_BuildValue("(ss)", got, wanted)),
-      exp(PyInstance_New(pyRCSExpected, *arg, NULL));
-    PyErr_SetObject(pyRCSExpected, *exp);
-
-    delete [] got;
-    delete [] wanted;
-    rv = NULL;
+    // The Python error indicator is already set.
+    return NULL;
   }
-  catch (RCSIllegalCharacter e)
+  catch (RCSUnexpectedEOF &e)
   {
-    const char *value = e.value.c_str();
-
-    pyobject arg(Py_BuildValue("(s)", value)),
-      exp(PyInstance_New(pyRCSIllegalCharacter,*arg, NULL));
-    PyErr_SetObject(pyRCSIllegalCharacter, *exp);
-
-    delete [] value;
-    rv = NULL;
+    PyErr_SetNone(pyRCSUnexpectedEOF);
+    return NULL;
   }
-  catch (RCSParseError e)
+  catch (RCSInvalidDate &e)
   {
-    const char *value = e.value.c_str();
-
-    pyobject arg(Py_BuildValue("(s)", value)),
-      exp(PyInstance_New(pyRCSParseError, *arg, NULL));
-    PyErr_SetObject(pyRCSParseError, *exp);
-
-    delete [] value;
-    rv = NULL;
+    PyErr_SetString(PyExc_ValueError, e.value.c_str());
+    return NULL;
+  }
+  catch (RCSExpected &e)
+  {
+    pyobject exp(PyObject_CallFunction(pyRCSExpected, "y#y#",
+                                       e.got.data(),
+                                       (Py_ssize_t) e.got.length(),
+                                       e.wanted.data(),
+                                       (Py_ssize_t) e.wanted.length()));
+    if (*exp != NULL)
+      PyErr_SetObject(pyRCSExpected, *exp);
+    return NULL;
+  }
+  catch (RCSIllegalCharacter &e)
+  {
+    PyErr_SetString(pyRCSIllegalCharacter, e.value.c_str());
+    return NULL;
+  }
+  catch (RCSParseError &e)
+  {
+    PyErr_SetString(pyRCSParseError, e.value.c_str());
+    return NULL;
   }
-  catch (PythonException e)
+  catch (bad_alloc &e)
   {
-    if (! PyErr_ExceptionMatches(pyRCSStopParser))
-      rv = NULL;
-    else
-      PyErr_Clear();
+    return PyErr_NoMemory();
   }
 
-  Py_XINCREF(rv);
-  return rv;
+  Py_RETURN_NONE;
 };
@@ -18,58 +18,50 @@
 # -----------------------------------------------------------------------
 */
 
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
 #ifdef __cplusplus
 extern "C"
 {
 #endif
 
-#include <Python.h>
-
-  static char *__doc__ = \
+  static const char *tparse_module__doc__ = \
     "This python extension module is a binding to the tparse library.\n" \
     "tparse is a C++ library that offers an API to a performance-oriented\n" \
     "RCSFILE parser.\n" \
     "It does little syntax checking.\n" \
     "\n" \
     "Version: $Id$\n";
-  static char *__version__ = "0.14";
-  static char *__date__ = "2002/02/11";
-  static char *__author__ = "Lucas Bruand <lucas.bruand@ecl2002.ec-lyon.fr>";
-
-  //static char *pyRCSStopParser__doc__ =
-  // "Stop parser exception: to be raised from the sink to abort parsing.";
-  static PyObject *pyRCSStopParser;
+  static const char *tparse__version__ = "0.20";
+  static const char *tparse__date__ = "2026/10/16";
+  static const char *tparse__author__ = "Lucas Bruand <lucas.bruand@ecl2002.ec-lyon.fr>";
 
-  //static char *pyRCSParseError__doc__ =
-  // "Ancestor Exception";
+  // Exception classes (and the Sink class) from the rcsparse package's
+  // "common" module.
   static PyObject *pyRCSParseError;
-
-  //static char *pyRCSIllegalCharacter__doc__ =
-  // "Parser has encountered an Illegal Character.";
   static PyObject *pyRCSIllegalCharacter;
-
-  //static char *pyRCSExpected__doc__ =
-  // "Parse has found something but the expected.";
   static PyObject *pyRCSExpected;
-  static PyObject *PySink; // Sink Class from the common module.
+  static PyObject *pyRCSUnexpectedEOF;
 
-  static char *tparse__doc__ = \
+  static const char *tparse__doc__ = \
     "Main function: Parse a file and send the result to the sink.\n" \
     "Two ways of invoking this function from python:\n" \
     "* tparse.parse(filename, sink)\n" \
-    "where filename is a string and sink is an instance of the class Sink\n" \
-    "defined in the common.py module.\n" \
+    "where filename is a string (or bytes) path to an RCS file.\n" \
     "* tparse.parse(file, sink)\n" \
-    "where file is a python file and sink is an instance of the class Sink\n" \
-    "defined in the common.py module.\n";
+    "where file is a binary file object (anything with a read() method\n" \
+    "returning bytes).\n" \
+    "In both cases sink is an object implementing the callbacks of the\n" \
+    "class Sink defined in the common.py module; they are called exactly\n" \
+    "as the pure Python parser calls them.  Exceptions raised by the sink\n" \
+    "(such as RCSStopParser) are propagated to the caller.\n";
   static PyObject * tparse( PyObject *self, PyObject *args);
 
   /* Init function for this module: Invoked when the module is
-     imported from Python Load the stopparser expression into the
-     tparser's namespace */
-  void inittparse();
+     imported from Python.  Loads the rcsparse exceptions from the
+     "common" module which sits alongside this one. */
+  PyMODINIT_FUNC PyInit_tparse(void);
 #ifdef __cplusplus
 }
 #endif
-
-
@@ -0,0 +1,24 @@
+# -*-python-*-
+#
+# Copyright (C) 1999-2026 The ViewCVS Group. All Rights Reserved.
+#
+# By using this file, you agree to the terms and conditions set forth in
+# the LICENSE.html file which can be found at the top level of the ViewVC
+# distribution or at http://viewvc.org/license-1.html.
+#
+# For more information, visit http://viewvc.org/
+#
+# -----------------------------------------------------------------------
+#
+# Shared setup for ViewVC's tests, run with pytest from the top of the
+# ViewVC checkout:
+#
+#   $ python3 -m pytest tests
+#
+# -----------------------------------------------------------------------
+
+import os
+import sys
+
+# Get access to our library modules.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
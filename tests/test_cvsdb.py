@@ -0,0 +1,429 @@
+# -*-python-*-
+#
+# Copyright (C) 1999-2026 The ViewCVS Group. All Rights Reserved.
+#
+# By using this file, you agree to the terms and conditions set forth in
+# the LICENSE.html file which can be found at the top level of the ViewVC
+# distribution or at http://viewvc.org/license-1.html.
+#
+# For more information, visit http://viewvc.org/
+#
+# -----------------------------------------------------------------------
+#
+# Tests of the commits database (cvsdb), run against SQLite databases.
+#
+# -----------------------------------------------------------------------
+
+import os
+import sys
+import sqlite3
+import subprocess
+
+import pytest
+
+import cvsdb
+
+DB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bin", "db")
+
+
+def make_database(path, schema_version=cvsdb.CURRENT_SCHEMA_VERSION, autoincrement=True):
+    """Create a SQLite commits database at PATH, from the schema of
+    SCHEMA_VERSION.  Unless AUTOINCREMENT is set, its ids are the plain
+    INTEGER PRIMARY KEY ones of databases created before they were
+    AUTOINCREMENT ones, which SQLite reuses."""
+    script = open(os.path.join(DB_DIR, f"schema_{schema_version}.sqlite.sql")).read()
+    if not autoincrement:
+        script = script.replace(" AUTOINCREMENT", "")
+    db = sqlite3.connect(path, isolation_level=None)
+    try:
+        db.executescript(script)
+    finally:
+        db.close()
+    return path
+
+
+def connect(path, readonly=0):
+    db = cvsdb.CheckinDatabase(None, None, None, None, path, "sqlite", readonly)
+    db.Connect()
+    return db
+
+
+def make_commit(repository, file, revision, author, when, description="Log message."):
+    commit = cvsdb.CreateCommit()
+    commit.SetRepository(repository)
+    commit.SetDirectory("trunk")
+    commit.SetFile(file)
+    commit.SetRevision(revision)
+    commit.SetTime(when)
+    commit.SetAuthor(author)
+    commit.SetBranch("")
+    commit.SetPlusCount(1)
+    commit.SetMinusCount(0)
+    commit.SetDescription(description)
+    commit.SetTypeChange()
+    return commit
+
+
+def run_query(db, repository, **settings):
+    """Run a commits query for REPOSITORY on DB, with the query SETTINGS
+    (such as sort="author", or limit=10), and return the commits found."""
+    query = cvsdb.CreateCheckinQuery()
+    query.SetRepository(repository)
+    for name, value in settings.items():
+        getattr(query, "Set" + name)(value)
+    db.RunQuery(query)
+    return query
+
+
+def authors_by_revision(commits):
+    return dict((commit.GetRevision(), commit.GetAuthor()) for commit in commits)
+
+
+def test_pooled_lookups_after_purge(tmp_path):
+    # The pool's shared lookup caches mustn't outlive a purge (by another
+    # process) which lets SQLite hand the purged ids out again.
+    path = make_database(str(tmp_path / "commits.sqlite"), autoincrement=False)
+    pool = cvsdb.ConnectionPool(None, None, None, None, path, "sqlite", 2, 0)
+
+    db = connect(path)
+    db.AddCommit(make_commit("/repos", "a.txt", "1", "alice", 1000000000))
+    db.AddCommit(make_commit("/repos", "a.txt", "2", "bob", 1000000100))
+    pooled = pool.acquire()
+    assert authors_by_revision(run_query(pooled, "/repos").GetCommitList()) == {
+        "1": "alice",
+        "2": "bob",
+    }
+    pooled.Close()
+
+    db.PurgeRepository("/repos")
+    db.AddCommit(make_commit("/repos", "a.txt", "1", "bob", 1000000000))
+    db.AddCommit(make_commit("/repos", "a.txt", "2", "alice", 1000000100))
+    db.Close()
+
+    pooled = pool.acquire()
+    assert authors_by_revision(run_query(pooled, "/repos").GetCommitList()) == {
+        "1": "bob",
+        "2": "alice",
+    }
+    pooled.Close()
+
+
+def test_pool_reuses_connections(tmp_path):
+    path = make_database(str(tmp_path / "commits.sqlite"))
+    pool = cvsdb.ConnectionPool(None, None, None, None, path, "sqlite", 1, 0)
+    db = pool.acquire()
+    with pytest.raises(cvsdb.ConnectionPoolTimeoutError):
+        pool.acquire(0.1)
+    db.Close()
+    assert pool.acquire(0.1) is db
+    db.Close()
+
+
+def test_generation_bumps(tmp_path):
+    path = make_database(str(tmp_path / "commits.sqlite"))
+    db = connect(path)
+    assert db.GetMetadataValue("generation") is None
+    loader = cvsdb.BulkCommitLoader(db, 1)
+    loader.AddCommit(make_commit("/repos", "a.txt", "1", "alice", 1000000000))
+    loader.AddCommit(make_commit("/repos", "a.txt", "2", "alice", 1000000100))
+    assert db.GetMetadataValue("generation") == "1"
+    db.PurgeRepository("/repos")
+    assert db.GetMetadataValue("generation") == "2"
+    db.Close()
+
+
+def make_history():
+    """Return a list of commits to several repositories, files and
+    branches, with log messages shared by some commits, and others of
+    the same length (as the database's hash of them is)."""
+    commits = []
+    authors = ["alice", "bob", "carol"]
+    descriptions = ["Fix the frobnicator.", "Add the widgets bar.", "Tidy up.", "Tidy up."]
+    for i in range(40):
+        commit = make_commit(
+            f"/repos{i % 2}",
+            f"file{i % 7}.c",
+            f"1.{i + 1}",
+            authors[i % 3],
+            1000000000 + i * 60,
+            descriptions[i % 4],
+        )
+        commit.SetDirectory(f"dir{i % 3}")
+        commit.SetBranch(i % 5 and "" or "BRANCH_1")
+        commits.append(commit)
+    # A commit recorded a second time replaces the first record of it.
+    commit = make_commit("/repos0", "file0.c", "1.1", "carol", 1000000000, "Redone.")
+    commit.SetDirectory("dir0")
+    commits.append(commit)
+    return commits
+
+
+def dump_commits(path):
+    """Return the commits recorded in the SQLite database at PATH, with
+    the values (rather than the ids) of their authors, files, etc."""
+    db = sqlite3.connect(path)
+    try:
+        rows = db.execute(
+            "SELECT type, ci_when, who, repository, dir, file, revision, stickytag, branch,"
+            " addedlines, removedlines, description"
+            " FROM commits, people, repositories, dirs, files, branches, descs"
+            " WHERE whoid=people.id AND repositoryid=repositories.id AND dirid=dirs.id"
+            " AND fileid=files.id AND branchid=branches.id AND descid=descs.id"
+        ).fetchall()
+        tables = {}
+        for table, column in (
+            ("people", "who"),
+            ("repositories", "repository"),
+            ("dirs", "dir"),
+            ("files", "file"),
+            ("branches", "branch"),
+            ("descs", "description"),
+        ):
+            tables[table] = sorted(row[0] for row in db.execute(f"SELECT {column} FROM {table}"))
+    finally:
+        db.close()
+    return sorted(rows), tables
+
+
+def test_bulk_load_matches_single_commits(tmp_path):
+    single_path = make_database(str(tmp_path / "single.sqlite"))
+    db = connect(single_path)
+    for commit in make_history():
+        db.AddCommit(commit)
+    db.Close()
+
+    bulk_path = make_database(str(tmp_path / "bulk.sqlite"))
+    db = connect(bulk_path)
+    loader = cvsdb.BulkCommitLoader(db, 7)
+    for commit in make_history():
+        loader.AddCommit(commit)
+    loader.Flush()
+    db.Close()
+    assert loader.commit_count == len(make_history())
+    assert loader.batch_count == 6
+
+    single = dump_commits(single_path)
+    assert len(single[0]) == 40
+    assert dump_commits(bulk_path) == single
+
+
+def test_latest_revision(tmp_path):
+    # svndbadmin resumes an interrupted rebuild after the latest revision
+    # recorded, which must be the numerically greatest one.
+    db = connect(make_database(str(tmp_path / "commits.sqlite")))
+    assert db.GetLatestRevision("/svn") is None
+    loader = cvsdb.BulkCommitLoader(db, 4)
+    for revision in (1, 2, 9, 10, 11, 100, 99):
+        loader.AddCommit(make_commit("/svn", "a.txt", str(revision), "alice", 1000000000))
+    loader.AddCommit(make_commit("/other", "a.txt", "1000", "alice", 1000000000))
+    loader.Flush()
+    assert db.GetLatestRevision("/svn") == 100
+    assert db.GetLatestRevision("/other") == 1000
+    assert db.GetLatestRevision("/unknown") is None
+    db.Close()
+
+
+def test_sqlite_missing_database(tmp_path):
+    path = str(tmp_path / "missing.sqlite")
+    with pytest.raises(sqlite3.OperationalError):
+        connect(path)
+    assert not os.path.exists(path)
+
+
+def test_sqlite_readonly(tmp_path):
+    db = connect(make_database(str(tmp_path / "commits.sqlite")), readonly=1)
+    with pytest.raises(Exception):
+        db.AddCommit(make_commit("/repos", "a.txt", "1", "alice", 1000000000))
+    db.Close()
+
+
+def test_sqlite_author_matches(tmp_path):
+    # Matches are case-sensitive, as with the MySQL schema's binary
+    # collation.
+    db = connect(make_database(str(tmp_path / "commits.sqlite")))
+    for revision, author in enumerate(("alice", "Alice", "al_ce", "bob")):
+        db.AddCommit(make_commit("/repos", "a.txt", str(revision), author, 1000000000))
+    for author, match, expected in (
+        ("alice", "exact", ["alice"]),
+        ("al%", "like", ["al_ce", "alice"]),
+        ("al\\_ce", "like", ["al_ce"]),
+        ("a*e", "glob", ["al_ce", "alice"]),
+        ("^[Aa]l", "regex", ["Alice", "al_ce", "alice"]),
+        ("^al", "notregex", ["Alice", "bob"]),
+    ):
+        query = cvsdb.CreateCheckinQuery()
+        query.SetAuthor(author, match)
+        db.RunQuery(query)
+        assert sorted(c.GetAuthor() for c in query.GetCommitList()) == expected, (author, match)
+    db.Close()
+
+
+def test_sqlite_ids_not_reused(tmp_path):
+    db = connect(make_database(str(tmp_path / "commits.sqlite")))
+    db.AddCommit(make_commit("/repos", "a.txt", "1", "alice", 1000000000))
+    alice_id = db.GetAuthorID("alice", 0)
+    db.PurgeRepository("/repos")
+    assert db.GetAuthorID("alice", 0) is None
+    db.AddCommit(make_commit("/repos", "a.txt", "1", "bob", 1000000000))
+    assert int(db.GetAuthorID("bob", 0)) > int(alice_id)
+    db.Close()
+
+
+def test_make_database_upgrade(tmp_path):
+    # Upgrading rebuilds the tables of databases created without
+    # AUTOINCREMENT ids, keeping their contents.
+    path = make_database(str(tmp_path / "commits.sqlite"), 2, autoincrement=False)
+    db = connect(path)
+    for commit in make_history():
+        db.AddCommit(commit)
+    db.Close()
+    before = dump_commits(path)
+
+    subprocess.check_output(
+        [
+            sys.executable,
+            os.path.join(DB_DIR, "make-database"),
+            "--backend=sqlite",
+            f"--dbname={path}",
+            "--upgrade",
+        ]
+    )
+    assert dump_commits(path) == before
+    db = sqlite3.connect(path)
+    try:
+        (version,) = db.execute("SELECT value FROM metadata WHERE name='version'").fetchone()
+        assert version == str(cvsdb.CURRENT_SCHEMA_VERSION)
+        for table in ("branches", "descs", "dirs", "files", "people", "repositories"):
+            (sql,) = db.execute("SELECT sql FROM sqlite_master WHERE name=?", (table,)).fetchone()
+            assert "AUTOINCREMENT" in sql, table
+    finally:
+        db.close()
+
+
+# Log messages, and comment searches for which the full-text index must
+# find the same commits that matching every log message would.
+FULLTEXT_DESCRIPTIONS = [
+    "Fix the frobnicator.",
+    "Fix the frobnicators, again",
+    "fix THE Frobnicator.",
+    "Add the widgets bar.",
+    "Add widget-bar support (see issue #12)",
+    "Mise à jour de l'élément",
+    "Don't crash on empty input",
+    "x",
+]
+FULLTEXT_SEARCHES = [
+    # (search, match type, whether the full-text index narrows it down)
+    ("Fix the frobnicator.", "exact", True),
+    ("fix THE Frobnicator.", "exact", True),
+    ("Mise à jour de l'élément", "exact", True),
+    ("Don't crash on empty input", "exact", True),
+    ("x", "exact", True),
+    ("Fix the frob*", "glob", True),
+    ("*frobnicator*", "glob", False),
+    ("Add widget?bar *", "glob", True),
+    ("Add widget-bar support*#12)", "glob", True),
+    ("* à *", "glob", True),
+    ("Fix [Tt]he *", "glob", True),
+    ("Add the w[a-z]dgets bar.", "glob", True),
+    ("%widget%", "like", False),
+    ("Fix%", "like", False),
+    ("^[Ff]ix", "regex", False),
+]
+
+
+def test_fulltext_matches_scan(tmp_path):
+    # Schema version 2 databases have no full-text index, so comment
+    # searches test every log message there.
+    paths = {}
+    for version in (2, 3):
+        paths[version] = make_database(str(tmp_path / f"v{version}.sqlite"), version)
+        db = connect(paths[version])
+        for i, description in enumerate(FULLTEXT_DESCRIPTIONS):
+            db.AddCommit(
+                make_commit("/repos", "a.txt", str(i), "alice", 1000000000 + i, description)
+            )
+        db.Close()
+
+    for comment, match, indexed in FULLTEXT_SEARCHES:
+        found = {}
+        for version in (2, 3):
+            db = connect(paths[version], readonly=1)
+            query = cvsdb.CreateCheckinQuery()
+            query.SetComment(comment, match)
+            db.RunQuery(query)
+            found[version] = sorted(c.GetDescription() for c in query.GetCommitList())
+            if version == 3:
+                assert (db.FullTextSearch(query) is not None) == indexed, comment
+            db.Close()
+        assert found[2], (comment, match)
+        assert found[3] == found[2], (comment, match)
+
+
+def test_fulltext_relevance_sort(tmp_path):
+    db = connect(make_database(str(tmp_path / "commits.sqlite")))
+    for i, description in enumerate(FULLTEXT_DESCRIPTIONS):
+        db.AddCommit(make_commit("/repos", "a.txt", str(i), "alice", 1000000000 + i, description))
+    for sort in ("date", "relevance"):
+        query = cvsdb.CreateCheckinQuery()
+        query.SetComment("*frobnicator*", "glob")
+        query.SetSortMethod(sort)
+        db.RunQuery(query)
+        assert sorted(c.GetRevision() for c in query.GetCommitList()) == ["0", "1"]
+    db.Close()
+
+
+def commit_key(commit):
+    return (commit.GetRepository(), commit.GetDirectory(), commit.GetFile(), commit.GetRevision())
+
+
+@pytest.mark.parametrize("sort", ["date", "author", "file"])
+@pytest.mark.parametrize("limit", [1, 3, 7, 40])
+def test_pagination(tmp_path, sort, limit):
+    # Paging through a query's results, with page keys which make the
+    # round trip through URLs, finds each of them once, in order, even
+    # with many commits made at the same time.
+    db = connect(make_database(str(tmp_path / "commits.sqlite")))
+    loader = cvsdb.BulkCommitLoader(db)
+    for i, commit in enumerate(make_history()):
+        commit.SetTime(1000000000 + (i // 5) * 60)
+        loader.AddCommit(commit)
+    loader.Flush()
+
+    query = cvsdb.CreateCheckinQuery()
+    query.SetSortMethod(sort)
+    db.RunQuery(query)
+    expected = [commit_key(commit) for commit in query.GetCommitList()]
+    assert len(expected) == 40
+
+    found = []
+    page_key = None
+    while 1:
+        query = cvsdb.CreateCheckinQuery()
+        query.SetSortMethod(sort)
+        query.SetLimit(limit)
+        if page_key is not None:
+            query.SetPageAfter(cvsdb.DecodePageKey(cvsdb.EncodePageKey(page_key), sort))
+        db.RunQuery(query)
+        commits = query.GetCommitList()
+        assert len(commits) <= limit
+        found.extend(commit_key(commit) for commit in commits)
+        page_key = query.GetNextPageKey()
+        if page_key is None:
+            break
+        assert len(found) < len(expected)
+    db.Close()
+    assert found == expected
+
+
+def test_invalid_page_keys():
+    for token in ("", "!!!", cvsdb.EncodePageKey([1, 2]), cvsdb.EncodePageKey("x")):
+        with pytest.raises(ValueError):
+            cvsdb.DecodePageKey(token, "date")
+    # Values which would otherwise end up in the SQL.
+    page_key = ["2001-09-09 01:46:40' OR '1'='1", 1, 1, 1, 1, "1.1"]
+    with pytest.raises(ValueError):
+        cvsdb.DecodePageKey(cvsdb.EncodePageKey(page_key), "date")
+    page_key = ["2001-09-09 01:46:40", "1", 1, 1, 1, "1.1"]
+    with pytest.raises(ValueError):
+        cvsdb.DecodePageKey(cvsdb.EncodePageKey(page_key), "date")